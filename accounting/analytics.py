@@ -0,0 +1,206 @@
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from itertools import accumulate
+import sqlite3
+
+import pandas as pd
+
+import accounting.constant as c
+
+# Dimensions of the monthly totals. Total has a single empty key.
+TOTAL = 'total'
+CATEGORY = 'category'
+MERCHANT = 'merchant'
+CARD = 'card'
+DIMENSIONS = [TOTAL, CATEGORY, MERCHANT, CARD]
+TOTAL_KEY = ''
+MONTH = 'month'
+COUNT = 'count'
+
+
+@lru_cache(maxsize=None)
+def get_spending_analytics(db_path):
+    """Opens the spending aggregates stored at db_path once per process."""
+    return SpendingAnalytics(db_path)
+
+
+class SpendingAnalytics:
+    """Monthly debit and credit totals by category, merchant, and card, kept up to date from new history rows.
+
+    Totals are stored in SQLite and held in memory as cumulative sums per key, so a query over any range of months is
+    two binary searches rather than a scan of the history.
+
+    Attributes:
+        db_path (str): The SQLite database holding the monthly_totals table.
+        totals ({(str, str):{str:[float, float, int]}}): The debit, credit, and count of each month of every key.
+        cumulative_totals ({(str, str):([str], [(float, float, int)])}): The months and running totals of queried keys.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        with self.connection:
+            self.connection.execute('''
+                CREATE TABLE IF NOT EXISTS monthly_totals (
+                    dimension TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    month TEXT NOT NULL,
+                    debit REAL NOT NULL,
+                    credit REAL NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (dimension, key, month)
+                ) WITHOUT ROWID''')
+        self.totals = None
+        self.cumulative_totals = {}
+
+    # Update
+
+    def update(self, added_df):
+        """Adds transactions that were just added to the history to the monthly totals."""
+        if not added_df.empty:
+            self.add_totals(aggregate(added_df))
+
+    def recategorize(self, moved_df, mappings):
+        """Moves the category totals of transactions whose business was given a category in {business: category} mappings.
+
+        Args:
+            moved_df (DataFrame): The transactions as they were before their category changed.
+            mappings ({str:str}): The new category of each business.
+        """
+        if moved_df.empty:
+            return
+        removed_df = aggregate(moved_df, [CATEGORY])
+        removed_df[[c.DEBIT, c.CREDIT, COUNT]] *= -1
+        added_df = aggregate(moved_df.assign(**{c.CATEGORY: moved_df[c.BUSINESS_OR_PERSON].map(mappings)}), [CATEGORY])
+        self.add_totals(pd.concat([removed_df, added_df], ignore_index=True))
+
+    def add_totals(self, totals_df):
+        rows = list(totals_df.itertuples(index=False, name=None))
+        with self.connection:
+            self.connection.executemany('''
+                INSERT INTO monthly_totals (dimension, key, month, debit, credit, count) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (dimension, key, month) DO UPDATE SET
+                    debit = debit + excluded.debit,
+                    credit = credit + excluded.credit,
+                    count = count + excluded.count''', rows)
+
+        if self.totals is not None:
+            for dimension, key, month, debit, credit, count in rows:
+                month_totals = self.totals.setdefault((dimension, key), {}).setdefault(month, [0.0, 0.0, 0])
+                month_totals[0] += debit
+                month_totals[1] += credit
+                month_totals[2] += count
+                self.cumulative_totals.pop((dimension, key), None)
+
+    def count(self):
+        """Returns the number of transactions included in the totals."""
+        return self.connection.execute(
+            'SELECT IFNULL(SUM(count), 0) FROM monthly_totals WHERE dimension = ?', (TOTAL,)).fetchone()[0]
+
+    def synchronize(self, store):
+        """Rebuilds the totals from the whole history when they don't cover the same transactions as the store."""
+        history_count = store.count()
+        if self.count() == history_count:
+            return
+
+        with self.connection:
+            self.connection.execute('DELETE FROM monthly_totals')
+        self.totals = None
+        self.cumulative_totals = {}
+        self.update(store.read())
+        print(f"Built spending aggregates from {history_count} transactions.")
+
+    # Query
+
+    def spend(self, category=None, start=None, end=None, merchant=None, card=None):
+        """Returns the total debit in a category, at a merchant, on a card, or overall between two months.
+
+        Args:
+            category (str): The category, e.g. 'dining'.
+            start (str | date): The first month to include, e.g. '2024-01'. Dates are rounded to their month.
+            end (str | date): The last month to include.
+            merchant (str): The business_or_person instead of a category.
+            card (int): The card number instead of a category.
+        """
+        return self.totals_between(*get_dimension_key(category, merchant, card), start, end)[c.DEBIT]
+
+    def totals_between(self, dimension, key, start=None, end=None):
+        """Returns the debit, credit, and count of a key between two months, both included."""
+        months, cumulative = self.get_cumulative_totals(dimension, str(key))
+        first = bisect_left(months, to_month(start)) if start is not None else 0
+        last = bisect_right(months, to_month(end)) if end is not None else len(months)
+        if last <= first:
+            return {c.DEBIT: 0.0, c.CREDIT: 0.0, COUNT: 0}
+
+        debit, credit, count = cumulative[last]
+        debit_before, credit_before, count_before = cumulative[first]
+        return {c.DEBIT: round(debit - debit_before, 2), c.CREDIT: round(credit - credit_before, 2),
+                COUNT: count - count_before}
+
+    def monthly_totals(self, dimension, key=None):
+        """Returns the stored monthly totals of a dimension, or of one key, as a dataframe sorted by month."""
+        query = 'SELECT key, month, debit, credit, count FROM monthly_totals WHERE dimension = ?'
+        params = [dimension]
+        if key is not None:
+            query += ' AND key = ?'
+            params.append(str(key))
+        return pd.read_sql_query(query + ' ORDER BY month, key', self.connection, params=params)
+
+    def get_cumulative_totals(self, dimension, key):
+        if (dimension, key) not in self.cumulative_totals:
+            if self.totals is None:
+                self.totals = self.load_totals()
+            month_totals = self.totals.get((dimension, key), {})
+            months = sorted(month_totals)
+            cumulative = list(accumulate(
+                (tuple(month_totals[month]) for month in months),
+                lambda total, month: (total[0] + month[0], total[1] + month[1], total[2] + month[2]),
+                initial=(0.0, 0.0, 0)))
+            self.cumulative_totals[(dimension, key)] = (months, cumulative)
+        return self.cumulative_totals[(dimension, key)]
+
+    def load_totals(self):
+        totals = {}
+        for dimension, key, month, debit, credit, count in self.connection.execute(
+                'SELECT dimension, key, month, debit, credit, count FROM monthly_totals'):
+            totals.setdefault((dimension, key), {})[month] = [debit, credit, count]
+        return totals
+
+    def close(self):
+        self.connection.close()
+
+
+def aggregate(df, dimensions=DIMENSIONS):
+    """Returns the monthly totals of the dimensions in df as rows of dimension, key, month, debit, credit, count."""
+    df = pd.DataFrame({
+        MONTH: df[c.DATE].astype(str).str[:7],
+        c.DEBIT: df[c.DEBIT],
+        c.CREDIT: df[c.CREDIT],
+        CATEGORY: df[c.CATEGORY],
+        MERCHANT: df[c.BUSINESS_OR_PERSON],
+        CARD: df[c.CARD_NUMBER].astype(str),
+    })
+    df[TOTAL] = TOTAL_KEY
+
+    dfs = []
+    for dimension in dimensions:
+        totals_df = df.groupby([dimension, MONTH], observed=True).agg(
+            **{c.DEBIT: (c.DEBIT, 'sum'), c.CREDIT: (c.CREDIT, 'sum'), COUNT: (MONTH, 'size')}).reset_index()
+        dfs.append(totals_df.rename(columns={dimension: 'key'}).assign(dimension=dimension))
+    df = pd.concat(dfs, ignore_index=True)
+    return df[['dimension', 'key', MONTH, c.DEBIT, c.CREDIT, COUNT]].astype({COUNT: int})
+
+
+def get_dimension_key(category=None, merchant=None, card=None):
+    """Returns the dimension and key of at most one filter, or the overall total without one."""
+    filters = [(dimension, key) for dimension, key in [(CATEGORY, category), (MERCHANT, merchant), (CARD, card)]
+               if key is not None]
+    if len(filters) > 1:
+        raise ValueError("Spending is aggregated by one of category, merchant, or card at a time.")
+    return filters[0] if filters else (TOTAL, TOTAL_KEY)
+
+
+def to_month(value):
+    """Returns the YYYY-MM month of a date, a datetime, or a string starting with YYYY-MM."""
+    return str(value)[:7]
@@ -2,6 +2,13 @@
 OPEN_AI_KEY = 'OPENAI_API_KEY'
 CASH_TRANSACTIONS_DATABASE_ID_KEY = 'CASH_TRANSACTIONS_DATABASE_ID'
 NOTION_API_KEY = 'NOTION_API_KEY'
+HISTORY_STORE_FORMAT_KEY = 'HISTORY_STORE_FORMAT'
+VALIDATION_LEVEL_KEY = 'VALIDATION_LEVEL'
+PROFILE_KEY = 'ACCOUNTING_PROFILE'
+
+# History store formats
+SQLITE = 'sqlite'
+PARQUET = 'parquet'
 
 # Dataframe columns
 BUSINESS_OR_PERSON = 'business_or_person'
@@ -26,6 +33,19 @@ TRANSACTION_COLUMNS = {
     SEQUENCE
 }
 
+# Column order used when storing and exporting transaction history
+HISTORY_COLUMNS = [
+    DATE,
+    CARD_NUMBER,
+    BUSINESS_OR_PERSON_ORIGINAL,
+    CATEGORY_ORIGINAL,
+    DEBIT,
+    CREDIT,
+    BUSINESS_OR_PERSON,
+    CATEGORY,
+    SEQUENCE
+]
+
 # Capital One columns
 CAP_ONE_TRANSACTION_DATE = 'Transaction Date'
 CAP_ONE_POSTED_DATE = "Posted Date"
@@ -35,12 +55,65 @@ CAP_ONE_CATEGORY = 'Category'
 CAP_ONE_DEBIT = 'Debit'
 CAP_ONE_CREDIT = 'Credit'
 
+# Chase columns
+CHASE_TRANSACTION_DATE = 'Transaction Date'
+CHASE_POST_DATE = 'Post Date'
+CHASE_DESCRIPTION = 'Description'
+CHASE_CATEGORY = 'Category'
+CHASE_TYPE = 'Type'
+CHASE_AMOUNT = 'Amount'
+CHASE_MEMO = 'Memo'
+
+# American Express columns, the account number and category are only in extended exports
+AMEX_DATE = 'Date'
+AMEX_DESCRIPTION = 'Description'
+AMEX_AMOUNT = 'Amount'
+AMEX_ACCOUNT_NUMBER = 'Account #'
+AMEX_CATEGORY = 'Category'
+
+# OFX and QFX transaction fields
+OFX_TRANSACTION_TYPE = 'TRNTYPE'
+OFX_DATE_POSTED = 'DTPOSTED'
+OFX_AMOUNT = 'TRNAMT'
+OFX_NAME = 'NAME'
+OFX_MEMO = 'MEMO'
+OFX_ACCOUNT_ID = 'ACCTID'
+
+# Extensions of statement files, sniffed from their header to find the issuer
+STATEMENT_EXTENSIONS = ('.csv', '.xlsx', '.ofx', '.qfx')
+
 # Directory and file paths
 ACCOUNTING_DIRECTORY_PATH = 'accounting/'
 DATA_DIRECTORY_PATH = ACCOUNTING_DIRECTORY_PATH + 'data/'
 TEMP_DIRECTORY_PATH = DATA_DIRECTORY_PATH + 'temp/'
 IMPORTED_TRANSACTIONS_DIRECTORY_PATH = DATA_DIRECTORY_PATH + 'imported_transactions/'
 TRANSACTIONS_HISTORY_FILE_PATH = DATA_DIRECTORY_PATH + 'transactions_history.csv'
+TRANSACTIONS_HISTORY_DB_PATH = DATA_DIRECTORY_PATH + 'transactions_history.sqlite'
+TRANSACTIONS_HISTORY_PARQUET_PATH = DATA_DIRECTORY_PATH + 'transactions_history/'
+NOTION_STATE_FILE_PATH = DATA_DIRECTORY_PATH + 'notion_state.json'
+METRICS_DIRECTORY_PATH = DATA_DIRECTORY_PATH + 'metrics/'
+CATEGORIES_FILE_PATH = DATA_DIRECTORY_PATH + 'categories.csv'
+CATEGORIZED_BUSINESSES_FILE_PATH = DATA_DIRECTORY_PATH + 'categorized_businesses.csv'
+MERCHANT_CATEGORY_STORE_FILE_PATH = DATA_DIRECTORY_PATH + 'categorized_businesses.sqlite'
+INGESTION_LEDGER_DB_PATH = DATA_DIRECTORY_PATH + 'ingestion_ledger.sqlite'
+MERCHANT_CLASSIFIER_FILE_PATH = DATA_DIRECTORY_PATH + 'merchant_classifier.npz'
+
+# Number of statement rows read at a time when streaming large files
+STREAMING_CHUNK_SIZE = 50_000
+
+# Seconds between scans of the temp directory and seconds a new statement must stay unchanged before it's imported
+WATCH_INTERVAL = 2.0
+WATCH_DEBOUNCE = 5.0
+
+# Placeholder category of transactions whose business is waiting in the review queue
+UNCATEGORIZED = 'uncategorized'
+
+# Confidence of the local merchant classifier below which businesses are sent to the LLM instead
+CLASSIFIER_CONFIDENCE_THRESHOLD = 0.6
+# Cosine similarity to the predicted category below which a prediction isn't trusted however confident it is. The
+# confidence only compares categories, so a name far from every category can still be confident about one of them.
+CLASSIFIER_MIN_SIMILARITY = 0.15
 
 # Prompts
-CATEGORIZE_TRANSACTION_PROMPT = "You are an experienced business analyst who speaks every language and can find businesses using descriptions from credit card transactions. Use provided business descriptions to categorize transactions based on the name a business provides to the transaction. If you can't decide between one or more, pick the category that is more specific. If no category fits, return 'no category'. This list contains the category along with a description in parenthesis: groceries (), home (Any home improvements or furniture), learning (Businesses that sells books or provide teaching services like language tutoring), dining (restaurants, bakeries, cafes, kiosks, etc.), entertainment (All forms of entertainment including concerts, movies, sports games, etc.), exercise (gym, swimming, sports stores, bike stores), car/bike/metro (Public transportation used within a city, scooter/bike rental services, ride-sharing services like Uber/Lyft, or anything related to car services like gas, car parts, or car repairs), travel (Any travel from one city to another including trains, flights, and hotels/airbnbs), utilities (mobile phone related coses, internet, electricity, water, etc.), health care (hospitals, pharmacies, etc.), insurance (), pet care (pet stores), donation (Non-profits), merchandise (Purchases like clothes, online purchases, etc.)."
\ No newline at end of file
+CATEGORIZE_TRANSACTION_PROMPT = "You are an experienced business analyst who speaks every language and can find businesses using descriptions from credit card transactions. Use provided business descriptions to categorize transactions based on the name a business provides to the transaction. If you can't decide between one or more, pick the category that is more specific. If no category fits, return 'no category'. This list contains the category along with a description in parenthesis: groceries (), home (Any home improvements or furniture), learning (Businesses that sells books or provide teaching services like language tutoring), dining (restaurants, bakeries, cafes, kiosks, etc.), entertainment (All forms of entertainment including concerts, movies, sports games, etc.), exercise (gym, swimming, sports stores, bike stores), car/bike/metro (Public transportation used within a city, scooter/bike rental services, ride-sharing services like Uber/Lyft, or anything related to car services like gas, car parts, or car repairs), travel (Any travel from one city to another including trains, flights, and hotels/airbnbs), utilities (mobile phone related coses, internet, electricity, water, etc.), health care (hospitals, pharmacies, etc.), insurance (), pet care (pet stores), donation (Non-profits), merchandise (Purchases like clothes, online purchases, etc.)."
+CATEGORIZE_TRANSACTIONS_BATCH_PROMPT = "Categorize each business in the following JSON list. Respond only with a JSON object that maps every business, spelled exactly as given, to its category: "
@@ -0,0 +1,139 @@
+from contextlib import contextmanager
+import cProfile
+from datetime import datetime
+import functools
+import json
+import os
+import pstats
+import resource
+import sys
+import time
+import tracemalloc
+
+import accounting.constant as c
+
+current_run = None
+
+
+class RunMetrics:
+    """Wall time, rows in and out, and memory of every pipeline stage in a run, plus counters such as LLM calls.
+
+    Attributes:
+        run_id (str): The timestamp identifying the run.
+        stages ([dict]): One record per completed stage, in completion order.
+        counters ({str:int}): Named counts, e.g. llm_calls.
+        profile (bool): Whether cProfile and tracemalloc are enabled for the run.
+    """
+
+    def __init__(self, profile=False):
+        self.run_id = datetime.now().strftime('%Y-%m-%dT%H-%M-%S-%f')
+        self.started_at = time.perf_counter()
+        self.stages = []
+        self.counters = {}
+        self.depth = 0
+        self.profile = profile
+        self.profiler = None
+
+        if profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """Records a stage. Set 'rows_out' on the yielded record to report the rows a stage produced."""
+        record = {'name': name, 'depth': self.depth, 'rows_in': rows_in, 'rows_out': None}
+        if self.profile:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        self.depth += 1
+
+        try:
+            yield record
+        finally:
+            self.depth -= 1
+            record['seconds'] = round(time.perf_counter() - start, 6)
+            record['peak_memory_mb'] = get_peak_memory_mb()
+            if self.profile:
+                record['traced_peak_memory_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 3)
+            self.stages.append(record)
+
+    def increment(self, counter, amount=1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def merge(self, stages, counters):
+        """Adds the stages and counters recorded by another process, e.g. a process pool worker, below the current
+        stage."""
+        self.stages.extend({**stage, 'depth': stage['depth'] + self.depth} for stage in stages)
+        for counter, amount in counters.items():
+            self.increment(counter, amount)
+
+    def to_dict(self):
+        return {
+            'run_id': self.run_id,
+            'seconds': round(time.perf_counter() - self.started_at, 6),
+            'peak_memory_mb': get_peak_memory_mb(),
+            'counters': self.counters,
+            'stages': self.stages,
+        }
+
+    def finish(self, directory=c.METRICS_DIRECTORY_PATH):
+        """Writes the run metrics as JSON, plus cProfile statistics when profiling, and returns the JSON path."""
+        os.makedirs(directory, exist_ok=True)
+        file_path = os.path.join(directory, f'run_{self.run_id}.json')
+
+        if self.profiler is not None:
+            self.profiler.disable()
+            tracemalloc.stop()
+            profile_path = os.path.join(directory, f'run_{self.run_id}.prof')
+            self.profiler.dump_stats(profile_path)
+            pstats.Stats(self.profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(20)
+            print(f"Profile written to {profile_path}.")
+
+        with open(file_path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2)
+        print(f"Run metrics written to {file_path}.")
+        return file_path
+
+
+def get_peak_memory_mb():
+    """Returns the peak resident memory of the process so far. Linux reports kilobytes and macOS bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 1024 ** (2 if sys.platform == 'darwin' else 1), 3)
+
+
+def start_run(profile=None):
+    """Starts collecting metrics for a new run. Profiling defaults to the ACCOUNTING_PROFILE environment variable."""
+    global current_run
+    if profile is None:
+        profile = os.getenv(c.PROFILE_KEY, '').lower() in ('1', 'true', 'yes')
+    current_run = RunMetrics(profile=profile)
+    return current_run
+
+
+def get_run_metrics():
+    """Returns the metrics of the current run, starting one if the pipelines are used without start_run."""
+    return current_run if current_run is not None else start_run(profile=False)
+
+
+def count_rows(value):
+    """Returns the number of rows of a dataframe or a list of dataframes, or None for other values."""
+    if hasattr(value, 'shape'):
+        return value.shape[0]
+    if isinstance(value, list) and all(hasattr(item, 'shape') for item in value):
+        return sum(item.shape[0] for item in value)
+    return None
+
+
+def instrument(name):
+    """Decorates a pipeline step so it's recorded as a stage, counting rows of the first dataframe argument and result."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            rows_in = next((count_rows(arg) for arg in list(args) + list(kwargs.values()) if count_rows(arg) is not None), None)
+            with get_run_metrics().stage(name, rows_in=rows_in) as record:
+                result = function(*args, **kwargs)
+                record['rows_out'] = count_rows(result)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,171 @@
+import os
+import zlib
+
+import numpy as np
+import pandas as pd
+
+import accounting.constant as c
+
+# Lengths of the character n-grams of a business name, padded with spaces so the start and end of words count.
+NGRAM_LENGTHS = (3, 4, 5)
+# Number of buckets n-grams are hashed into. crc32 is used rather than hash() so buckets are the same in every process.
+FEATURE_COUNT = 2 ** 14
+# Cosine similarities are divided by the temperature before the softmax that turns them into confidences.
+TEMPERATURE = 0.05
+# Categories needed before predictions are made, with fewer every prediction is sent to the LLM.
+MIN_CATEGORIES = 2
+CONFIDENCE = 'confidence'
+SIMILARITY = 'similarity'
+
+
+class MerchantClassifier:
+    """A nearest centroid classifier over TF-IDF weighted character n-grams of business names.
+
+    Every categorized business adds its normalized n-gram frequencies to the sum of its category, so new and changed
+    mappings are learned by updating sums and n-gram document counts without retraining on the whole store. IDF
+    weights are applied to the sums when predicting, which makes each category's centroid a linear model.
+
+    Attributes:
+        categories ([str]): The categories, in the order of the rows of feature_sums.
+        feature_sums (ndarray): The sum of the normalized n-gram frequencies of the businesses of every category.
+        document_counts (ndarray): The number of trained businesses each n-gram bucket appears in.
+        merchants ({str:str}): The category of every trained business.
+    """
+
+    def __init__(self, categories=None, feature_sums=None, document_counts=None, merchants=None):
+        self.categories = list(categories) if categories is not None else []
+        self.feature_sums = feature_sums if feature_sums is not None else np.zeros((0, FEATURE_COUNT))
+        self.document_counts = document_counts if document_counts is not None else np.zeros(FEATURE_COUNT)
+        self.merchants = merchants if merchants is not None else {}
+        self.centroids = None
+
+    # Train
+
+    def update(self, mappings):
+        """Learns new {business: category} mappings, moving businesses whose category changed. Returns whether the
+        model changed."""
+        changed = {business: category for business, category in mappings.items()
+                   if isinstance(business, str) and self.merchants.get(business) != category}
+        if not changed:
+            return False
+
+        moved = {business: self.merchants[business] for business in changed if business in self.merchants}
+        self.accumulate(moved, -1)
+        self.accumulate(changed, 1)
+        self.merchants.update(changed)
+        return True
+
+    def synchronize(self, mappings):
+        """Learns the mappings of the store that aren't learned yet and forgets businesses that were removed from it.
+        Returns whether the model changed."""
+        removed = {business: category for business, category in self.merchants.items() if business not in mappings}
+        self.accumulate(removed, -1)
+        for business in removed:
+            del self.merchants[business]
+        return self.update(mappings) or bool(removed)
+
+    def accumulate(self, mappings, sign):
+        if not mappings:
+            return
+        for category in set(mappings.values()) - set(self.categories):
+            self.categories.append(category)
+            self.feature_sums = np.vstack([self.feature_sums, np.zeros(FEATURE_COUNT)])
+
+        rows, ids, weights = get_features(list(mappings))
+        category_ids = np.array([self.categories.index(category) for category in mappings.values()])
+        np.add.at(self.feature_sums, (category_ids[rows], ids), sign * weights)
+        self.document_counts += sign * np.bincount(ids, minlength=FEATURE_COUNT)
+        self.centroids = None
+
+    # Predict
+
+    def predict(self, businesses):
+        """Returns the most likely category of every business, its confidence between 0 and 1, and the cosine
+        similarity of the business to the category's centroid, as a dataframe indexed by business. Returns an empty
+        dataframe until enough categories have been learned."""
+        businesses = list(businesses)
+        if len(self.categories) < MIN_CATEGORIES or not businesses:
+            return pd.DataFrame({c.CATEGORY: [], CONFIDENCE: [], SIMILARITY: []}, index=pd.Index([], dtype=object))
+
+        centroids, idf = self.get_centroids()
+        rows, ids, weights = get_features(businesses)
+        weights = normalize(rows, weights * idf[ids], len(businesses))
+        similarities = np.column_stack([
+            np.bincount(rows, weights=weights * centroid[ids], minlength=len(businesses)) for centroid in centroids])
+
+        # A softmax over the similarities to every category's centroid.
+        scores = np.exp((similarities - similarities.max(axis=1, keepdims=True)) / TEMPERATURE)
+        confidences = scores / scores.sum(axis=1, keepdims=True)
+        best = confidences.argmax(axis=1)
+        return pd.DataFrame({
+            c.CATEGORY: np.array(self.categories, dtype=object)[best],
+            CONFIDENCE: confidences[np.arange(len(businesses)), best],
+            SIMILARITY: similarities[np.arange(len(businesses)), best],
+        }, index=pd.Index(businesses, dtype=object))
+
+    def get_centroids(self):
+        """Returns the IDF weighted, normalized centroid of every category and the IDF of every n-gram bucket."""
+        if self.centroids is None:
+            idf = np.log((1 + len(self.merchants)) / (1 + self.document_counts)) + 1
+            centroids = self.feature_sums * idf
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            self.centroids = (np.divide(centroids, norms, out=np.zeros_like(centroids), where=norms > 0), idf)
+        return self.centroids
+
+    # Cache
+
+    def save(self, file_path):
+        """Writes the model to file_path, replacing the previous model only once it's fully written."""
+        temp_file_path = file_path + '.tmp'
+        with open(temp_file_path, 'wb') as file:
+            np.savez_compressed(
+                file,
+                categories=np.array(self.categories, dtype=str),
+                feature_sums=self.feature_sums,
+                document_counts=self.document_counts,
+                merchants=np.array(list(self.merchants), dtype=str),
+                merchant_categories=np.array(list(self.merchants.values()), dtype=str))
+        os.replace(temp_file_path, file_path)
+
+    @classmethod
+    def load(cls, file_path):
+        """Reads a model written by save, or returns an empty model when there is none or it has other features."""
+        if not os.path.exists(file_path):
+            return cls()
+        with np.load(file_path) as model:
+            if model['feature_sums'].shape[1] != FEATURE_COUNT:
+                return cls()
+            return cls(
+                categories=model['categories'].tolist(),
+                feature_sums=model['feature_sums'],
+                document_counts=model['document_counts'],
+                merchants=dict(zip(model['merchants'].tolist(), model['merchant_categories'].tolist())))
+
+
+def get_ngrams(name):
+    padded = f' {name} '
+    return [padded[i:i + length] for length in NGRAM_LENGTHS for i in range(len(padded) - length + 1)]
+
+
+def get_features(names):
+    """Returns the n-gram features of names as the row, bucket, and weight of every non-zero feature.
+
+    Weights are sublinear term frequencies normalized per name.
+    """
+    rows, ids = [], []
+    for row, name in enumerate(names):
+        ngrams = get_ngrams(name)
+        rows.extend([row] * len(ngrams))
+        ids.extend(zlib.crc32(ngram.encode()) % FEATURE_COUNT for ngram in ngrams)
+
+    # Count repeated buckets of the same name once, with their frequency as the weight.
+    keys, counts = np.unique(np.array(rows, dtype=np.int64) * FEATURE_COUNT + np.array(ids, dtype=np.int64),
+                             return_counts=True)
+    rows, ids = np.divmod(keys, FEATURE_COUNT)
+    return rows, ids, normalize(rows, 1 + np.log(counts), len(names))
+
+
+def normalize(rows, weights, row_count):
+    """Scales the weights of every row to unit length."""
+    norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=row_count))
+    return weights / norms[rows]
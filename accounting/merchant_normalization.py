@@ -0,0 +1,96 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Rules applied in order to lowercase transaction descriptions to get a business name.
+NORMALIZATION_RULES = [
+    # Payment processor prefixes, e.g. "sq *blue bottle" or "paypal *spotify"
+    (re.compile(r'^(?:sq|tst|sp|pp|paypal|pos|dd|in)\s*\*\s*'), ''),
+    # References following an asterisk, e.g. "amazon mktp us*2a3b4c"
+    (re.compile(r'\*.*$'), ''),
+    # Store numbers
+    (re.compile(r'[\d#]+'), ''),
+    (re.compile(r'\s+'), ' '),
+]
+
+# Abbreviations banks use for the same business
+MERCHANT_ALIASES = {
+    'amzn': 'amazon',
+    'amz': 'amazon',
+    'mktplace': 'mktp',
+    'wal-mart': 'walmart',
+    'wm supercenter': 'walmart',
+}
+ALIAS_RULE = re.compile(r'\b(?:' + '|'.join(re.escape(alias) for alias in MERCHANT_ALIASES) + r')\b')
+
+# Minimum Dice similarity of character trigrams for a fuzzy match
+FUZZY_MATCH_THRESHOLD = 0.8
+
+
+def normalize_merchant_names(descriptions):
+    """Normalizes a series of lowercase descriptions into business names.
+
+    Descriptions repeat heavily, so the rules only run on unique values which are then mapped back.
+    """
+    unique_descriptions = pd.Series(descriptions.dropna().unique(), dtype=object)
+    names = unique_descriptions
+    for pattern, replacement in NORMALIZATION_RULES:
+        names = names.str.replace(pattern, replacement, regex=True)
+    names = names.str.replace(ALIAS_RULE, lambda match: MERCHANT_ALIASES[match.group(0)], regex=True)
+    names = names.str.strip()
+    return descriptions.map(dict(zip(unique_descriptions, names)))
+
+
+def get_trigrams(name):
+    padded = f' {name} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class MerchantIndex:
+    """A character trigram index over known business names for finding near matches in bulk.
+
+    Attributes:
+        merchants ([str]): The indexed business names.
+        threshold (float): The minimum Dice similarity of a match.
+    """
+
+    def __init__(self, merchants=(), threshold=FUZZY_MATCH_THRESHOLD):
+        self.merchants = []
+        self.trigram_counts = []
+        self.postings = {}
+        self.threshold = threshold
+        self.add(merchants)
+
+    def add(self, merchants):
+        """Indexes business names that aren't indexed yet."""
+        known_merchants = set(self.merchants)
+        for merchant in merchants:
+            if merchant in known_merchants or not isinstance(merchant, str):
+                continue
+            known_merchants.add(merchant)
+            merchant_id = len(self.merchants)
+            trigrams = get_trigrams(merchant)
+            self.merchants.append(merchant)
+            self.trigram_counts.append(len(trigrams))
+            for trigram in trigrams:
+                self.postings.setdefault(trigram, []).append(merchant_id)
+
+    def match(self, names):
+        """Returns a {name: known business} dict for names with a known business above the threshold."""
+        trigram_counts = np.array(self.trigram_counts)
+        matches = {}
+
+        for name in names:
+            trigrams = get_trigrams(name)
+            candidate_ids = [self.postings[trigram] for trigram in trigrams if trigram in self.postings]
+            if not candidate_ids:
+                continue
+
+            shared_counts = np.bincount(np.concatenate(candidate_ids), minlength=len(self.merchants))
+            scores = 2 * shared_counts / (trigram_counts + len(trigrams))
+            best_id = int(scores.argmax())
+            if scores[best_id] >= self.threshold:
+                matches[name] = self.merchants[best_id]
+
+        return matches
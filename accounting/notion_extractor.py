@@ -0,0 +1,100 @@
+import json
+import os
+import time
+
+import requests
+
+import accounting.constant as c
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class NotionDatabaseExtractor:
+    """Queries all pages of a Notion database that were edited since the last successful run.
+
+    Pages are followed with has_more / next_cursor over a single keep-alive session. The newest last_edited_time
+    seen is stored locally as a high-water mark once the caller commits the run.
+
+    Attributes:
+        url (str): The url for querying the Notion database.
+        headers ({str:str}): The headers for the Notion API request.
+        state_path (str): The JSON file storing the high-water mark of each database.
+        page_size (int): The number of pages requested at a time, at most 100.
+        max_retries (int): The number of times a rate limited or failed request is retried.
+        backoff (float): The base delay in seconds between retries when Notion doesn't send Retry-After.
+    """
+
+    def __init__(self, url, headers, state_path=c.NOTION_STATE_FILE_PATH, page_size=100, max_retries=5, backoff=1.0, session=None):
+        self.url = url
+        self.state_path = state_path
+        self.page_size = page_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.pending_high_water_mark = None
+
+        # A session keeps the connection to Notion alive between pages.
+        self.session = session if session is not None else requests.Session()
+        self.session.headers.update(headers)
+
+    # High-water mark
+
+    def load_state(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as file:
+                return json.load(file)
+        return {}
+
+    def load_high_water_mark(self):
+        return self.load_state().get(self.url)
+
+    def commit(self):
+        """Stores the high-water mark of the last extraction. Call once its pages have been loaded."""
+        if self.pending_high_water_mark is None:
+            return
+        state = self.load_state()
+        state[self.url] = self.pending_high_water_mark
+
+        temp_state_path = self.state_path + '.tmp'
+        with open(temp_state_path, 'w') as file:
+            json.dump(state, file)
+        os.replace(temp_state_path, self.state_path)
+
+    # Extract
+
+    def extract_pages(self):
+        """Returns every page edited since the high-water mark, or every page on the first run."""
+        high_water_mark = self.load_high_water_mark()
+        body = {'page_size': self.page_size}
+        if high_water_mark is not None:
+            # Notion rounds last_edited_time to the minute, so pages edited in the same minute are fetched again.
+            body['filter'] = {'timestamp': 'last_edited_time', 'last_edited_time': {'on_or_after': high_water_mark}}
+
+        pages = []
+        while True:
+            data = self.query(body)
+            pages.extend(data['results'])
+            if not data.get('has_more'):
+                break
+            body['start_cursor'] = data['next_cursor']
+
+        edited_times = [page['last_edited_time'] for page in pages if 'last_edited_time' in page]
+        self.pending_high_water_mark = max(edited_times, default=high_water_mark)
+        return pages
+
+    def query(self, body):
+        """Posts a database query, backing off on rate limits and server errors."""
+        for attempt in range(self.max_retries + 1):
+            response = self.session.post(self.url, json=body)
+
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                break
+
+            retry_after = response.headers.get('Retry-After')
+            delay = float(retry_after) if retry_after is not None else self.backoff * 2 ** attempt
+            print(f"Notion responded with {response.status_code}, retrying in {delay} seconds.")
+            time.sleep(delay)
+
+        print(f'Error: {response.status_code} - {response.text}')
+        raise BrokenPipeError("Error extracting cash transactions from Notion.")
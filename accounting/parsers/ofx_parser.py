@@ -0,0 +1,70 @@
+import html
+import re
+
+import pandas as pd
+
+import accounting.constant as c
+from accounting.parsers.tabular_parsers import UNKNOWN_CARD_NUMBER, to_card_numbers
+from accounting.schemas.transaction_schema import OFXTransactionSchema
+
+OFX_COLUMNS = [c.OFX_TRANSACTION_TYPE, c.OFX_DATE_POSTED, c.OFX_AMOUNT, c.OFX_NAME, c.OFX_MEMO]
+# OFX 1.x is SGML where elements holding a value aren't closed, OFX 2.x is XML. Both close statements and transactions.
+STATEMENT_PATTERN = re.compile(r'<(CCSTMTRS|STMTRS)>(.*?)</\1>', re.DOTALL | re.IGNORECASE)
+TRANSACTION_PATTERN = re.compile(r'<STMTTRN>(.*?)</STMTTRN>', re.DOTALL | re.IGNORECASE)
+FIELD_PATTERN = re.compile(r'<(\w+)>([^<\r\n]*)')
+ACCOUNT_ID_PATTERN = re.compile(r'<ACCTID>([^<\r\n]*)', re.IGNORECASE)
+# Markers found near the start of OFX and QFX files, whatever their extension.
+OFX_MARKERS = ('OFXHEADER', '<OFX>')
+
+
+class OFXParser:
+    """Reads the transactions of every account in an OFX or QFX download.
+
+    Amounts are negative for purchases. The card number is the last four digits of the account.
+
+    Attributes:
+        issuer (str): The name shown for the format, since OFX files come from any bank.
+        schema (DataFrameModel): The transaction fields read.
+    """
+    issuer = 'OFX'
+    schema = OFXTransactionSchema
+
+    def matches(self, head):
+        """Returns whether the start of a file is an OFX header."""
+        return any(marker in head.upper() for marker in OFX_MARKERS)
+
+    def read(self, file_path, header_row=None):
+        with open(file_path, encoding='latin-1') as file:
+            content = file.read()
+
+        dfs = []
+        for _, statement in STATEMENT_PATTERN.findall(content):
+            account_id = ACCOUNT_ID_PATTERN.search(statement)
+            records = [
+                {field.upper(): html.unescape(value.strip()) for field, value in FIELD_PATTERN.findall(transaction)}
+                for transaction in TRANSACTION_PATTERN.findall(statement)
+            ]
+            df = pd.DataFrame.from_records(records, columns=OFX_COLUMNS)
+            df[c.OFX_ACCOUNT_ID] = account_id.group(1).strip() if account_id else str(UNKNOWN_CARD_NUMBER)
+            dfs.append(df)
+
+        df = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame(columns=OFX_COLUMNS + [c.OFX_ACCOUNT_ID])
+        df[c.OFX_AMOUNT] = pd.to_numeric(df[c.OFX_AMOUNT]).astype('float64')
+        return df
+
+    def read_in_chunks(self, file_path, header_row=None, chunksize=c.STREAMING_CHUNK_SIZE):
+        """Downloads are small, so they are read whole."""
+        return iter([self.read(file_path)])
+
+    def to_transactions(self, df):
+        amounts = df[c.OFX_AMOUNT]
+        return pd.DataFrame({
+            # Dates are YYYYMMDD, optionally followed by a time and a time zone.
+            c.DATE: pd.to_datetime(df[c.OFX_DATE_POSTED].str[:8], format='%Y%m%d'),
+            c.CARD_NUMBER: to_card_numbers(df[c.OFX_ACCOUNT_ID].str[-4:]),
+            c.BUSINESS_OR_PERSON_ORIGINAL: df[c.OFX_NAME].fillna(df[c.OFX_MEMO]),
+            # OFX has no spending categories.
+            c.CATEGORY: None,
+            c.DEBIT: (-amounts).where(amounts < 0),
+            c.CREDIT: amounts.where(amounts > 0),
+        })
@@ -0,0 +1,55 @@
+import csv
+from itertools import islice
+import os
+
+import accounting.constant as c
+from accounting.parsers.ofx_parser import OFXParser
+from accounting.parsers.tabular_parsers import AmericanExpressParser, CapitalOneParser, ChaseParser, is_excel
+
+# Rows searched for a header, since some exports start with an account summary.
+MAX_HEADER_ROWS = 20
+# Characters read to recognize an OFX header.
+OFX_HEAD_SIZE = 1024
+
+CAPITAL_ONE = CapitalOneParser()
+CHASE = ChaseParser()
+AMERICAN_EXPRESS = AmericanExpressParser()
+OFX = OFXParser()
+# Parsers of CSV and Excel exports, in the order headers are matched, most specific first.
+TABULAR_PARSERS = [CAPITAL_ONE, CHASE, AMERICAN_EXPRESS]
+
+
+def is_statement_file(file_name):
+    return file_name.lower().endswith(c.STATEMENT_EXTENSIONS)
+
+
+def sniff_statement(file_path):
+    """Returns the parser of a statement and the row holding its header, recognized from the start of the file."""
+    if not is_excel(file_path):
+        with open(file_path, encoding='latin-1') as file:
+            if OFX.matches(file.read(OFX_HEAD_SIZE)):
+                return OFX, None
+
+    for header_row, row in enumerate(read_first_rows(file_path)):
+        header = [str(value).strip() for value in row if value is not None]
+        for parser in TABULAR_PARSERS:
+            if parser.matches(header):
+                return parser, header_row
+
+    issuers = ', '.join(parser.issuer for parser in TABULAR_PARSERS + [OFX])
+    raise ValueError(f"{os.path.basename(file_path)} isn't a statement of a supported issuer ({issuers}).")
+
+
+def read_first_rows(file_path):
+    """Returns the values of the first rows of a CSV or Excel file."""
+    if is_excel(file_path):
+        # openpyxl is only imported when a workbook is read.
+        from openpyxl import load_workbook
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            return list(workbook.active.iter_rows(max_row=MAX_HEADER_ROWS, values_only=True))
+        finally:
+            workbook.close()
+
+    with open(file_path, encoding='latin-1', newline='') as file:
+        return list(islice(csv.reader(file), MAX_HEADER_ROWS))
@@ -0,0 +1,136 @@
+import pandas as pd
+
+import accounting.constant as c
+from accounting.schemas.transaction_schema import (AmericanExpressTransactionSchema, CapitalOneTransactionSchema,
+                                                   ChaseTransactionSchema)
+
+# Card number of transactions from statements that don't include one, like cash transactions.
+UNKNOWN_CARD_NUMBER = -1
+EXCEL_EXTENSIONS = ('.xlsx',)
+
+
+class TabularStatementParser:
+    """Reads an issuer's CSV or Excel export and maps its columns to transaction columns.
+
+    Attributes:
+        issuer (str): The name of the issuer.
+        schema (DataFrameModel): The columns of the export.
+        dtypes ({str:type}): The type of every column, so chunks and Excel cells don't infer different types.
+        header ([str]): The columns identifying an export of the issuer, found in its header row.
+    """
+    issuer = None
+    schema = None
+    dtypes = {}
+    header = []
+
+    def matches(self, header):
+        return all(column in header for column in self.header)
+
+    def read(self, file_path, header_row=0):
+        """Reads an export whose header is on header_row, after any account summary rows."""
+        if is_excel(file_path):
+            return pd.read_excel(file_path, engine='openpyxl', skiprows=header_row, dtype=self.dtypes)
+        return pd.read_csv(file_path, encoding='latin-1', skiprows=header_row, dtype=self.dtypes)
+
+    def read_in_chunks(self, file_path, header_row=0, chunksize=c.STREAMING_CHUNK_SIZE):
+        """Reads an export as an iterator of dataframes with at most chunksize rows. Workbooks are read whole."""
+        if is_excel(file_path):
+            return iter([self.read(file_path, header_row)])
+        return pd.read_csv(file_path, encoding='latin-1', skiprows=header_row, dtype=self.dtypes, chunksize=chunksize)
+
+    def to_transactions(self, df):
+        """Returns the date, card number, business, issuer category, debit, and credit of every row."""
+        raise NotImplementedError
+
+
+class CapitalOneParser(TabularStatementParser):
+    issuer = 'Capital One'
+    schema = CapitalOneTransactionSchema
+    dtypes = {
+        c.CAP_ONE_TRANSACTION_DATE: object,
+        c.CAP_ONE_POSTED_DATE: object,
+        c.CAP_ONE_CARD_NUMBER: 'int64',
+        c.CAP_ONE_DESCRIPTION: object,
+        c.CAP_ONE_CATEGORY: object,
+        c.CAP_ONE_DEBIT: 'float64',
+        c.CAP_ONE_CREDIT: 'float64',
+    }
+    header = [c.CAP_ONE_TRANSACTION_DATE, c.CAP_ONE_CARD_NUMBER, c.CAP_ONE_DEBIT, c.CAP_ONE_CREDIT]
+
+    def to_transactions(self, df):
+        return df.rename(columns={
+            c.CAP_ONE_TRANSACTION_DATE: c.DATE,
+            c.CAP_ONE_CARD_NUMBER: c.CARD_NUMBER,
+            c.CAP_ONE_DESCRIPTION: c.BUSINESS_OR_PERSON_ORIGINAL,
+            c.CAP_ONE_CATEGORY: c.CATEGORY,
+            c.CAP_ONE_DEBIT: c.DEBIT,
+            c.CAP_ONE_CREDIT: c.CREDIT }).drop(columns=[c.CAP_ONE_POSTED_DATE])
+
+
+class ChaseParser(TabularStatementParser):
+    """Chase exports have a single amount, negative for purchases, and no card number."""
+    issuer = 'Chase'
+    schema = ChaseTransactionSchema
+    dtypes = {
+        c.CHASE_TRANSACTION_DATE: object,
+        c.CHASE_POST_DATE: object,
+        c.CHASE_DESCRIPTION: object,
+        c.CHASE_CATEGORY: object,
+        c.CHASE_TYPE: object,
+        c.CHASE_AMOUNT: 'float64',
+        c.CHASE_MEMO: object,
+    }
+    header = [c.CHASE_TRANSACTION_DATE, c.CHASE_POST_DATE, c.CHASE_TYPE, c.CHASE_AMOUNT]
+
+    def to_transactions(self, df):
+        amounts = df[c.CHASE_AMOUNT]
+        return pd.DataFrame({
+            c.DATE: parse_statement_dates(df[c.CHASE_TRANSACTION_DATE], '%m/%d/%Y'),
+            c.CARD_NUMBER: UNKNOWN_CARD_NUMBER,
+            c.BUSINESS_OR_PERSON_ORIGINAL: df[c.CHASE_DESCRIPTION],
+            c.CATEGORY: df[c.CHASE_CATEGORY],
+            c.DEBIT: (-amounts).where(amounts < 0),
+            c.CREDIT: amounts.where(amounts > 0),
+        })
+
+
+class AmericanExpressParser(TabularStatementParser):
+    """American Express exports have a single amount, positive for purchases. Only extended exports include the
+    account number and category."""
+    issuer = 'American Express'
+    schema = AmericanExpressTransactionSchema
+    dtypes = {
+        c.AMEX_DATE: object,
+        c.AMEX_DESCRIPTION: object,
+        c.AMEX_AMOUNT: 'float64',
+        c.AMEX_ACCOUNT_NUMBER: object,
+        c.AMEX_CATEGORY: object,
+    }
+    header = [c.AMEX_DATE, c.AMEX_DESCRIPTION, c.AMEX_AMOUNT]
+
+    def to_transactions(self, df):
+        amounts = df[c.AMEX_AMOUNT]
+        return pd.DataFrame({
+            c.DATE: parse_statement_dates(df[c.AMEX_DATE], '%m/%d/%Y'),
+            c.CARD_NUMBER: to_card_numbers(df[c.AMEX_ACCOUNT_NUMBER]) if c.AMEX_ACCOUNT_NUMBER in df.columns
+                else UNKNOWN_CARD_NUMBER,
+            c.BUSINESS_OR_PERSON_ORIGINAL: df[c.AMEX_DESCRIPTION],
+            c.CATEGORY: df[c.AMEX_CATEGORY] if c.AMEX_CATEGORY in df.columns else None,
+            c.DEBIT: amounts.where(amounts > 0),
+            c.CREDIT: (-amounts).where(amounts < 0),
+        })
+
+
+def is_excel(file_path):
+    return file_path.lower().endswith(EXCEL_EXTENSIONS)
+
+
+def parse_statement_dates(dates, date_format):
+    """Parses dates written in an issuer's format. Dates read from Excel cells are already datetimes."""
+    return pd.to_datetime(dates, format=date_format)
+
+
+def to_card_numbers(account_numbers):
+    """Returns the digits of masked account numbers like '-41007' as card numbers."""
+    digits = account_numbers.astype(str).str.replace(r'\D', '', regex=True)
+    return pd.to_numeric(digits, errors='coerce').fillna(UNKNOWN_CARD_NUMBER).astype('int64')
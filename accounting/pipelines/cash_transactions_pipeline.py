@@ -1,12 +1,46 @@
 import pandas as pd
-import numpy as np
-import pandera as pa
 from pandera.typing import DataFrame
-import requests
 
 import accounting.constant as c
+from accounting.instrumentation import instrument
+from accounting.notion_extractor import NotionDatabaseExtractor
 from accounting.pipelines.transaction_history_pipeline import TransactionHistoryPipeline
+from accounting.schemas.dtypes import to_compact_dtypes
 from accounting.schemas.transaction_schema import CashTransactionSchema, TransactionSchema
+from accounting.schemas.validation import validate
+
+# Keys leading to the value of each column in the properties of a Notion page
+NOTION_PROPERTY_PATHS = {
+    c.DATE: ('date', 'date', 'start'),
+    c.CATEGORY_ORIGINAL: ('category', 'select', 'name'),
+    c.DEBIT: ('debit', 'number'),
+    c.CREDIT: ('credit', 'number'),
+    c.BUSINESS_OR_PERSON_ORIGINAL: ('person_or_business', 'title', 0, 'plain_text'),
+}
+
+def get_page_values(properties):
+    """Returns the column values of a page in the order of NOTION_PROPERTY_PATHS."""
+    try:
+        # Direct indexing is the fast path for pages with every property filled in.
+        return (
+            properties['date']['date']['start'],
+            properties['category']['select']['name'],
+            properties['debit']['number'],
+            properties['credit']['number'],
+            properties['person_or_business']['title'][0]['plain_text'],
+        )
+    except (KeyError, IndexError, TypeError):
+        return tuple(get_property_value(properties, path) for path in NOTION_PROPERTY_PATHS.values())
+
+def get_property_value(properties, path):
+    """Returns the value at path, or None when a property is missing or empty."""
+    value = properties
+    for key in path:
+        try:
+            value = value[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return value
 
 class CashTransactionsPipeline:
     """A pipeline that extracts cash transactions stored on Notion and loads them into transaction history.
@@ -14,82 +48,70 @@ class CashTransactionsPipeline:
     Attributes:
         url (str): The url for the Notion API.
         headers ({str:str}) The headers for the Notion API request.
+        extractor (NotionDatabaseExtractor): Fetches pages edited since the last run.
     """
 
-    def __init__(self, url, headers):
+    def __init__(self, url, headers, extractor=None):
         self.url = url
         self.headers = headers
+        self.extractor = extractor if extractor is not None else NotionDatabaseExtractor(url, headers)
     
     # Extract
 
+    @instrument('cash.extract')
     def extract_transactions(self):
-        response = requests.post(self.url, headers=self.headers)
-
-        if response.status_code == 200:
-            data = response.json()
-            rows = data['results']
-
-            person_or_business_list = []
-            date_list = []
-            category_list = []
-            debit_list = []
-            credit_list = []
-
-            # Iterate over response data and extract values into data frame
-            for row in rows:
-                properties = row.get('properties', {})
-                person_or_business_list.append(properties.get('person_or_business', {}).get('title', [{}])[0].get('plain_text', ''))
-                date_list.append(properties.get('date', {}).get('date', {}).get('start', ''))
-                category_list.append(properties.get('category', {}).get('select', {}).get('name', ''))
-                debit_list.append(properties.get('debit', {}).get('number', None))
-                credit_list.append(properties.get('credit', {}).get('number', None))
-
-            data = {
-                c.DATE: date_list,
-                c.CATEGORY_ORIGINAL: category_list,
-                c.CATEGORY: category_list,
-                c.DEBIT: debit_list,
-                c.CREDIT: credit_list,
-                c.SEQUENCE: 1,
-                c.BUSINESS_OR_PERSON_ORIGINAL: person_or_business_list,
-                c.BUSINESS_OR_PERSON: person_or_business_list
-            }
-
-            return pd.DataFrame(data)
-        else:
-            print(f'Error: {response.status_code} - {response.text}')
-            raise BrokenPipeError("Error extracting cash transactions from Notion.")
-    
+        return self.convert_pages(self.extractor.extract_pages())
+
+    def convert_pages(self, pages):
+        """Flattens Notion pages into a dataframe in a single pass over the pages."""
+        records = [get_page_values(page.get('properties', {})) for page in pages]
+        df = pd.DataFrame.from_records(records, columns=list(NOTION_PROPERTY_PATHS))
+        text_columns = [c.DATE, c.CATEGORY_ORIGINAL, c.BUSINESS_OR_PERSON_ORIGINAL]
+        df[text_columns] = df[text_columns].fillna('')
+
+        return pd.DataFrame({
+            c.DATE: df[c.DATE],
+            c.CATEGORY_ORIGINAL: df[c.CATEGORY_ORIGINAL],
+            c.CATEGORY: df[c.CATEGORY_ORIGINAL],
+            # Batches where every amount is a whole number would otherwise be read as integers.
+            c.DEBIT: pd.to_numeric(df[c.DEBIT]).astype('float64'),
+            c.CREDIT: pd.to_numeric(df[c.CREDIT]).astype('float64'),
+            c.SEQUENCE: 1,
+            c.BUSINESS_OR_PERSON_ORIGINAL: df[c.BUSINESS_OR_PERSON_ORIGINAL],
+            c.BUSINESS_OR_PERSON: df[c.BUSINESS_OR_PERSON_ORIGINAL]
+        })
+
     # Transform
 
-    @pa.check_types(lazy=True)
+    @instrument('cash.clean')
     def clean_transactions(self, df: DataFrame[CashTransactionSchema]):
-         # Lowercase values
-        df[c.BUSINESS_OR_PERSON_ORIGINAL] = df[c.BUSINESS_OR_PERSON_ORIGINAL].str.lower()
-        df[c.BUSINESS_OR_PERSON] = df[c.BUSINESS_OR_PERSON].str.lower()
-        df[c.CATEGORY_ORIGINAL] = df[c.CATEGORY_ORIGINAL].str.lower()
-        df[c.CATEGORY] = df[c.CATEGORY].str.lower()
-
-        # Replace values that shoulnd't have a value with NaN
-        df[c.DEBIT] = df[c.DEBIT].apply(lambda x: float(x) if x is not None else float('nan'))
-        df[c.CREDIT] = df[c.CREDIT].apply(lambda x: float(x) if x is not None else float('nan'))
-        df[c.CARD_NUMBER] = -1
+        df = validate(df, CashTransactionSchema)
 
-        # Update value types
-        df[c.DEBIT] = df[c.DEBIT].astype(float)
-        df[c.CREDIT] = df[c.CREDIT].astype(float)
-        df[c.CARD_NUMBER] = df[c.CARD_NUMBER].astype(int)
+        # Lowercase values
+        text_columns = [c.BUSINESS_OR_PERSON_ORIGINAL, c.BUSINESS_OR_PERSON, c.CATEGORY_ORIGINAL, c.CATEGORY]
+        for column in text_columns:
+            df[column] = df[column].str.lower()
 
-        return df
+        # Missing amounts become NaN
+        df[c.DEBIT] = pd.to_numeric(df[c.DEBIT]).astype(float)
+        df[c.CREDIT] = pd.to_numeric(df[c.CREDIT]).astype(float)
+        df[c.CARD_NUMBER] = -1
+
+        return to_compact_dtypes(df)
     
     # Load
 
-    @pa.check_types(lazy=True)
+    @instrument('cash.load')
     def load_transactions_to_transaction_history(self, df: DataFrame[TransactionSchema]):
         transaction_history_pipeline = TransactionHistoryPipeline(file_path=c.TRANSACTIONS_HISTORY_FILE_PATH)
         transaction_history_pipeline.run_add_to_history_pipeline(transactions_to_add_df=df)         
 
+    @instrument('cash.run')
     def run_pipeline(self):
         df = self.extract_transactions()
-        df = self.clean_transactions(df)
-        self.load_transactions_to_transaction_history(df)
+        if df.empty:
+            print("No new cash transactions found on Notion.")
+        else:
+            df = self.clean_transactions(df)
+            self.load_transactions_to_transaction_history(df)
+        self.extractor.commit()
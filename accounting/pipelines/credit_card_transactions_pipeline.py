@@ -1,83 +1,221 @@
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+import os
 import pandas as pd
-import pandera as pa
 from pandera.typing import DataFrame
 
 import accounting.constant as c
+from accounting.instrumentation import get_run_metrics, instrument, start_run
+from accounting.merchant_normalization import normalize_merchant_names
+from accounting.parsers.registry import sniff_statement
 from accounting.pipelines.transaction_history_pipeline import TransactionHistoryPipeline
-from accounting.transaction_category import categorize_transactions, get_category_from_api
-from accounting.schemas.transaction_schema import TransactionSchema, CapitalOneTransactionSchema
+from accounting.schemas.dtypes import to_compact_dtypes
+from accounting.stores.ingestion_ledger import ROW_HASH, get_ingestion_ledger, get_row_sequences, hash_file
+from accounting.transaction_category import CategorizationEngine, categorize_transactions
+from accounting.schemas.transaction_schema import TransactionSchema
+from accounting.schemas.validation import validate
+
+SEQUENCE_KEY_COLUMNS = [c.DATE, c.CARD_NUMBER, c.BUSINESS_OR_PERSON_ORIGINAL, c.DEBIT]
 
 class CreditCardTransactionsPipeline:
     """A pipeline that loops through file paths and etls transaction data.
 
+    Files can be statements of any issuer in the parser registry, recognized from their header.
+
     Attributes:
         file_paths ([str]): The file paths containing all the transaction data,
+        categorization_engine (CategorizationEngine): Categorizes transactions for businesses that haven't been categorized before.
+        workers (int): The number of processes used to extract and clean files in parallel.
+        directory (str): The directory holding the files, the temp directory by default.
+        ledger (IngestionLedger): The files and transactions imported before, skipped when they're seen again. Opened
+            on first use, so pipelines that only extract and clean statements don't open it.
     """
 
-    def __init__(self, transaction_file_paths):
+    def __init__(self, transaction_file_paths, categorization_engine=None, workers=1, directory=None, ledger=None):
         self.file_paths = transaction_file_paths
+        self.directory = directory if directory is not None else c.TEMP_DIRECTORY_PATH
+        self.workers = workers
+        self.categorization_engine = categorization_engine if categorization_engine is not None else CategorizationEngine()
+        self._ledger = ledger
 
-    # Extract
-    def extract_capital_one_transactions(self, file_path):
-        """Extracts a Capital One CSV file into a dataframe."""
-        df = pd.read_csv(file_path, encoding='latin-1')
-        return df
+    @property
+    def ledger(self):
+        if self._ledger is None:
+            self._ledger = get_ingestion_ledger()
+        return self._ledger
 
     # Transform
 
-    @pa.check_types(lazy=True)
-    def clean_capital_one_transactions(self, df: DataFrame[CapitalOneTransactionSchema]):
-        """Drop data not needed for transaction analysis and reformat business names to keep naming consistent."""
-
-        df = df.rename(columns={
-            c.CAP_ONE_TRANSACTION_DATE: c.DATE, 
-            c.CAP_ONE_CARD_NUMBER: c.CARD_NUMBER, 
-            c.CAP_ONE_DESCRIPTION: c.BUSINESS_OR_PERSON_ORIGINAL, 
-            c.CAP_ONE_CATEGORY: c.CATEGORY, 
-            c.CAP_ONE_DEBIT: c.DEBIT, 
-            c.CAP_ONE_CREDIT: c.CREDIT })
-        
-        df[c.BUSINESS_OR_PERSON_ORIGINAL] = df[c.BUSINESS_OR_PERSON_ORIGINAL].str.lower()
-        df[c.BUSINESS_OR_PERSON] = df[c.BUSINESS_OR_PERSON_ORIGINAL].str.replace('[\d#]+', '', regex=True)
-        df = df.dropna(subset=[c.DEBIT])
-        df.drop('Posted Date', axis=1, inplace=True)
+    @instrument('credit_card.sequence')
+    def set_unique_identifiers(self, df, sequence_counts=None):
+        """Create a unique identifier to avoid readding existing transactions to transaction history.
+
+        When reading a file in chunks, sequence_counts holds the number of times each transaction was seen in earlier
+        chunks (see count_sequences) so numbering continues across chunk boundaries.
+        """
+        df[c.SEQUENCE] = df.groupby(SEQUENCE_KEY_COLUMNS, observed=True).cumcount() + 1
+        if sequence_counts is not None and not sequence_counts.empty:
+            offsets = df[SEQUENCE_KEY_COLUMNS].merge(sequence_counts, on=SEQUENCE_KEY_COLUMNS, how='left')[c.SEQUENCE]
+            df[c.SEQUENCE] += offsets.fillna(0).astype(int).to_numpy()
         return df
 
-    def set_unique_identifiers(self, df):
-        """Create a unique identifier to avoid readding existing transactions to transaction history."""
-        df[c.SEQUENCE] = df.groupby([c.DATE, c.CARD_NUMBER, c.BUSINESS_OR_PERSON_ORIGINAL, c.DEBIT]).cumcount() + 1
-        return df
+    def count_sequences(self, df, sequence_counts=None):
+        """Returns the highest sequence of each transaction in df and earlier chunks."""
+        counts = [sequence_counts, df[SEQUENCE_KEY_COLUMNS + [c.SEQUENCE]]]
+        counts = pd.concat([count for count in counts if count is not None], ignore_index=True)
+        return counts.groupby(SEQUENCE_KEY_COLUMNS, as_index=False, observed=True)[c.SEQUENCE].max()
+
+    @instrument('credit_card.deduplicate')
+    def remove_imported_transactions(self, df, sequences=None):
+        """Drops the transactions of a numbered statement that were imported from an overlapping statement before.
+
+        The new transactions keep a row_hash column so they can be recorded in the ledger once they're loaded.
+
+        Args:
+            df (DataFrame): The transactions of one statement, numbered by set_unique_identifiers.
+            sequences (Series): The highest sequence of each row hash in statements of this import, not recorded yet.
+        """
+        return self.ledger.filter_imported(df, sequences)
 
     # Load
 
-    @pa.check_types(lazy=True)
-    def load_transactions(self, df: DataFrame[TransactionSchema], filepath: str):
+    @instrument('credit_card.backup')
+    def load_transactions(self, df: DataFrame[TransactionSchema], filepath: str, append: bool = False):
         """Store imported transactions in CSVs as backups."""
-        df.to_csv(filepath, index=False)
+        df = validate(df, TransactionSchema)
+        df.to_csv(filepath, index=False, mode='a' if append else 'w', header=not append)
 
     # Pipeline
 
-    def run_pipeline(self):
-        # Extract data by looping through CSVs in temp and add them all to one dataframe
-        transactions_df = pd.DataFrame()
-
+    def get_new_files(self):
+        """Returns the hash of every file whose content wasn't imported before, skipping the others."""
+        file_hashes = {}
         for file in self.file_paths:
-            df = self.extract_capital_one_transactions(c.TEMP_DIRECTORY_PATH + file)
-            df = self.clean_capital_one_transactions(df)
-            df = categorize_transactions(df)
-            df = self.set_unique_identifiers(df)
-            df[c.CATEGORY] = df.apply(get_category_from_api, axis=1)
-            transactions_df = pd.concat([transactions_df, df])
+            file_hash = hash_file(os.path.join(self.directory, file))
+            if self.ledger.has_file(file_hash) or file_hash in file_hashes.values():
+                print(f"Skipping {file}, its transactions were already imported.")
+            else:
+                file_hashes[file] = file_hash
+        return file_hashes
+
+    @instrument('credit_card.extract')
+    def extract_and_clean_transactions(self, files=None):
+        """Extracts and cleans every file, in a process pool when more than one worker is configured."""
+        files = files if files is not None else self.file_paths
+        file_paths = [os.path.join(self.directory, file) for file in files]
+
+        if self.workers > 1 and len(file_paths) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(extract_and_clean_statement_in_worker, file_paths))
+            for _, stages, counters in results:
+                get_run_metrics().merge(stages, counters)
+            return [df for df, _, _ in results]
+        else:
+            return [extract_and_clean_statement(file_path) for file_path in file_paths]
+
+    @instrument('credit_card.run')
+    def run_pipeline(self):
+        transaction_history_pipeline = TransactionHistoryPipeline(file_path=c.TRANSACTIONS_HISTORY_FILE_PATH)
+        self.ledger.migrate_from_history(transaction_history_pipeline.store)
+        file_hashes = self.get_new_files()
+
+        # Number every statement on its own so one overlapping an earlier statement repeats its sequences, then drop
+        # the overlap before categorizing. Statements of every issuer are then merged and added to the history at once.
+        dfs = []
+        sequences = None
+        for df in self.extract_and_clean_transactions(list(file_hashes)):
+            df = self.remove_imported_transactions(self.set_unique_identifiers(df), sequences)
+            sequences = get_row_sequences(df, sequences)
+            dfs.append(df.drop(columns=ROW_HASH))
+        # Files have different merchants, so concatenating turns categories into objects until converted again.
+        transactions_df = to_compact_dtypes(pd.concat(dfs, ignore_index=True)) if dfs else pd.DataFrame()
 
         if transactions_df.empty:
             print(f"No new transactions found in {self.file_paths}.")
         else :
-            # Create filename with today's date
-            today_date = datetime.today().strftime('%Y-%m-%d')
-            todays_transactions_filename = f"transactions_{today_date}.csv"
-            todays_transactions_filepath = c.IMPORTED_TRANSACTIONS_DIRECTORY_PATH + todays_transactions_filename
-            self.load_transactions(transactions_df, todays_transactions_filepath)
-
-            transaction_history_pipeline = TransactionHistoryPipeline(file_path=c.TRANSACTIONS_HISTORY_FILE_PATH)
-            transaction_history_pipeline.run_add_to_history_pipeline(transactions_to_add_df=transactions_df)
\ No newline at end of file
+            transactions_df = categorize_transactions(transactions_df)
+            transactions_df = to_compact_dtypes(self.categorization_engine.categorize(transactions_df))
+
+            self.load_transactions(transactions_df, get_todays_transactions_filepath())
+            transaction_history_pipeline.run_add_to_history_pipeline(transactions_to_add_df=transactions_df, validated=True)
+            self.ledger.add_rows(sequences)
+
+        for file, file_hash in file_hashes.items():
+            self.ledger.add_file(file_hash, file)
+
+    @instrument('credit_card.run_streaming')
+    def run_streaming_pipeline(self, chunksize=c.STREAMING_CHUNK_SIZE):
+        """Processes each file in chunks and loads every chunk into transaction history so memory stays bounded."""
+        transaction_history_pipeline = TransactionHistoryPipeline(file_path=c.TRANSACTIONS_HISTORY_FILE_PATH)
+        self.ledger.migrate_from_history(transaction_history_pipeline.store)
+        todays_transactions_filepath = get_todays_transactions_filepath()
+        transactions_count = 0
+
+        for file, file_hash in self.get_new_files().items():
+            file_path = os.path.join(self.directory, file)
+            parser, header_row = sniff_statement(file_path)
+            sequence_counts = None
+
+            for df in parser.read_in_chunks(file_path, header_row, chunksize):
+                df = clean_transactions(df, parser)
+                if df.empty:
+                    continue
+
+                df = self.set_unique_identifiers(df, sequence_counts)
+                sequence_counts = self.count_sequences(df, sequence_counts)
+                # Chunks are recorded as they're loaded, so later chunks and files are compared with them too.
+                df = self.remove_imported_transactions(df)
+                if df.empty:
+                    continue
+                sequences = get_row_sequences(df)
+                df = categorize_transactions(df.drop(columns=ROW_HASH))
+                df = to_compact_dtypes(self.categorization_engine.categorize(df))
+
+                self.load_transactions(df, todays_transactions_filepath, append=transactions_count > 0)
+                transaction_history_pipeline.run_add_to_history_pipeline(transactions_to_add_df=df, validated=True)
+                self.ledger.add_rows(sequences)
+                transactions_count += len(df)
+
+            self.ledger.add_file(file_hash, file)
+
+        if transactions_count == 0:
+            print(f"No new transactions found in {self.file_paths}.")
+
+
+def get_todays_transactions_filepath():
+    """Returns the backup file path for transactions imported today."""
+    today_date = datetime.today().strftime('%Y-%m-%d')
+    todays_transactions_filename = f"transactions_{today_date}.csv"
+    return c.IMPORTED_TRANSACTIONS_DIRECTORY_PATH + todays_transactions_filename
+
+
+def extract_statement(file_path):
+    """Extracts a statement of any supported issuer into a dataframe, returning its parser too."""
+    parser, header_row = sniff_statement(file_path)
+    return parser, parser.read(file_path, header_row)
+
+
+@instrument('credit_card.clean')
+def clean_transactions(df, parser):
+    """Map an issuer's columns to transaction columns and reformat business names to keep naming consistent."""
+    df = parser.to_transactions(validate(df, parser.schema))
+
+    df[c.BUSINESS_OR_PERSON_ORIGINAL] = df[c.BUSINESS_OR_PERSON_ORIGINAL].str.lower()
+    df[c.BUSINESS_OR_PERSON] = normalize_merchant_names(df[c.BUSINESS_OR_PERSON_ORIGINAL])
+    df = df.dropna(subset=[c.DEBIT])
+    return to_compact_dtypes(df)
+
+
+def extract_and_clean_statement(file_path):
+    """Extracts and validates a single statement. Defined at module level so process pools can run it without a
+    pipeline, its categorization engine, or the ingestion ledger."""
+    parser, df = extract_statement(file_path)
+    return clean_transactions(df, parser)
+
+
+def extract_and_clean_statement_in_worker(file_path):
+    """Runs extract_and_clean_statement in a process pool worker, returning the statement with the stages and
+    counters recorded in the worker so the parent can add them to its run."""
+    metrics = start_run(profile=False)
+    df = extract_and_clean_statement(file_path)
+    return df, metrics.stages, metrics.counters
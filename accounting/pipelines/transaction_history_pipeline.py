@@ -1,44 +1,95 @@
+from dotenv import load_dotenv
+from functools import lru_cache
 import os
-import pandas as pd
-import pandera as pa
 from pandera.typing import DataFrame
 
 import accounting.constant as c
+from accounting.analytics import get_spending_analytics
+from accounting.instrumentation import instrument
+from accounting.schemas.dtypes import to_compact_dtypes
 from accounting.schemas.transaction_schema import TransactionSchema
+from accounting.schemas.validation import validate
+from accounting.stores.history_store import SQLiteHistoryStore
+
+
+@lru_cache(maxsize=None)
+def get_history_store(store_format=None):
+    """Opens the transaction history store once per process.
+
+    The format is 'sqlite' (default) or 'parquet', read from the HISTORY_STORE_FORMAT environment variable when not given.
+    """
+    load_dotenv()
+    store_format = store_format or os.getenv(c.HISTORY_STORE_FORMAT_KEY, c.SQLITE)
+    if store_format == c.SQLITE:
+        return SQLiteHistoryStore(c.TRANSACTIONS_HISTORY_DB_PATH)
+    elif store_format == c.PARQUET:
+        # pyarrow is only imported when the Parquet format is used.
+        from accounting.stores.parquet_history_store import ParquetHistoryStore
+        return ParquetHistoryStore(c.TRANSACTIONS_HISTORY_PARQUET_PATH)
+    else:
+        raise ValueError(f"Unknown transaction history format '{store_format}'.")
+
 
 class TransactionHistoryPipeline:
     """A pipeline for adding new transactions to the transactions history.
 
     Attributes:
-        file_path (str): The location of the transaction history file
+        file_path (str): The location of the transaction history CSV, imported once and used for exports
+        store (SQLiteHistoryStore | ParquetHistoryStore): The store holding the transaction history
+        analytics (SpendingAnalytics): Monthly spending totals updated with every transaction added to the store
     """
 
-    def __init__(self, file_path):
+    def __init__(self, file_path, store=None, analytics=None):
         self.file_path = file_path
+        self.store = store if store is not None else get_history_store()
+        self.store.migrate_from_csv(self.file_path)
+        self.analytics = analytics if analytics is not None else get_spending_analytics(self.store.aggregates_path)
+        self.analytics.synchronize(self.store)
 
-    def extract_transaction_history(self):
-        # Add rows from transaction history to current transactions data frame.
-        if os.path.exists(self.file_path):
-            return pd.read_csv(self.file_path)
-        else:
-            raise FileExistsError("Transaction history file missing.")
+    @instrument('history.extract')
+    def extract_transaction_history(self, start=None, end=None, categories=None):
+        return to_compact_dtypes(self.store.read(start=start, end=end, categories=categories))
 
+    @instrument('history.clean')
     def clean_transaction_history(self, df):
         # Remove transactions that have already been added.
         df = df.drop_duplicates(subset=[c.DATE, c.BUSINESS_OR_PERSON_ORIGINAL, c.DEBIT, c.SEQUENCE])
         # Sort by date, category, and business.
         df = df.sort_values(by=[c.DATE, c.CATEGORY, c.BUSINESS_OR_PERSON], ascending=[False, True, True])
         return df
-    
-    @pa.check_types(lazy=True)
-    def load_transaction_history(self, df: DataFrame[TransactionSchema], filepath):
-        print(df)
-        df.to_csv(filepath, index=False)
-
-    @pa.check_types(lazy=True)
-    def run_add_to_history_pipeline(self, transactions_to_add_df: DataFrame[TransactionSchema]):
-        transaction_history_df = self.extract_transaction_history()
-        transaction_history_df = pd.concat([transactions_to_add_df, transaction_history_df], ignore_index=True)
-        transaction_history_df = self.clean_transaction_history(transaction_history_df)
-        
-        self.load_transaction_history(transaction_history_df, c.TRANSACTIONS_HISTORY_FILE_PATH)
+
+    @instrument('history.load')
+    def load_transaction_history(self, df: DataFrame[TransactionSchema]):
+        """Adds transactions to the history store and returns the ones that weren't stored yet."""
+        added_df = self.store.insert(df)
+        self.analytics.update(added_df)
+        print(f"Added {len(added_df)} of {len(df)} transactions to transaction history.")
+        return added_df
+
+    def backfill_categories(self, mappings, predictions=None):
+        """Gives the uncategorized transactions of each business in {business: category} mappings its category, and
+        the transactions categorized with the business's predicted category in {business: category} predictions."""
+        moved_df = self.store.recategorize(mappings, predictions)
+        self.analytics.recategorize(moved_df, mappings)
+        print(f"Categorized {len(moved_df)} transactions of {len(mappings)} reviewed businesses.")
+        return moved_df
+
+    @instrument('history.export')
+    def export_transaction_history(self, file_path=None):
+        """Exports the history to a CSV compatible with transactions_history.csv."""
+        file_path = file_path if file_path is not None else self.file_path
+        self.store.export_csv(file_path)
+        print(f"Exported {self.store.count()} transactions to {file_path}.")
+
+    @instrument('history.add')
+    def run_add_to_history_pipeline(self, transactions_to_add_df: DataFrame[TransactionSchema], validated=False):
+        """Validates only the new transactions and adds them to the history.
+
+        Args:
+            transactions_to_add_df (DataFrame): The new transactions.
+            validated (bool): Skip validation because the caller already validated transactions_to_add_df.
+        """
+        if not validated:
+            transactions_to_add_df = validate(transactions_to_add_df, TransactionSchema)
+        transactions_to_add_df = self.clean_transaction_history(transactions_to_add_df)
+        return self.load_transaction_history(transactions_to_add_df)
@@ -1,13 +1,17 @@
+import argparse
 from dotenv import load_dotenv
 import os
 
 import accounting.constant as c
-from accounting.pipelines.cash_transactions_pipeline import CashTransactionsPipeline
-from accounting.pipelines.credit_card_transactions_pipeline import CreditCardTransactionsPipeline
+from accounting.instrumentation import start_run
+from accounting.schemas.validation import VALIDATION_LEVELS, set_validation_level
 import accounting.tool as tool
 
+# Pipelines are imported by the commands that run them, so a command only imports the dependencies it needs.
 
 def run_cash_transactions_pipeline(): 
+    from accounting.pipelines.cash_transactions_pipeline import CashTransactionsPipeline
+
     load_dotenv()
 
     NOTION_API_KEY = os.getenv(c.NOTION_API_KEY)
@@ -24,18 +28,115 @@ def run_cash_transactions_pipeline():
     cash_transactions_pipeline = CashTransactionsPipeline(url=url, headers=headers)
     cash_transactions_pipeline.run_pipeline()
 
-def run_credit_card_transactions_pipeline():
+def run_credit_card_transactions_pipeline(workers=1, stream=False, chunksize=c.STREAMING_CHUNK_SIZE):
+    from accounting.parsers.registry import is_statement_file
+    from accounting.pipelines.credit_card_transactions_pipeline import CreditCardTransactionsPipeline
+
     TEMP_FILES = [f for f in os.listdir(c.TEMP_DIRECTORY_PATH) if os.path.isfile(os.path.join(c.TEMP_DIRECTORY_PATH, f))]
-    CSV_FILES = [s for s in TEMP_FILES if s.lower().endswith('csv')]
+    STATEMENT_FILES = [s for s in TEMP_FILES if is_statement_file(s)]
+
+    credit_card_transactions_pipeline = CreditCardTransactionsPipeline(STATEMENT_FILES, workers=workers)
+    if stream:
+        credit_card_transactions_pipeline.run_streaming_pipeline(chunksize=chunksize)
+    else:
+        credit_card_transactions_pipeline.run_pipeline()
+
+    tool.send_to_trash(STATEMENT_FILES)
+
+def watch_for_statements(interval, debounce, cash_interval=None):
+    from accounting.watcher import StatementWatcher
+
+    watcher = StatementWatcher(interval=interval, debounce=debounce)
+    watcher.run(cash_interval=cash_interval, run_cash_pipeline=run_cash_transactions_pipeline)
+
+def export_transaction_history(file_path):
+    from accounting.pipelines.transaction_history_pipeline import TransactionHistoryPipeline
+
+    transaction_history_pipeline = TransactionHistoryPipeline(file_path=c.TRANSACTIONS_HISTORY_FILE_PATH)
+    transaction_history_pipeline.export_transaction_history(file_path)
+
+def review_uncategorized_businesses():
+    from accounting.pipelines.transaction_history_pipeline import TransactionHistoryPipeline
+    from accounting.transaction_category import resolve_queued_businesses, review_queued_businesses
 
-    credit_card_transactions_pipeline = CreditCardTransactionsPipeline(CSV_FILES)
-    credit_card_transactions_pipeline.run_pipeline()
+    # Every answer is collected before anything is written.
+    labels = review_queued_businesses()
+    if labels:
+        predictions = resolve_queued_businesses(labels)
+        transaction_history_pipeline = TransactionHistoryPipeline(file_path=c.TRANSACTIONS_HISTORY_FILE_PATH)
+        transaction_history_pipeline.backfill_categories(labels, predictions)
 
-    tool.send_to_trash(CSV_FILES)
+def print_spend(category, merchant, card, start, end):
+    from accounting.pipelines.transaction_history_pipeline import TransactionHistoryPipeline
+
+    analytics = TransactionHistoryPipeline(file_path=c.TRANSACTIONS_HISTORY_FILE_PATH).analytics
+    print(f"${analytics.spend(category, start=start, end=end, merchant=merchant, card=card):,.2f}")
+
+def convert_transaction_history(csv_path, parquet_path):
+    import pandas as pd
+    from accounting.stores.parquet_history_store import ParquetHistoryStore
+
+    store = ParquetHistoryStore(parquet_path)
+    added_df = store.insert(pd.read_csv(csv_path))
+    print(f"Converted {len(added_df)} transactions from {csv_path} to {parquet_path}.")
 
 def main():
-    run_cash_transactions_pipeline()
-    run_credit_card_transactions_pipeline()
+    parser = argparse.ArgumentParser(description="Import transactions and manage the transaction history.")
+    parser.add_argument('--validation', choices=VALIDATION_LEVELS, help="Schema validation level (default: full or VALIDATION_LEVEL).")
+    parser.add_argument('--profile', action='store_true', default=None, help="Profile the run with cProfile and tracemalloc (default: ACCOUNTING_PROFILE).")
+    parser.set_defaults(command='run', workers=1, stream=False, chunksize=c.STREAMING_CHUNK_SIZE, skip_cash=False)
+    subparsers = parser.add_subparsers(dest='command')
+    run_parser = subparsers.add_parser('run', help="Import cash and credit card transactions (default).")
+    run_parser.add_argument('--workers', type=int, default=1, help="Number of processes used to parse statements.")
+    run_parser.add_argument('--stream', action='store_true', help="Process statements in chunks to bound memory use.")
+    run_parser.add_argument('--chunksize', type=int, default=c.STREAMING_CHUNK_SIZE, help="Rows per chunk when streaming.")
+    run_parser.add_argument('--skip-cash', action='store_true', help="Only import statements, without querying Notion.")
+    watch_parser = subparsers.add_parser('watch', help="Keep running and import statements as they are added to the temp directory.")
+    watch_parser.add_argument('--interval', type=float, default=c.WATCH_INTERVAL, help="Seconds between scans.")
+    watch_parser.add_argument('--debounce', type=float, default=c.WATCH_DEBOUNCE, help="Seconds a new file must stay unchanged before it's imported.")
+    watch_parser.add_argument('--cash-interval', type=float, help="Also import cash transactions from Notion every this many seconds.")
+    export_parser = subparsers.add_parser('export-history', help="Export the transaction history to a CSV.")
+    export_parser.add_argument('file_path', nargs='?', default=c.TRANSACTIONS_HISTORY_FILE_PATH)
+    convert_parser = subparsers.add_parser('convert-history', help="Convert a transaction history CSV to partitioned Parquet.")
+    convert_parser.add_argument('csv_path', nargs='?', default=c.TRANSACTIONS_HISTORY_FILE_PATH)
+    convert_parser.add_argument('parquet_path', nargs='?', default=c.TRANSACTIONS_HISTORY_PARQUET_PATH)
+    subparsers.add_parser('review', help="Categorize the businesses the model couldn't categorize or the classifier predicted.")
+    spend_parser = subparsers.add_parser('spend', help="Print the total spent between two months from the spending aggregates.")
+    spend_filter = spend_parser.add_mutually_exclusive_group()
+    spend_filter.add_argument('--category')
+    spend_filter.add_argument('--merchant')
+    spend_filter.add_argument('--card', type=int)
+    spend_parser.add_argument('--start', help="First month, e.g. 2024-01.")
+    spend_parser.add_argument('--end', help="Last month, e.g. 2024-06.")
+    args = parser.parse_args()
+
+    if args.validation:
+        set_validation_level(args.validation)
+
+    # Queries and reviews are interactive rather than pipeline runs, so they don't record run metrics.
+    if args.command == 'spend':
+        print_spend(args.category, args.merchant, args.card, args.start, args.end)
+        return
+    elif args.command == 'review':
+        review_uncategorized_businesses()
+        return
+    elif args.command == 'watch':
+        # Every imported statement records its own run metrics.
+        watch_for_statements(args.interval, args.debounce, args.cash_interval)
+        return
+
+    metrics = start_run(profile=args.profile)
+
+    if args.command == 'export-history':
+        export_transaction_history(args.file_path)
+    elif args.command == 'convert-history':
+        convert_transaction_history(args.csv_path, args.parquet_path)
+    else:
+        if not args.skip_cash:
+            run_cash_transactions_pipeline()
+        run_credit_card_transactions_pipeline(workers=args.workers, stream=args.stream, chunksize=args.chunksize)
+
+    metrics.finish()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
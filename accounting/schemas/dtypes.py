@@ -0,0 +1,62 @@
+import pandas as pd
+
+import accounting.constant as c
+
+# Compact in-memory column types of transactions. Categories come from a small fixed set and merchants repeat
+# heavily, so their strings are stored once per frame with integer codes per row.
+COMPACT_DTYPES = {
+    c.CARD_NUMBER: 'int32',
+    c.BUSINESS_OR_PERSON_ORIGINAL: 'category',
+    c.CATEGORY_ORIGINAL: 'category',
+    c.BUSINESS_OR_PERSON: 'category',
+    c.CATEGORY: 'category',
+    c.SEQUENCE: 'int16',
+}
+TEXT_COLUMNS = [c.BUSINESS_OR_PERSON_ORIGINAL, c.CATEGORY_ORIGINAL, c.BUSINESS_OR_PERSON, c.CATEGORY]
+
+
+def to_compact_dtypes(df):
+    """Converts the transaction columns present in df to compact types, with dates as datetime64.
+
+    Converting a frame that is already compact is cheap, so frames can be converted again after merges and concats
+    turn categories back into objects.
+    """
+    dtypes = {column: dtype for column, dtype in COMPACT_DTYPES.items() if column in df.columns}
+    df = df.astype(dtypes)
+    if c.DATE in df.columns and not pd.api.types.is_datetime64_any_dtype(df[c.DATE]):
+        df[c.DATE] = parse_dates(df[c.DATE])
+    return df
+
+
+def parse_dates(dates):
+    """Parses YYYY-MM-DD dates, falling back to truncating dates that carry a time or a time zone."""
+    try:
+        return pd.to_datetime(dates, format='%Y-%m-%d')
+    except (ValueError, TypeError):
+        return pd.to_datetime(dates.astype(str).str[:10])
+
+
+def is_text(series):
+    return pd.api.types.is_object_dtype(series) or isinstance(series.dtype, (pd.CategoricalDtype, pd.StringDtype))
+
+
+def is_date(series):
+    return pd.api.types.is_datetime64_any_dtype(series) or pd.api.types.is_object_dtype(series)
+
+
+def is_integer(series):
+    return pd.api.types.is_integer_dtype(series)
+
+
+def format_dates(df):
+    """Returns df with dates formatted as YYYY-MM-DD strings, the way they are stored.
+
+    Dates read as strings may carry a time or a time zone, e.g. Notion dates, which is dropped like parse_dates does
+    so a transaction is stored with the same date however it was read.
+    """
+    if c.DATE not in df.columns:
+        return df
+    if pd.api.types.is_datetime64_any_dtype(df[c.DATE]):
+        # NumPy formats days much faster than strftime.
+        return df.assign(**{c.DATE: df[c.DATE].to_numpy().astype('datetime64[D]').astype(str).astype(object)})
+    return df.assign(**{c.DATE: df[c.DATE].astype(str).str[:10].astype(object)})
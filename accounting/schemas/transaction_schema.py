@@ -1,20 +1,41 @@
+from typing import Any, Optional
+
 import pandas as pd
 import pandera as pa
 from pandera.typing import DataFrame, Series
 
 from accounting import constant as c
+from accounting.schemas.dtypes import TEXT_COLUMNS, is_date, is_integer, is_text
 from accounting.transaction_category import get_valid_categories
 
 class TransactionSchema(pa.DataFrameModel):
-    date: object
-    card_number: int
-    business_or_person_original: object
-    category_original: object
+    # Columns may use either the object and int64 types or the compact types of to_compact_dtypes.
+    date: Any
+    card_number: Any
+    business_or_person_original: Any
+    category_original: Any = pa.Field(nullable=True)
     debit: float = pa.Field(nullable=True)
     credit: float = pa.Field(nullable=True)
-    business_or_person: object
-    category: object = pa.Field(isin=get_valid_categories())
-    sequence: int
+    business_or_person: Any
+    category: Any
+    sequence: Any
+
+    @pa.check(c.DATE)
+    def date_is_date(cls, date: Series[Any]) -> bool:
+        return is_date(date)
+
+    @pa.check(c.CARD_NUMBER, c.SEQUENCE)
+    def number_is_integer(cls, number: Series[Any]) -> bool:
+        return is_integer(number)
+
+    @pa.check(*TEXT_COLUMNS)
+    def text_is_text(cls, text: Series[Any]) -> bool:
+        return is_text(text)
+
+    @pa.check(c.CATEGORY)
+    def category_is_valid(cls, category: Series[object]) -> Series[bool]:
+        # Categories are read when validating rather than when the schema is defined.
+        return category.isin(get_valid_categories() | {c.UNCATEGORIZED})
 
 class CashTransactionSchema(pa.DataFrameModel):
     date: object
@@ -23,9 +44,13 @@ class CashTransactionSchema(pa.DataFrameModel):
     debit: float = pa.Field(nullable=True)
     credit: float = pa.Field(nullable=True)
     business_or_person: object
-    category: object = pa.Field(isin=get_valid_categories())
+    category: object
     sequence: int
 
+    @pa.check(c.CATEGORY)
+    def category_is_valid(cls, category: Series[object]) -> Series[bool]:
+        return category.isin(get_valid_categories())
+
 class CapitalOneTransactionSchema(pa.DataFrameModel):
     transaction_date: object = pa.Field(alias=c.CAP_ONE_TRANSACTION_DATE)
     posted_date: object = pa.Field(alias=c.CAP_ONE_POSTED_DATE)
@@ -34,3 +59,27 @@ class CapitalOneTransactionSchema(pa.DataFrameModel):
     category: object = pa.Field(alias=c.CAP_ONE_CATEGORY)
     debit: float = pa.Field(alias=c.CAP_ONE_DEBIT, nullable=True)
     credit: float = pa.Field(alias=c.CAP_ONE_CREDIT, nullable=True)
+
+class ChaseTransactionSchema(pa.DataFrameModel):
+    transaction_date: object = pa.Field(alias=c.CHASE_TRANSACTION_DATE)
+    post_date: object = pa.Field(alias=c.CHASE_POST_DATE)
+    description: object = pa.Field(alias=c.CHASE_DESCRIPTION)
+    category: object = pa.Field(alias=c.CHASE_CATEGORY, nullable=True)
+    type: object = pa.Field(alias=c.CHASE_TYPE)
+    amount: float = pa.Field(alias=c.CHASE_AMOUNT)
+    memo: object = pa.Field(alias=c.CHASE_MEMO, nullable=True)
+
+class AmericanExpressTransactionSchema(pa.DataFrameModel):
+    date: object = pa.Field(alias=c.AMEX_DATE)
+    description: object = pa.Field(alias=c.AMEX_DESCRIPTION)
+    amount: float = pa.Field(alias=c.AMEX_AMOUNT)
+    account_number: Optional[Series[object]] = pa.Field(alias=c.AMEX_ACCOUNT_NUMBER, nullable=True)
+    category: Optional[Series[object]] = pa.Field(alias=c.AMEX_CATEGORY, nullable=True)
+
+class OFXTransactionSchema(pa.DataFrameModel):
+    transaction_type: object = pa.Field(alias=c.OFX_TRANSACTION_TYPE)
+    date_posted: object = pa.Field(alias=c.OFX_DATE_POSTED)
+    amount: float = pa.Field(alias=c.OFX_AMOUNT)
+    name: object = pa.Field(alias=c.OFX_NAME, nullable=True)
+    memo: object = pa.Field(alias=c.OFX_MEMO, nullable=True)
+    account_id: object = pa.Field(alias=c.OFX_ACCOUNT_ID)
@@ -0,0 +1,81 @@
+from functools import lru_cache
+import os
+
+import accounting.constant as c
+
+FULL = 'full'
+SAMPLE = 'sample'
+FAST = 'fast'
+OFF = 'off'
+VALIDATION_LEVELS = [FULL, SAMPLE, FAST, OFF]
+
+# Number of rows checked by pandera when validating at the sample level.
+SAMPLE_SIZE = 1_000
+
+validation_level = None
+
+
+def set_validation_level(level):
+    """Overrides the VALIDATION_LEVEL environment variable for the rest of the process."""
+    global validation_level
+    if level not in VALIDATION_LEVELS:
+        raise ValueError(f"Unknown validation level '{level}'. Use one of {VALIDATION_LEVELS}.")
+    validation_level = level
+
+
+def get_validation_level():
+    return validation_level or os.getenv(c.VALIDATION_LEVEL_KEY, FULL)
+
+
+@lru_cache(maxsize=None)
+def get_schema(schema_model):
+    """Builds the pandera schema of a DataFrameModel once."""
+    return schema_model.to_schema()
+
+
+def validate(df, schema_model, level=None):
+    """Validates a dataframe against a DataFrameModel.
+
+    Levels:
+        full: Run every pandera check on every row.
+        sample: Check column dtypes on every row and run pandera's value checks on a random sample of rows.
+        fast: Run vectorized column, dtype, nullability, and value checks without pandera's error reporting.
+        off: Skip validation.
+
+    A failed fast check falls back to full validation so errors are always reported as pandera SchemaErrors.
+    """
+    level = level or get_validation_level()
+    if level == OFF:
+        return df
+
+    schema = get_schema(schema_model)
+    if level == SAMPLE and len(df) > SAMPLE_SIZE:
+        schema.validate(df, sample=SAMPLE_SIZE, random_state=0, lazy=True)
+        return df
+    if level == FAST and passes_fast_checks(df, schema):
+        return df
+    return schema.validate(df, lazy=True)
+
+
+def passes_fast_checks(df, schema):
+    """Returns whether every column exists with the right dtype, has no unexpected nulls, and passes its checks."""
+    from pandera.engines import pandas_engine
+
+    for name, column in schema.columns.items():
+        if name not in df.columns:
+            if column.required:
+                return False
+            continue
+
+        series = df[name]
+        if column.dtype is not None and not column.dtype.check(pandas_engine.Engine.dtype(series.dtype)):
+            return False
+        if not column.nullable and series.isna().any():
+            return False
+
+        values = series.dropna() if column.nullable else series
+        for check in column.checks:
+            if not bool(check(values).check_passed):
+                return False
+
+    return True
@@ -0,0 +1,173 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+import accounting.constant as c
+from accounting.schemas.dtypes import format_dates
+from accounting.stores.merchant_store import QUERY_BATCH_SIZE
+
+EXPORT_CHUNK_SIZE = 100_000
+DATE_MIGRATION = 'date_format'
+
+SQL_COLUMN_TYPES = {
+    c.DATE: 'TEXT NOT NULL',
+    c.CARD_NUMBER: 'INTEGER NOT NULL',
+    c.BUSINESS_OR_PERSON_ORIGINAL: 'TEXT',
+    c.CATEGORY_ORIGINAL: 'TEXT',
+    c.DEBIT: 'REAL',
+    c.CREDIT: 'REAL',
+    c.BUSINESS_OR_PERSON: 'TEXT',
+    c.CATEGORY: 'TEXT',
+    c.SEQUENCE: 'INTEGER NOT NULL',
+}
+
+
+class SQLiteHistoryStore:
+    """Append-only transaction history stored in SQLite.
+
+    A unique index on (date, business_or_person_original, debit, sequence) makes inserts idempotent, so adding
+    transactions costs time proportional to the new rows rather than the whole history.
+
+    Attributes:
+        db_path (str): The location of the SQLite database.
+        aggregates_path (str): The SQLite database holding spending aggregates, the history database itself.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.aggregates_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+
+        columns = ', '.join(f'{column} {SQL_COLUMN_TYPES[column]}' for column in c.HISTORY_COLUMNS)
+        with self.connection:
+            self.connection.execute(f'CREATE TABLE IF NOT EXISTS transactions ({columns})')
+            # Debit is null for credits; IFNULL keeps null debits equal to each other like drop_duplicates does.
+            self.connection.execute(f'''
+                CREATE UNIQUE INDEX IF NOT EXISTS transactions_identifier ON transactions (
+                    {c.DATE}, {c.BUSINESS_OR_PERSON_ORIGINAL}, IFNULL({c.DEBIT}, ''), {c.SEQUENCE})''')
+            self.connection.execute(f'''
+                CREATE INDEX IF NOT EXISTS transactions_order ON transactions (
+                    {c.DATE} DESC, {c.CATEGORY}, {c.BUSINESS_OR_PERSON})''')
+            # Finds the uncategorized transactions of a business when backfilling reviewed categories.
+            self.connection.execute(f'''
+                CREATE INDEX IF NOT EXISTS transactions_category ON transactions ({c.CATEGORY}, {c.BUSINESS_OR_PERSON})''')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY)')
+
+    def insert(self, df):
+        """Inserts transactions that aren't in the history yet and returns them as a dataframe."""
+        df = format_dates(df[c.HISTORY_COLUMNS])
+        rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+        columns = ', '.join(c.HISTORY_COLUMNS)
+        placeholders = ', '.join('?' * len(c.HISTORY_COLUMNS))
+
+        with self.connection:
+            last_rowid = self.connection.execute('SELECT IFNULL(MAX(rowid), 0) FROM transactions').fetchone()[0]
+            self.connection.executemany(
+                f'INSERT OR IGNORE INTO transactions ({columns}) VALUES ({placeholders})', rows)
+
+        return pd.read_sql_query(
+            f'SELECT {columns} FROM transactions WHERE rowid > ? ORDER BY rowid', self.connection,
+            params=(last_rowid,))
+
+    def read(self, start=None, end=None, categories=None, chunksize=None):
+        """Returns the history sorted by date, category, and business using the ordering index.
+
+        Args:
+            start (str): The first date to include, e.g. '2024-01-01'.
+            end (str): The last date to include.
+            categories ([str]): Only include transactions in these categories.
+            chunksize (int): Return an iterator of dataframes with this many rows each.
+        """
+        conditions, params = [], []
+        if start is not None:
+            conditions.append(f'{c.DATE} >= ?')
+            params.append(str(start))
+        if end is not None:
+            # Dates may carry a time, so compare against the start of the next day.
+            conditions.append(f"{c.DATE} < DATE(?, '+1 day')")
+            params.append(str(end))
+        if categories is not None:
+            categories = list(categories)
+            conditions.append(f'{c.CATEGORY} IN ({", ".join("?" * len(categories))})')
+            params.extend(categories)
+        where = f'WHERE {" AND ".join(conditions)} ' if conditions else ''
+
+        return pd.read_sql_query(
+            f'SELECT {", ".join(c.HISTORY_COLUMNS)} FROM transactions {where}'
+            f'ORDER BY {c.DATE} DESC, {c.CATEGORY}, {c.BUSINESS_OR_PERSON}',
+            self.connection, params=params, chunksize=chunksize)
+
+    def recategorize(self, mappings, predictions=None):
+        """Gives each business in {business: category} mappings its category in one transaction.
+
+        Only uncategorized transactions and the ones with the business's predicted category in {business: category}
+        predictions are moved. Returns the moved transactions as they were before the update.
+        """
+        predictions = predictions or {}
+        businesses = list(mappings)
+        columns = ', '.join(c.HISTORY_COLUMNS)
+        updates = [(new_category, c.UNCATEGORIZED, predictions.get(business, c.UNCATEGORIZED), business)
+                   for business, new_category in mappings.items()]
+        moved_dfs = []
+
+        with self.connection:
+            for i in range(0, len(businesses), QUERY_BATCH_SIZE):
+                batch = businesses[i:i + QUERY_BATCH_SIZE]
+                predicted = {predictions[business] for business in batch if business in predictions}
+                categories = sorted(predicted | {c.UNCATEGORIZED})
+                df = pd.read_sql_query(
+                    f'SELECT {columns} FROM transactions WHERE {c.CATEGORY} IN ({", ".join("?" * len(categories))}) '
+                    f'AND {c.BUSINESS_OR_PERSON} IN ({", ".join("?" * len(batch))})', self.connection,
+                    params=categories + batch)
+                moved_dfs.append(df[is_moved(df, predictions)])
+            self.connection.executemany(
+                f'UPDATE transactions SET {c.CATEGORY} = ? '
+                f'WHERE {c.CATEGORY} IN (?, ?) AND {c.BUSINESS_OR_PERSON} = ?', updates)
+        return pd.concat(moved_dfs, ignore_index=True) if moved_dfs else pd.DataFrame(columns=c.HISTORY_COLUMNS)
+
+    def count(self):
+        return self.connection.execute('SELECT COUNT(*) FROM transactions').fetchone()[0]
+
+    def export_csv(self, file_path):
+        """Writes the sorted history to a CSV in the format of transactions_history.csv."""
+        pd.DataFrame(columns=c.HISTORY_COLUMNS).to_csv(file_path, index=False)
+        for chunk in self.read(chunksize=EXPORT_CHUNK_SIZE):
+            chunk.to_csv(file_path, index=False, mode='a', header=False)
+
+    def migrate_from_csv(self, csv_path):
+        """Imports an existing transactions_history.csv once."""
+        self.migrate_dates()
+        migration = os.path.basename(csv_path)
+        if self.connection.execute('SELECT 1 FROM migrations WHERE name = ?', (migration,)).fetchone():
+            return
+        if os.path.exists(csv_path):
+            added_df = self.insert(pd.read_csv(csv_path))
+            print(f"Migrated {len(added_df)} transactions from {csv_path}.")
+        with self.connection:
+            self.connection.execute('INSERT INTO migrations (name) VALUES (?)', (migration,))
+
+    def migrate_dates(self):
+        """Drops the time of dates stored with one once, so they match the dates of transactions inserted since.
+
+        Transactions that were stored again under the shorter date are removed.
+        """
+        if self.connection.execute('SELECT 1 FROM migrations WHERE name = ?', (DATE_MIGRATION,)).fetchone():
+            return
+        with self.connection:
+            self.connection.execute(
+                f'UPDATE OR IGNORE transactions SET {c.DATE} = SUBSTR({c.DATE}, 1, 10) WHERE LENGTH({c.DATE}) > 10')
+            removed = self.connection.execute(f'DELETE FROM transactions WHERE LENGTH({c.DATE}) > 10').rowcount
+            self.connection.execute('INSERT INTO migrations (name) VALUES (?)', (DATE_MIGRATION,))
+        if removed:
+            print(f"Removed {removed} transactions stored twice with and without a time.")
+
+    def close(self):
+        self.connection.close()
+
+
+def is_moved(df, predictions):
+    """Returns whether each transaction is uncategorized or has its business's predicted category."""
+    predicted = df[c.BUSINESS_OR_PERSON].map(predictions).astype(object)
+    return (df[c.CATEGORY] == c.UNCATEGORIZED) | (df[c.CATEGORY] == predicted)
@@ -0,0 +1,149 @@
+from datetime import datetime
+from functools import lru_cache
+import hashlib
+import sqlite3
+
+import pandas as pd
+
+import accounting.constant as c
+from accounting.schemas.dtypes import parse_dates
+
+# Bytes read at a time when hashing a statement.
+HASH_CHUNK_SIZE = 1024 * 1024
+ROW_HASH = 'row_hash'
+HISTORY_MIGRATION = 'transactions_history'
+
+
+@lru_cache(maxsize=None)
+def get_ingestion_ledger():
+    """Opens the ingestion ledger once per process."""
+    return IngestionLedger(c.INGESTION_LEDGER_DB_PATH)
+
+
+class IngestionLedger:
+    """A record of the statement files and transactions that have been imported.
+
+    Files are identified by the SHA-256 of their content. Transactions are identified by a hash of their date, card,
+    business, and debit, stored with the highest sequence imported so far, so repeated identical transactions are
+    counted rather than collapsed.
+
+    Attributes:
+        db_path (str): The location of the SQLite database.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        with self.connection:
+            self.connection.execute('''
+                CREATE TABLE IF NOT EXISTS files (
+                    file_hash TEXT PRIMARY KEY,
+                    file_name TEXT NOT NULL,
+                    ingested_at TEXT NOT NULL
+                ) WITHOUT ROWID''')
+            self.connection.execute('''
+                CREATE TABLE IF NOT EXISTS rows (
+                    row_hash INTEGER PRIMARY KEY,
+                    sequence INTEGER NOT NULL
+                )''')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY)')
+            self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS lookup (row_hash INTEGER PRIMARY KEY)')
+
+    # Files
+
+    def has_file(self, file_hash):
+        return self.connection.execute('SELECT 1 FROM files WHERE file_hash = ?', (file_hash,)).fetchone() is not None
+
+    def add_file(self, file_hash, file_name):
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR IGNORE INTO files (file_hash, file_name, ingested_at) VALUES (?, ?, ?)',
+                (file_hash, file_name, datetime.now().isoformat(timespec='seconds')))
+
+    # Rows
+
+    def get_sequences(self, row_hashes):
+        """Returns the highest imported sequence of each row hash, as a series indexed by hash."""
+        with self.connection:
+            self.connection.execute('DELETE FROM lookup')
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO lookup (row_hash) VALUES (?)', ((int(row_hash),) for row_hash in row_hashes))
+            rows = self.connection.execute(
+                'SELECT rows.row_hash, rows.sequence FROM lookup JOIN rows ON rows.row_hash = lookup.row_hash').fetchall()
+        return pd.Series(dict(rows), dtype='int64')
+
+    def add_rows(self, sequences):
+        """Records the highest sequence of each row hash in a series indexed by hash (see get_row_sequences)."""
+        with self.connection:
+            self.connection.executemany('''
+                INSERT INTO rows (row_hash, sequence) VALUES (?, ?)
+                ON CONFLICT (row_hash) DO UPDATE SET sequence = MAX(sequence, excluded.sequence)''',
+                ((int(row_hash), int(sequence)) for row_hash, sequence in sequences.items()))
+
+    def filter_imported(self, df, pending_sequences=None):
+        """Returns the transactions of df whose sequence is higher than the one imported for the same transaction.
+
+        df is numbered by set_unique_identifiers, so a statement overlapping an imported one repeats its sequences and
+        only the transactions past the overlap are kept. The kept rows carry a row_hash column.
+
+        Args:
+            df (DataFrame): The numbered transactions of one statement.
+            pending_sequences (Series): The highest sequence of each row hash in statements of the same import that
+                aren't recorded yet.
+        """
+        df = df.assign(**{ROW_HASH: hash_rows(df)})
+        imported = self.get_sequences(df[ROW_HASH].unique())
+        if pending_sequences is not None and not pending_sequences.empty:
+            imported = pd.concat([imported, pending_sequences]).groupby(level=0).max()
+        if imported.empty:
+            return df
+        imported_sequences = df[ROW_HASH].map(imported).fillna(0).to_numpy()
+        return df[df[c.SEQUENCE].to_numpy() > imported_sequences]
+
+    def migrate_from_history(self, store):
+        """Records the transactions already in the history store once, so they're recognized in overlapping statements."""
+        if self.connection.execute(
+                'SELECT 1 FROM migrations WHERE name = ?', (HISTORY_MIGRATION,)).fetchone():
+            return
+        history_df = store.read()
+        if not history_df.empty:
+            self.add_rows(get_row_sequences(history_df.assign(**{ROW_HASH: hash_rows(history_df)})))
+        with self.connection:
+            self.connection.execute('INSERT INTO migrations (name) VALUES (?)', (HISTORY_MIGRATION,))
+
+    def close(self):
+        self.connection.close()
+
+
+def hash_file(file_path):
+    """Returns the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_row_sequences(df, sequences=None):
+    """Returns the highest sequence of each row hash in df and in earlier sequences, as a series indexed by hash."""
+    row_sequences = df.groupby(ROW_HASH)[c.SEQUENCE].max().astype('int64')
+    if sequences is not None:
+        row_sequences = pd.concat([sequences, row_sequences]).groupby(level=0).max()
+    return row_sequences
+
+
+def hash_rows(df):
+    """Returns a 64-bit hash of the date, card, business, and debit of every transaction.
+
+    Columns are converted to the same types first so statements and the history hash identically whatever dtypes
+    they were read with.
+    """
+    key_df = pd.DataFrame({
+        c.DATE: parse_dates(df[c.DATE]).to_numpy(),
+        c.CARD_NUMBER: df[c.CARD_NUMBER].astype('int64').to_numpy(),
+        c.BUSINESS_OR_PERSON_ORIGINAL: df[c.BUSINESS_OR_PERSON_ORIGINAL].astype(object).to_numpy(),
+        c.DEBIT: df[c.DEBIT].astype('float64').to_numpy(),
+    })
+    # SQLite integers are signed.
+    return pd.util.hash_pandas_object(key_df, index=False).to_numpy().view('int64')
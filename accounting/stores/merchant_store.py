@@ -0,0 +1,201 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+import accounting.constant as c
+from accounting.merchant_normalization import normalize_merchant_names
+
+# SQLite limits the number of parameters in a single query.
+QUERY_BATCH_SIZE = 500
+REVIEW_QUEUE_COLUMNS = [c.BUSINESS_OR_PERSON, c.BUSINESS_OR_PERSON_ORIGINAL, c.CATEGORY_ORIGINAL, c.DEBIT, c.CATEGORY]
+NORMALIZATION_MIGRATION = 'merchant_normalization'
+
+
+class MerchantCategoryStore:
+    """A persistent business to category mapping stored in SQLite with an in-process read-through cache.
+
+    Attributes:
+        db_path (str): The location of the SQLite database.
+        cache ({str:str}): Categories looked up so far, with None for businesses that aren't stored.
+        data_version (int): SQLite's data version when the cache was last known to be current. It changes when another
+            connection, e.g. `review` while the watcher runs, commits to the store.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.cache = {}
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        with self.connection:
+            self.connection.execute(f'''
+                CREATE TABLE IF NOT EXISTS merchant_categories (
+                    {c.BUSINESS_OR_PERSON} TEXT PRIMARY KEY,
+                    {c.CATEGORY} TEXT NOT NULL
+                ) WITHOUT ROWID''')
+            # Businesses the model couldn't categorize or the classifier predicted, once each, with a transaction to
+            # help the reviewer and the predicted category, null when there is none.
+            self.connection.execute(f'''
+                CREATE TABLE IF NOT EXISTS review_queue (
+                    {c.BUSINESS_OR_PERSON} TEXT PRIMARY KEY,
+                    {c.BUSINESS_OR_PERSON_ORIGINAL} TEXT,
+                    {c.CATEGORY_ORIGINAL} TEXT,
+                    {c.DEBIT} REAL,
+                    {c.CATEGORY} TEXT
+                ) WITHOUT ROWID''')
+            queue_columns = [row[1] for row in self.connection.execute('PRAGMA table_info(review_queue)')]
+            if c.CATEGORY not in queue_columns:
+                self.connection.execute(f'ALTER TABLE review_queue ADD COLUMN {c.CATEGORY} TEXT')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY)')
+        self.data_version = self.get_data_version()
+
+    def get_data_version(self):
+        return self.connection.execute('PRAGMA data_version').fetchone()[0]
+
+    def refresh(self):
+        """Clears the cache when another connection changed the store since the last refresh. Returns whether it did."""
+        data_version = self.get_data_version()
+        if data_version == self.data_version:
+            return False
+        self.data_version = data_version
+        self.cache.clear()
+        return True
+
+    def get_categories(self, businesses):
+        """Returns a {business: category} dict for the businesses that have been categorized."""
+        businesses = set(businesses)
+        uncached = [business for business in businesses if business not in self.cache]
+
+        for i in range(0, len(uncached), QUERY_BATCH_SIZE):
+            batch = uncached[i:i + QUERY_BATCH_SIZE]
+            self.cache.update(dict.fromkeys(batch))
+            placeholders = ', '.join('?' * len(batch))
+            rows = self.connection.execute(
+                f'SELECT {c.BUSINESS_OR_PERSON}, {c.CATEGORY} FROM merchant_categories '
+                f'WHERE {c.BUSINESS_OR_PERSON} IN ({placeholders})', batch)
+            self.cache.update(rows)
+
+        return {business: self.cache[business] for business in businesses if self.cache[business] is not None}
+
+    def upsert(self, mappings):
+        """Adds or replaces {business: category} mappings in a single transaction."""
+        with self.connection:
+            self.connection.executemany(
+                f'INSERT INTO merchant_categories ({c.BUSINESS_OR_PERSON}, {c.CATEGORY}) VALUES (?, ?) '
+                f'ON CONFLICT({c.BUSINESS_OR_PERSON}) DO UPDATE SET {c.CATEGORY} = excluded.{c.CATEGORY}',
+                mappings.items())
+        self.cache.update(mappings)
+
+    def add(self, mappings):
+        """Adds {business: category} mappings of businesses that aren't stored yet in a single transaction, keeping
+        the categories that are, e.g. reviewed ones. Returns the stored category of every business."""
+        with self.connection:
+            self.connection.executemany(
+                f'INSERT INTO merchant_categories ({c.BUSINESS_OR_PERSON}, {c.CATEGORY}) VALUES (?, ?) '
+                f'ON CONFLICT({c.BUSINESS_OR_PERSON}) DO NOTHING', mappings.items())
+        for business in mappings:
+            self.cache.pop(business, None)
+        return self.get_categories(mappings)
+
+    # Review queue
+
+    def queue_for_review(self, df):
+        """Adds the businesses of df to the review queue with their predicted category, null for businesses that
+        have none, ignoring businesses that are already queued."""
+        df = df[REVIEW_QUEUE_COLUMNS].astype(object)
+        rows = df.where(df.notna(), None).itertuples(index=False, name=None)
+        with self.connection:
+            self.connection.executemany(
+                f'INSERT OR IGNORE INTO review_queue ({", ".join(REVIEW_QUEUE_COLUMNS)}) '
+                f'VALUES ({", ".join("?" * len(REVIEW_QUEUE_COLUMNS))})', rows)
+
+    def get_queued(self, businesses):
+        """Returns a {business: predicted category} dict of the businesses that are waiting for review."""
+        businesses = list(set(businesses))
+        queued = {}
+        for i in range(0, len(businesses), QUERY_BATCH_SIZE):
+            batch = businesses[i:i + QUERY_BATCH_SIZE]
+            rows = self.connection.execute(
+                f'SELECT {c.BUSINESS_OR_PERSON}, {c.CATEGORY} FROM review_queue '
+                f'WHERE {c.BUSINESS_OR_PERSON} IN ({", ".join("?" * len(batch))})', batch)
+            queued.update(rows)
+        return queued
+
+    def get_review_queue(self):
+        return pd.read_sql_query(
+            f'SELECT {", ".join(REVIEW_QUEUE_COLUMNS)} FROM review_queue ORDER BY {c.BUSINESS_OR_PERSON}',
+            self.connection)
+
+    def resolve(self, mappings):
+        """Stores reviewed {business: category} mappings and removes them from the review queue in one transaction.
+
+        Returns the {business: predicted category} of the resolved businesses that had a prediction.
+        """
+        predictions = {business: category for business, category in self.get_queued(mappings).items() if category}
+        with self.connection:
+            self.connection.executemany(
+                f'INSERT INTO merchant_categories ({c.BUSINESS_OR_PERSON}, {c.CATEGORY}) VALUES (?, ?) '
+                f'ON CONFLICT({c.BUSINESS_OR_PERSON}) DO UPDATE SET {c.CATEGORY} = excluded.{c.CATEGORY}',
+                mappings.items())
+            self.connection.executemany(
+                f'DELETE FROM review_queue WHERE {c.BUSINESS_OR_PERSON} = ?', [(business,) for business in mappings])
+        self.cache.update(mappings)
+        return predictions
+
+    def to_dataframe(self):
+        return pd.read_sql_query(
+            f'SELECT {c.BUSINESS_OR_PERSON}, {c.CATEGORY} FROM merchant_categories ORDER BY {c.BUSINESS_OR_PERSON}',
+            self.connection)
+
+    def migrate_from_csv(self, csv_path):
+        """Imports a categorized_businesses.csv file once. Later rows win when a business appears more than once."""
+        migration = os.path.basename(csv_path)
+        if self.connection.execute('SELECT 1 FROM migrations WHERE name = ?', (migration,)).fetchone():
+            return
+        if os.path.exists(csv_path):
+            df = pd.read_csv(csv_path).dropna(subset=[c.BUSINESS_OR_PERSON, c.CATEGORY])
+            df = df.drop_duplicates(subset=[c.BUSINESS_OR_PERSON], keep='last')
+            self.upsert(dict(zip(df[c.BUSINESS_OR_PERSON], df[c.CATEGORY])))
+            print(f"Migrated {len(df)} categorized businesses from {csv_path}.")
+        with self.connection:
+            self.connection.execute('INSERT INTO migrations (name) VALUES (?)', (migration,))
+
+    def migrate_business_names(self):
+        """Renames businesses stored before the normalization rules of merchant_normalization once.
+
+        Businesses were stored with only store numbers removed, so names like "sq *blue bottle" wouldn't match the
+        names of new transactions anymore. A business that is already stored under its new name keeps its category,
+        otherwise the first of the old names that collapse into the same name wins.
+        """
+        if self.connection.execute(
+                'SELECT 1 FROM migrations WHERE name = ?', (NORMALIZATION_MIGRATION,)).fetchone():
+            return
+        df = self.to_dataframe()
+        df['name'] = normalize_merchant_names(df[c.BUSINESS_OR_PERSON])
+        old_df = df[df['name'] != df[c.BUSINESS_OR_PERSON]]
+        renamed_df = old_df[~old_df['name'].isin(df[c.BUSINESS_OR_PERSON])].drop_duplicates(subset=['name'])
+        queued_df = self.get_review_queue()[[c.BUSINESS_OR_PERSON]]
+        queued_df['name'] = normalize_merchant_names(queued_df[c.BUSINESS_OR_PERSON])
+        renamed_queue = list(queued_df.loc[queued_df['name'] != queued_df[c.BUSINESS_OR_PERSON]].itertuples(
+            index=False, name=None))
+
+        with self.connection:
+            self.connection.executemany(
+                f'DELETE FROM merchant_categories WHERE {c.BUSINESS_OR_PERSON} = ?',
+                [(business,) for business in old_df[c.BUSINESS_OR_PERSON]])
+            self.connection.executemany(
+                f'INSERT INTO merchant_categories ({c.BUSINESS_OR_PERSON}, {c.CATEGORY}) VALUES (?, ?)',
+                zip(renamed_df['name'], renamed_df[c.CATEGORY]))
+            # Queued businesses are renamed too, dropping the ones that are already queued under their new name.
+            self.connection.executemany(
+                f'UPDATE OR IGNORE review_queue SET {c.BUSINESS_OR_PERSON} = ? WHERE {c.BUSINESS_OR_PERSON} = ?',
+                [(name, business) for business, name in renamed_queue])
+            self.connection.executemany(
+                f'DELETE FROM review_queue WHERE {c.BUSINESS_OR_PERSON} = ?', [(business,) for business, _ in renamed_queue])
+            self.connection.execute('INSERT INTO migrations (name) VALUES (?)', (NORMALIZATION_MIGRATION,))
+        self.cache.clear()
+        if not renamed_df.empty:
+            print(f"Renamed {len(renamed_df)} categorized businesses with the current normalization rules.")
+
+    def close(self):
+        self.connection.close()
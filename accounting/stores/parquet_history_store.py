@@ -0,0 +1,184 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import accounting.constant as c
+from accounting.schemas.dtypes import TEXT_COLUMNS
+from accounting.stores.history_store import is_moved
+
+YEAR = 'year'
+MONTH = 'month'
+PARTITION_FILE_NAME = 'part-0.parquet'
+# Files starting with an underscore are skipped when reading the dataset.
+AGGREGATES_FILE_NAME = '_spending_aggregates.sqlite'
+
+# Column types matching TransactionSchema, with real dates instead of strings.
+SCHEMA = pa.schema([
+    (c.DATE, pa.date32()),
+    (c.CARD_NUMBER, pa.int64()),
+    (c.BUSINESS_OR_PERSON_ORIGINAL, pa.string()),
+    (c.CATEGORY_ORIGINAL, pa.string()),
+    (c.DEBIT, pa.float64()),
+    (c.CREDIT, pa.float64()),
+    (c.BUSINESS_OR_PERSON, pa.string()),
+    (c.CATEGORY, pa.string()),
+    (c.SEQUENCE, pa.int64()),
+])
+PARTITION_SCHEMA = pa.schema([(YEAR, pa.int16()), (MONTH, pa.int8())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+DATASET_SCHEMA = pa.unify_schemas([SCHEMA, PARTITION_SCHEMA])
+IDENTIFIER_COLUMNS = [c.DATE, c.BUSINESS_OR_PERSON_ORIGINAL, c.DEBIT, c.SEQUENCE]
+
+
+class ParquetHistoryStore:
+    """Transaction history stored as typed Parquet files partitioned by year and month.
+
+    Inserts only rewrite the month partitions that receive new transactions, and reads filtered by date skip
+    partitions outside the range.
+
+    Attributes:
+        root_path (str): The directory holding the year=YYYY/month=M partitions.
+        aggregates_path (str): The SQLite database holding spending aggregates, ignored by dataset reads.
+    """
+
+    def __init__(self, root_path):
+        self.root_path = root_path
+        self.aggregates_path = os.path.join(root_path, AGGREGATES_FILE_NAME)
+        os.makedirs(root_path, exist_ok=True)
+
+    def partition_path(self, year, month):
+        return os.path.join(self.root_path, f'{YEAR}={year}', f'{MONTH}={month}', PARTITION_FILE_NAME)
+
+    def insert(self, df):
+        """Inserts transactions that aren't in the history yet and returns them as a dataframe."""
+        df = to_history_dtypes(df[c.HISTORY_COLUMNS])
+        df = df.drop_duplicates(subset=IDENTIFIER_COLUMNS)
+        added_dfs = []
+
+        for (year, month), partition_df in df.groupby([df[c.DATE].dt.year, df[c.DATE].dt.month]):
+            file_path = self.partition_path(year, month)
+            if os.path.exists(file_path):
+                existing_df = pq.read_table(file_path, schema=SCHEMA).to_pandas(date_as_object=False)
+                existing_keys = existing_df[IDENTIFIER_COLUMNS].drop_duplicates()
+                partition_df = partition_df.merge(existing_keys, on=IDENTIFIER_COLUMNS, how='left', indicator=True)
+                partition_df = partition_df[partition_df['_merge'] == 'left_only'].drop(columns='_merge')
+                if partition_df.empty:
+                    continue
+                self.write_partition(pd.concat([existing_df, partition_df], ignore_index=True), file_path)
+            else:
+                self.write_partition(partition_df, file_path)
+
+            added_dfs.append(partition_df)
+
+        if not added_dfs:
+            return to_history_dtypes(pd.DataFrame(columns=c.HISTORY_COLUMNS))
+        return pd.concat(added_dfs, ignore_index=True)
+
+    def write_partition(self, df, file_path):
+        # Sorting by category keeps row group statistics selective for category filters.
+        df = df.sort_values(by=[c.CATEGORY, c.DATE, c.BUSINESS_OR_PERSON])
+        table = pa.Table.from_pandas(df[c.HISTORY_COLUMNS], schema=SCHEMA, preserve_index=False)
+
+        # Write next to the partition and swap it in so a crash never leaves a partial file.
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        # Dataset reads ignore files starting with '.', so a leftover temp file is never read.
+        temp_file_path = os.path.join(os.path.dirname(file_path), f'.{PARTITION_FILE_NAME}.tmp')
+        pq.write_table(table, temp_file_path)
+        os.replace(temp_file_path, file_path)
+
+    def dataset(self):
+        return ds.dataset(
+            self.root_path, schema=DATASET_SCHEMA, format='parquet', partitioning=PARTITIONING)
+
+    def read(self, start=None, end=None, categories=None):
+        """Returns the history sorted by date, category, and business.
+
+        Args:
+            start (str): The first date to include, e.g. '2024-01-01'.
+            end (str): The last date to include.
+            categories ([str]): Only include transactions in these categories.
+        """
+        dataset = self.dataset()
+        table = dataset.to_table(columns=c.HISTORY_COLUMNS, filter=build_filter(start, end, categories))
+        table = table.sort_by([(c.DATE, 'descending'), (c.CATEGORY, 'ascending'), (c.BUSINESS_OR_PERSON, 'ascending')])
+        # Release Arrow buffers column by column while converting to keep peak memory down.
+        return table.to_pandas(date_as_object=False, split_blocks=True, self_destruct=True)
+
+    def recategorize(self, mappings, predictions=None):
+        """Gives each business in {business: category} mappings its category.
+
+        Only uncategorized transactions and the ones with the business's predicted category in {business: category}
+        predictions are moved, and only the month partitions holding them are rewritten. Returns the moved
+        transactions as they were before the update.
+        """
+        predictions = predictions or {}
+        moved_df = self.read(categories=sorted({c.UNCATEGORIZED, *predictions.values()}))
+        moved_df = moved_df[moved_df[c.BUSINESS_OR_PERSON].isin(list(mappings))]
+        moved_df = moved_df[is_moved(moved_df, predictions)]
+
+        partitions = pd.DataFrame({YEAR: moved_df[c.DATE].dt.year, MONTH: moved_df[c.DATE].dt.month}).drop_duplicates()
+        for year, month in partitions.itertuples(index=False):
+            file_path = self.partition_path(year, month)
+            df = pq.read_table(file_path, schema=SCHEMA).to_pandas(date_as_object=False)
+            moved = df[c.BUSINESS_OR_PERSON].isin(list(mappings)) & is_moved(df, predictions)
+            df.loc[moved, c.CATEGORY] = df.loc[moved, c.BUSINESS_OR_PERSON].map(mappings)
+            self.write_partition(df, file_path)
+        return moved_df
+
+    def count(self):
+        return self.dataset().count_rows()
+
+    def export_csv(self, file_path):
+        """Writes the sorted history to a CSV in the format of transactions_history.csv."""
+        df = self.read()
+        df[c.DATE] = df[c.DATE].dt.strftime('%Y-%m-%d')
+        df.to_csv(file_path, index=False)
+
+    def migrate_from_csv(self, csv_path):
+        """Imports an existing transactions_history.csv once."""
+        marker_path = os.path.join(self.root_path, f'_migrated_{os.path.basename(csv_path)}')
+        if os.path.exists(marker_path):
+            return
+        if os.path.exists(csv_path):
+            added_df = self.insert(pd.read_csv(csv_path))
+            print(f"Migrated {len(added_df)} transactions from {csv_path}.")
+        open(marker_path, 'w').close()
+
+    def close(self):
+        pass
+
+
+def to_history_dtypes(df):
+    """Converts transaction history columns to the Parquet column types."""
+    return df.astype({
+        c.CARD_NUMBER: 'int64',
+        c.DEBIT: 'float64',
+        c.CREDIT: 'float64',
+        c.SEQUENCE: 'int64',
+        **{column: object for column in TEXT_COLUMNS},
+    }).assign(**{c.DATE: pd.to_datetime(df[c.DATE].astype(str).str[:10])})
+
+
+def build_filter(start=None, end=None, categories=None):
+    """Builds a dataset filter whose year and month terms let pyarrow skip partitions outside the date range."""
+    expression = None
+
+    def add(term):
+        nonlocal expression
+        expression = term if expression is None else expression & term
+
+    year, month = ds.field(YEAR), ds.field(MONTH)
+    if start is not None:
+        start = pd.Timestamp(start)
+        add((year > start.year) | ((year == start.year) & (month >= start.month)))
+        add(ds.field(c.DATE) >= pa.scalar(start.date(), pa.date32()))
+    if end is not None:
+        end = pd.Timestamp(end)
+        add((year < end.year) | ((year == end.year) & (month <= end.month)))
+        add(ds.field(c.DATE) <= pa.scalar(end.date(), pa.date32()))
+    if categories is not None:
+        add(ds.field(c.CATEGORY).isin(list(categories)))
+    return expression
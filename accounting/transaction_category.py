@@ -1,119 +1,377 @@
-from openai import OpenAI
+import asyncio
+from functools import lru_cache
+import json
 import os
+import random
+
 import pandas as pd
 from dotenv import load_dotenv
 
 import accounting.constant as c
-
-load_dotenv()
-OPENAI_API_KEY = os.getenv(c.OPEN_AI_KEY)
+from accounting.instrumentation import get_run_metrics, instrument
+from accounting.merchant_classifier import CONFIDENCE, SIMILARITY, MerchantClassifier
+from accounting.merchant_normalization import MerchantIndex
+from accounting.stores.merchant_store import MerchantCategoryStore
 
 
 def extract_categories():
-    df = pd.read_csv(c.DATA_DIRECTORY_PATH + 'categories.csv')
+    df = pd.read_csv(c.CATEGORIES_FILE_PATH)
     column_to_drop = 'Unnamed: 1'
     if column_to_drop in df.columns:
         df.drop(column_to_drop, axis=1, inplace=True)
-    pd.set_option('display.max_rows', None)
-    print("Valid Categories:")
-    print(df)
-    pd.set_option('display.max_rows', 60)
     return df
 
 
-categories_df = extract_categories()
+@lru_cache(maxsize=None)
+def get_categories_df():
+    """Reads categories.csv on first use."""
+    return extract_categories()
 
 
+@lru_cache(maxsize=None)
 def get_valid_categories():
-    return set(categories_df[c.CATEGORY])
+    return frozenset(get_categories_df()[c.CATEGORY])
+
+
+@lru_cache(maxsize=None)
+def get_merchant_store():
+    """Opens the business to category store once per process, migrating categorized_businesses.csv and businesses
+    named with older normalization rules on first use."""
+    store = MerchantCategoryStore(c.MERCHANT_CATEGORY_STORE_FILE_PATH)
+    store.migrate_from_csv(c.CATEGORIZED_BUSINESSES_FILE_PATH)
+    store.migrate_business_names()
+    return store
+
+
+@lru_cache(maxsize=None)
+def get_merchant_index():
+    """Builds the fuzzy match index over every categorized business once per process."""
+    return MerchantIndex(get_merchant_store().to_dataframe()[c.BUSINESS_OR_PERSON])
+
+
+@lru_cache(maxsize=None)
+def get_merchant_classifier():
+    """Loads the merchant classifier cached on disk once per process, learning the mappings stored since it was saved."""
+    classifier = MerchantClassifier.load(c.MERCHANT_CLASSIFIER_FILE_PATH)
+    store_df = get_merchant_store().to_dataframe()
+    if classifier.synchronize(dict(zip(store_df[c.BUSINESS_OR_PERSON], store_df[c.CATEGORY]))):
+        classifier.save(c.MERCHANT_CLASSIFIER_FILE_PATH)
+    return classifier
 
 
+def refresh_merchant_store():
+    """Drops the cached categories, fuzzy match index, and classifier when another process changed the merchant store,
+    so long-running processes such as the watcher see businesses reviewed since they started."""
+    if get_merchant_store().refresh():
+        get_merchant_index.cache_clear()
+        get_merchant_classifier.cache_clear()
+
+
+@instrument('categorize.known_merchants')
 def categorize_transactions(df):
+    refresh_merchant_store()
     df[c.CATEGORY] = df[c.CATEGORY].str.lower()
 
-    # Merge transactions with categorized_businesses_df to get correct categories
-    categorized_businesses_df = pd.read_csv(
-        c.DATA_DIRECTORY_PATH + 'categorized_businesses.csv')
-    df = pd.merge(df, categorized_businesses_df,
-                  on=c.BUSINESS_OR_PERSON, how='left')
+    # Look up categories of businesses that have been categorized before, falling back to near matches
+    store = get_merchant_store()
+    businesses = df[c.BUSINESS_OR_PERSON].dropna().unique()
+    categorized_businesses = store.get_categories(businesses)
+    exact_matches_count = len(categorized_businesses)
+
+    uncategorized_businesses = [business for business in businesses if business not in categorized_businesses]
+    near_matches = get_merchant_index().match(uncategorized_businesses)
+    near_match_categories = store.get_categories(near_matches.values())
+    for business, known_business in near_matches.items():
+        if known_business in near_match_categories:
+            categorized_businesses[business] = near_match_categories[known_business]
+
+    near_matches_count = len(categorized_businesses) - exact_matches_count
+    print_merchant_cache_hit_rate(len(businesses), exact_matches_count, near_matches_count)
+    metrics = get_run_metrics()
+    metrics.increment('merchant_exact_matches', exact_matches_count)
+    metrics.increment('merchant_near_matches', near_matches_count)
+    metrics.increment('merchant_misses', len(businesses) - len(categorized_businesses))
 
-    df = df.rename(columns={
-        'category_x': c.CATEGORY_ORIGINAL,
-        'category_y': c.CATEGORY})
+    df = df.rename(columns={c.CATEGORY: c.CATEGORY_ORIGINAL})
+    df[c.CATEGORY] = df[c.BUSINESS_OR_PERSON].map(categorized_businesses).astype(object)
 
     # Merge with categories to get the correct category names
-    df = pd.merge(df, categories_df, on=c.CATEGORY, how='left')
+    df = pd.merge(df, get_categories_df(), on=c.CATEGORY, how='left')
 
     return df
 
 
-def get_category_from_api(row):
-    category = row[c.CATEGORY]
+def print_merchant_cache_hit_rate(businesses_count, exact_matches_count, near_matches_count):
+    if businesses_count == 0:
+        return
+    hits_count = exact_matches_count + near_matches_count
+    print(f"Merchant cache hit rate: {hits_count / businesses_count:.1%} ({exact_matches_count} exact, "
+          f"{near_matches_count} near matches, {businesses_count - hits_count} unknown of {businesses_count} businesses)")
+
+
+class CategoryBackend:
+    """A service that labels batches of businesses with categories."""
+
+    async def open(self):
+        """Acquire any shared resources (e.g. a pooled client) before a run."""
+
+    async def close(self):
+        """Release the resources acquired in `open`."""
+
+    async def categorize_batch(self, businesses):
+        """Returns a {business: category} dict for a list of business names."""
+        raise NotImplementedError
+
+
+class OpenAICategoryBackend(CategoryBackend):
+    """Categorizes businesses with OpenAI chat completions over a single pooled async client.
+
+    Attributes:
+        model (str): The chat model used to categorize businesses.
+        base_url (str): Optional API url, e.g. a local fake model server used in tests and benchmarks.
+        api_key (str): The API key, defaulting to the OPENAI_API_KEY environment variable.
+        max_connections (int): The size of the HTTP connection pool.
+    """
+
+    def __init__(self, model="gpt-3.5-turbo", base_url=None, api_key=None, max_connections=4):
+        self.model = model
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.client = None
+
+    async def open(self):
+        # Imported here so that only runs which call the API pay for importing the OpenAI client.
+        import httpx
+        from openai import AsyncOpenAI
+
+        if self.api_key is None:
+            load_dotenv()
+            self.api_key = os.getenv(c.OPEN_AI_KEY)
+
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            timeout=httpx.Timeout(60.0))
+        # Retries are handled by CategorizationEngine so that backoff applies to every backend.
+        self.client = AsyncOpenAI(
+            api_key=self.api_key, base_url=self.base_url, http_client=http_client, max_retries=0)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    async def categorize_batch(self, businesses):
+        completion = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": c.CATEGORIZE_TRANSACTION_PROMPT},
+                {"role": "user", "content": c.CATEGORIZE_TRANSACTIONS_BATCH_PROMPT + json.dumps(businesses)}
+            ],
+            temperature=0.1
+        )
+        return parse_batch_response(completion.choices[0].message.content)
+
+
+def parse_batch_response(content):
+    """Parses a JSON {business: category} response, ignoring any text around the object."""
+    start = content.find('{')
+    end = content.rfind('}')
+    if start == -1 or end == -1:
+        raise ValueError(f"Response does not contain a JSON object: {content}")
+    categories = json.loads(content[start:end + 1])
+    return {str(business): str(category) for business, category in categories.items()}
+
+
+class CategorizationEngine:
+    """Categorizes transactions missing a category with the local merchant classifier, sending unique businesses it
+    isn't confident about to a backend in batches.
 
-    if pd.isna(category):
-        business = row[c.BUSINESS_OR_PERSON]
-        business_original = row[c.BUSINESS_OR_PERSON_ORIGINAL]
+    Attributes:
+        backend (CategoryBackend): The service used to label businesses.
+        confidence_threshold (float): The classifier confidence below which businesses are sent to the backend.
+        min_similarity (float): The similarity to the closest category below which businesses are sent to the backend,
+            however confident the classifier is.
+        batch_size (int): The number of businesses sent in a single prompt.
+        max_concurrency (int): The maximum number of batches in flight at once.
+        max_retries (int): The number of times a failed batch is retried.
+        backoff (float): The base delay in seconds between retries, doubled on every attempt.
+    """
 
-        client = OpenAI()
+    def __init__(self, backend=None, batch_size=25, max_concurrency=4, max_retries=3, backoff=1.0,
+                 confidence_threshold=c.CLASSIFIER_CONFIDENCE_THRESHOLD, min_similarity=c.CLASSIFIER_MIN_SIMILARITY):
+        self.backend = backend if backend is not None else OpenAICategoryBackend(max_connections=max_concurrency)
+        self.confidence_threshold = confidence_threshold
+        self.min_similarity = min_similarity
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
 
+    def categorize(self, df):
+        """Fills in missing categories and stores the new business to category mappings.
+
+        Businesses the local classifier is confident about and that are similar enough to a category aren't sent to
+        the model. Its predictions aren't stored or learned, so the classifier never trains on its own guesses:
+        they're added to the review queue with the predicted category, which categorizes the transactions until the
+        business is reviewed. Businesses the model can't categorize are added to the review queue too and their
+        transactions are marked uncategorized, so the import finishes without waiting for input. Businesses already
+        waiting for review aren't sent to the model again.
+        """
+        missing = df[c.CATEGORY].isna()
+        if not missing.any():
+            return df
+
+        uncategorized_df = df[missing].drop_duplicates(subset=[c.BUSINESS_OR_PERSON])
+        queued = get_queued_businesses(uncategorized_df[c.BUSINESS_OR_PERSON])
+        businesses = [business for business in uncategorized_df[c.BUSINESS_OR_PERSON] if business not in queued]
+        valid_categories = get_valid_categories()
+
+        with get_run_metrics().stage('categorize.classifier', rows_in=len(businesses)) as record:
+            predictions = classify_businesses(businesses)
+            predictions = predictions[(predictions[CONFIDENCE] >= self.confidence_threshold) &
+                                      (predictions[SIMILARITY] >= self.min_similarity) &
+                                      predictions[c.CATEGORY].isin(valid_categories)]
+            record['rows_out'] = len(predictions)
+        for business, category, confidence in predictions[[c.CATEGORY, CONFIDENCE]].itertuples(name=None):
+            print(f"Classified {business} as {category} ({confidence:.0%} confident)")
+        get_run_metrics().increment('classifier_predictions', len(predictions))
+
+        businesses = [business for business in businesses if business not in predictions.index]
+        with get_run_metrics().stage('categorize.llm', rows_in=len(businesses)) as record:
+            labels = asyncio.run(self.categorize_businesses(businesses)) if businesses else {}
+            record['rows_out'] = len(labels)
+
+        labels = {business: category for business, category in labels.items() if category in valid_categories}
+        for business, category in labels.items():
+            print(f"Chat GPT labeled {business} as {category}")
+        if labels:
+            labels = load_business_to_category_mappings(labels)
+        predicted = dict(zip(predictions.index, predictions[c.CATEGORY]))
+        if predicted:
+            predicted_df = uncategorized_df[uncategorized_df[c.BUSINESS_OR_PERSON].isin(predictions.index)]
+            queue_businesses_for_review(
+                predicted_df.assign(**{c.CATEGORY: predicted_df[c.BUSINESS_OR_PERSON].map(predicted)}))
+        queued_predictions = {business: category for business, category in queued.items() if category}
+        labels = {**labels, **queued_predictions, **predicted}
+
+        unresolved_df = uncategorized_df[~uncategorized_df[c.BUSINESS_OR_PERSON].isin(list(labels) + list(queued))]
+        if not unresolved_df.empty:
+            queue_businesses_for_review(unresolved_df)
+            print(f"Chat GPT could not categorize {len(unresolved_df)} businesses. "
+                  f"Run `python -m accounting.run_pipelines review` to categorize them.")
+        get_run_metrics().increment('businesses_queued_for_review', len(predicted) + len(unresolved_df))
+
+        categories = df.loc[missing, c.BUSINESS_OR_PERSON].map(labels).astype(object)
+        df.loc[missing, c.CATEGORY] = categories.fillna(c.UNCATEGORIZED)
+        return df
+
+    async def categorize_businesses(self, businesses):
+        """Returns a {business: category} dict for all businesses the backend could label."""
+        batches = [businesses[i:i + self.batch_size] for i in range(0, len(businesses), self.batch_size)]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        await self.backend.open()
         try:
-            completion = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": c.CATEGORIZE_TRANSACTION_PROMPT},
-                    {"role": "user", "content": f"What is the category for '{business_original}'? Please only respond with the category."}
-                ],
-                temperature=0.1
-            )
-
-            updated_category = completion.choices[0].message.content
-
-            if categories_df[c.CATEGORY].str.contains(updated_category).any():
-                print(f"Chat GPT labeled {business} as {updated_category}")
-            else:
-                print()
-                print(
-                    f"CHATGPT could not categorize the business correctly: {business_original}")
-                print(f"Original category: {row[c.CATEGORY_ORIGINAL]}")
-                print(f"Amount: ${row[c.DEBIT]}")
-                updated_category = get_valid_category_from_user()
-
-            load_business_to_category_mapping(business, updated_category)
-
-            return updated_category
-        except Exception as e:
-            print()
-            print(
-                f"Error occurred while trying to categorize {business_original}: {e}")
-            print()
-            print(
-                f"CHATGPT could not categorize the business correctly: {business_original}")
-            print(f"Original category: {row[c.CATEGORY_ORIGINAL]}")
-            print(f"Amount: ${row[c.DEBIT]}")
-            updated_category = get_valid_category_from_user()
-
-            return updated_category
-    else:
-        return category
-
-
-def get_valid_category_from_user():
+            results = await asyncio.gather(*[self.categorize_batch(batch, semaphore) for batch in batches])
+        finally:
+            await self.backend.close()
+
+        labels = {}
+        for result in results:
+            labels.update(result)
+        return labels
+
+    async def categorize_batch(self, batch, semaphore):
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    get_run_metrics().increment('llm_calls')
+                    labels = await self.backend.categorize_batch(batch)
+                    return {business: str(labels[business]).strip().lower() for business in batch if business in labels}
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        print(f"Error occurred while trying to categorize {batch}: {e}")
+                        return {}
+                    delay = self.backoff * 2 ** attempt
+                    await asyncio.sleep(delay + random.uniform(0, delay))
+
+
+def get_valid_category_from_user(valid_categories):
+    """Asks for a category until a valid one is entered. Returns None when the input is left empty."""
     while True:
-        user_input = input("Enter a category: ").strip().lower()
+        user_input = input("Enter a category (leave empty to skip): ").strip().lower()
 
-        if user_input in categories_df[c.CATEGORY].str.lower().values:
+        if not user_input:
+            return None
+        elif user_input in valid_categories:
             return user_input
         else:
             print("Invalid category. Please try again.")
 
 
-def load_business_to_category_mapping(business, category):
-    new_record = pd.DataFrame(
-        {c.BUSINESS_OR_PERSON: [business], c.CATEGORY: [category]})
-    categorized_businesses_df = pd.read_csv(
-        c.DATA_DIRECTORY_PATH + 'categorized_businesses.csv')
-    categorized_businesses_df = pd.concat(
-        [categorized_businesses_df, new_record], ignore_index=True)
-    categorized_businesses_df = categorized_businesses_df.drop_duplicates()
-    categorized_businesses_df.to_csv(
-        c.DATA_DIRECTORY_PATH + 'categorized_businesses.csv', index=False)
+def review_queued_businesses():
+    """Asks for the category of every business in the review queue and returns the {business: category} answers."""
+    queue_df = get_merchant_store().get_review_queue()
+    if queue_df.empty:
+        print("No businesses are waiting for review.")
+        return {}
+
+    valid_categories = get_valid_categories()
+    print(f"{len(queue_df)} businesses are waiting for review.")
+    print(f"Valid categories: {', '.join(sorted(valid_categories))}")
+
+    labels = {}
+    for _, row in queue_df.iterrows():
+        print()
+        print(f"Business: {row[c.BUSINESS_OR_PERSON]} ({row[c.BUSINESS_OR_PERSON_ORIGINAL]})")
+        print(f"Original category: {row[c.CATEGORY_ORIGINAL]}")
+        if row[c.CATEGORY] is not None:
+            print(f"Predicted category: {row[c.CATEGORY]}")
+        print(f"Amount: ${row[c.DEBIT]}")
+        category = get_valid_category_from_user(valid_categories)
+        if category is not None:
+            labels[row[c.BUSINESS_OR_PERSON]] = category
+    return labels
+
+
+def resolve_queued_businesses(mappings):
+    """Stores reviewed mappings and removes the businesses from the review queue in a single transaction.
+
+    Returns the {business: category} predictions the reviewed businesses were queued with.
+    """
+    predictions = get_merchant_store().resolve(mappings)
+    get_merchant_index().add(mappings.keys())
+    train_merchant_classifier(mappings)
+    return predictions
+
+
+def classify_businesses(businesses):
+    """Returns the category the local classifier predicts for every business, its confidence and similarity."""
+    return get_merchant_classifier().predict(businesses)
+
+
+def train_merchant_classifier(mappings):
+    """Teaches the classifier new {business: category} mappings and saves it."""
+    classifier = get_merchant_classifier()
+    if classifier.update(mappings):
+        classifier.save(c.MERCHANT_CLASSIFIER_FILE_PATH)
+
+
+def get_queued_businesses(businesses):
+    return get_merchant_store().get_queued(businesses)
+
+
+def queue_businesses_for_review(df):
+    get_merchant_store().queue_for_review(df)
+
+
+def load_business_to_category_mappings(mappings):
+    """Stores a {business: category} dict in a single transaction, keeping businesses that are already categorized.
+
+    Returns the stored category of every business, which is the reviewed one when a business was reviewed meanwhile.
+    """
+    mappings = get_merchant_store().add(mappings)
+    get_merchant_index().add(mappings.keys())
+    train_merchant_classifier(mappings)
+    return mappings
@@ -0,0 +1,129 @@
+import os
+import time
+
+import accounting.constant as c
+from accounting.instrumentation import start_run
+from accounting.parsers.registry import is_statement_file
+from accounting.pipelines.credit_card_transactions_pipeline import CreditCardTransactionsPipeline
+from accounting.pipelines.transaction_history_pipeline import TransactionHistoryPipeline
+from accounting.stores.ingestion_ledger import get_ingestion_ledger, hash_file
+from accounting.transaction_category import (CategorizationEngine, get_categories_df, get_merchant_classifier,
+                                             get_merchant_index, get_merchant_store)
+import accounting.tool as tool
+
+
+class StatementWatcher:
+    """Imports every statement dropped into a directory, one at a time, from a single long-running process.
+
+    The directory is polled rather than watched with OS notifications so it works the same on every platform. A file
+    is imported once its size and modification time haven't changed for the debounce period, so statements that are
+    still being downloaded or copied aren't read half-written. Files whose content was imported before are skipped.
+
+    Attributes:
+        directory (str): The directory receiving statements.
+        interval (float): Seconds between scans of the directory.
+        debounce (float): Seconds a file must stay unchanged before it's imported.
+        ledger (IngestionLedger): The statements and transactions imported before.
+        categorization_engine (CategorizationEngine): Shared by every import so its model client is created once.
+        pending ({str:((int, float), float)}): The size and modification time of each file not imported yet, and
+            when it was last seen changing.
+        failed ({str:(int, float)}): The size and modification time of files that failed, retried once they change.
+    """
+
+    def __init__(self, directory=c.TEMP_DIRECTORY_PATH, interval=c.WATCH_INTERVAL, debounce=c.WATCH_DEBOUNCE,
+                 ledger=None, categorization_engine=None):
+        self.directory = directory
+        self.interval = interval
+        self.debounce = debounce
+        self.ledger = ledger if ledger is not None else get_ingestion_ledger()
+        self.categorization_engine = categorization_engine if categorization_engine is not None else CategorizationEngine()
+        self.pending = {}
+        self.failed = {}
+
+    def warm_up(self):
+        """Loads the categories, merchant cache, classifier, and history store once so imports don't pay for it."""
+        get_categories_df()
+        get_merchant_store()
+        get_merchant_index()
+        get_merchant_classifier()
+        TransactionHistoryPipeline(file_path=c.TRANSACTIONS_HISTORY_FILE_PATH)
+
+    def scan(self, now=None):
+        """Returns the statements that haven't changed for the debounce period, oldest change first."""
+        now = now if now is not None else time.monotonic()
+        files = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and is_statement_file(entry.name):
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_size, stat.st_mtime)
+
+        # Forget files that were removed, and failures of files that changed since.
+        self.pending = {name: pending for name, pending in self.pending.items() if name in files}
+        self.failed = {name: version for name, version in self.failed.items() if files.get(name) == version}
+
+        for name, version in files.items():
+            if name in self.failed:
+                continue
+            if name not in self.pending or self.pending[name][0] != version:
+                self.pending[name] = (version, now)
+
+        ready = [name for name, (_, changed_at) in self.pending.items() if now - changed_at >= self.debounce]
+        return sorted(ready, key=lambda name: self.pending[name][1])
+
+    def process(self, file_name):
+        """Imports a statement unless its content was imported before, then moves it to the trash."""
+        file_path = os.path.join(self.directory, file_name)
+        version = self.pending.pop(file_name)[0]
+        file_hash = hash_file(file_path)
+
+        if self.ledger.has_file(file_hash):
+            print(f"Skipping {file_name}, its transactions were already imported.")
+        else:
+            metrics = start_run()
+            try:
+                pipeline = CreditCardTransactionsPipeline(
+                    [file_name], categorization_engine=self.categorization_engine, directory=self.directory,
+                    ledger=self.ledger)
+                pipeline.run_pipeline()
+            except Exception as e:
+                # One bad statement shouldn't stop the watcher. It's retried once the file changes.
+                print(f"Error occurred while importing {file_name}: {e}")
+                self.failed[file_name] = version
+                return
+            finally:
+                metrics.finish()
+            self.ledger.add_file(file_hash, file_name)
+
+        tool.send_to_trash([file_path])
+
+    def run_once(self, now=None):
+        for file_name in self.scan(now):
+            self.process(file_name)
+
+    def process_cash(self, run_cash_pipeline):
+        """Imports cash transactions from Notion with metrics of their own."""
+        metrics = start_run()
+        try:
+            run_cash_pipeline()
+        except Exception as e:
+            # Notion being unreachable shouldn't stop the watcher. Cash transactions are imported on the next run.
+            print(f"Error occurred while importing cash transactions: {e}")
+        finally:
+            metrics.finish()
+
+    def run(self, cash_interval=None, run_cash_pipeline=None):
+        """Imports statements until interrupted, and cash transactions from Notion every cash_interval seconds."""
+        self.warm_up()
+        print(f"Watching {self.directory} for statements. Press Ctrl+C to stop.")
+        next_cash_run = time.monotonic()
+
+        try:
+            while True:
+                self.run_once()
+                if cash_interval is not None and time.monotonic() >= next_cash_run:
+                    self.process_cash(run_cash_pipeline)
+                    next_cash_run = time.monotonic() + cash_interval
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            print("Stopped watching for statements.")
@@ -0,0 +1,58 @@
+"""Compares answering spending queries from the monthly aggregates with filtering and summing the history.
+
+Run with `python -m benchmarks.bench_analytics --rows 1000000`.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import accounting.constant as c
+from accounting.analytics import SpendingAnalytics
+from accounting.transaction_category import get_valid_categories
+from benchmarks.synthetic import generate_history
+
+
+def time_queries(function, queries):
+    start = time.perf_counter()
+    for query in queries:
+        function(*query)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=1000)
+    args = parser.parse_args()
+
+    categories = sorted(get_valid_categories())
+    df = generate_history(args.rows, categories)
+
+    with tempfile.TemporaryDirectory() as directory:
+        analytics = SpendingAnalytics(os.path.join(directory, 'aggregates.sqlite'))
+        start = time.perf_counter()
+        analytics.update(df)
+        update_seconds = time.perf_counter() - start
+
+        queries = [(categories[i % len(categories)], f'{2015 + i % 8}-{i % 12 + 1:02d}', f'{2017 + i % 8}-06')
+                   for i in range(args.queries)]
+        # The first query loads the totals into memory.
+        analytics.spend(*queries[0])
+        aggregates_ms = time_queries(analytics.spend, queries)
+
+        def scan(category, start, end):
+            rows = (df[c.CATEGORY] == category) & (df[c.DATE] >= start) & (df[c.DATE] < end + '-32')
+            return df.loc[rows, c.DEBIT].sum()
+
+        scan_ms = time_queries(scan, queries[:20])
+        analytics.close()
+
+    print(f"Built aggregates of {args.rows} transactions in {update_seconds:.2f} s")
+    print(f"{'query':<12}{'ms per query':>14}")
+    print(f"{'aggregates':<12}{aggregates_ms:>14.4f}")
+    print(f"{'scan':<12}{scan_ms:>14.4f}")
+
+
+if __name__ == '__main__':
+    main()
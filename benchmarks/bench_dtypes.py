@@ -0,0 +1,35 @@
+"""Reports the memory used by a transaction history with object columns and with compact column types.
+
+Run with `python -m benchmarks.bench_dtypes --rows 1000000`.
+"""
+import argparse
+import time
+
+from accounting.schemas.dtypes import to_compact_dtypes
+from accounting.transaction_category import get_valid_categories
+from benchmarks.synthetic import generate_history
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = generate_history(args.rows, get_valid_categories())
+    start = time.perf_counter()
+    compact_df = to_compact_dtypes(df)
+    seconds = time.perf_counter() - start
+
+    object_usage = df.memory_usage(deep=True, index=False) / 1024 ** 2
+    compact_usage = compact_df.memory_usage(deep=True, index=False) / 1024 ** 2
+
+    print(f"{'column':<30}{'object MB':>12}{'compact MB':>12}  compact type")
+    for column in df.columns:
+        print(f"{column:<30}{object_usage[column]:>12.1f}{compact_usage[column]:>12.1f}  {compact_df[column].dtype}")
+    print(f"{'total':<30}{object_usage.sum():>12.1f}{compact_usage.sum():>12.1f}  "
+          f"{1 - compact_usage.sum() / object_usage.sum():.0%} smaller")
+    print(f"Converted {args.rows} transactions in {seconds:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Compares loading the transaction history from CSV and from partitioned Parquet.
+
+Run with `python -m benchmarks.bench_history_formats --rows 1000000`.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import pandas as pd
+
+import accounting.constant as c
+from accounting.stores.parquet_history_store import ParquetHistoryStore
+from accounting.transaction_category import get_valid_categories
+from benchmarks.synthetic import generate_history
+
+
+def load_csv(csv_path, parquet_path):
+    return pd.read_csv(csv_path)
+
+
+def load_parquet(csv_path, parquet_path):
+    return ParquetHistoryStore(parquet_path).read()
+
+
+def load_csv_one_month(csv_path, parquet_path):
+    df = pd.read_csv(csv_path)
+    return df[(df[c.DATE] >= '2020-06-01') & (df[c.DATE] <= '2020-06-30') & (df[c.CATEGORY] == 'dining')]
+
+
+def load_parquet_one_month(csv_path, parquet_path):
+    return ParquetHistoryStore(parquet_path).read(start='2020-06-01', end='2020-06-30', categories=['dining'])
+
+
+def write_history(rows, csv_path, parquet_path):
+    df = generate_history(rows, get_valid_categories())
+    df.to_csv(csv_path, index=False)
+    ParquetHistoryStore(parquet_path).insert(df)
+
+
+def measure(loader, csv_path, parquet_path, results):
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    df = loader(csv_path, parquet_path)
+    seconds = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((seconds, (peak_kb - baseline_kb) / 1024, len(df)))
+
+
+def run_in_fresh_process(loader, csv_path, parquet_path):
+    """Runs a loader in its own process so peak memory isn't shared between formats.
+
+    Linux carries a parent's peak memory over to its children, so the parent process never holds the history.
+    """
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=measure, args=(loader, csv_path, parquet_path, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, 'transactions_history.csv')
+        parquet_path = os.path.join(directory, 'transactions_history')
+
+        process = multiprocessing.get_context('spawn').Process(
+            target=write_history, args=(args.rows, csv_path, parquet_path))
+        process.start()
+        process.join()
+
+        print(f"{'loader':<25}{'seconds':>10}{'peak MB':>10}{'rows':>10}")
+        for loader in [load_csv, load_parquet, load_csv_one_month, load_parquet_one_month]:
+            seconds, peak_mb, rows = run_in_fresh_process(loader, csv_path, parquet_path)
+            print(f"{loader.__name__:<25}{seconds:>10.3f}{peak_mb:>10.1f}{rows:>10}")
+
+
+if __name__ == '__main__':
+    main()
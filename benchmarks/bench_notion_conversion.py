@@ -0,0 +1,78 @@
+"""Compares converting and cleaning Notion pages row by row with the vectorized cash pipeline.
+
+Run with `python -m benchmarks.bench_notion_conversion --pages 50000`.
+"""
+import argparse
+import time
+
+import pandas as pd
+
+import accounting.constant as c
+from accounting.pipelines.cash_transactions_pipeline import CashTransactionsPipeline
+from accounting.schemas.validation import set_validation_level
+from accounting.transaction_category import get_valid_categories
+from benchmarks.synthetic import generate_notion_pages
+
+
+def convert_row_by_row(pages):
+    """The original conversion building one list per column with nested get chains."""
+    person_or_business_list, date_list, category_list, debit_list, credit_list = [], [], [], [], []
+    for row in pages:
+        properties = row.get('properties', {})
+        # Empty titles are read as missing, the original conversion raised an IndexError on them.
+        title = properties.get('person_or_business', {}).get('title') or [{}]
+        person_or_business_list.append(title[0].get('plain_text', ''))
+        date_list.append(properties.get('date', {}).get('date', {}).get('start', ''))
+        category_list.append(properties.get('category', {}).get('select', {}).get('name', ''))
+        debit_list.append(properties.get('debit', {}).get('number', None))
+        credit_list.append(properties.get('credit', {}).get('number', None))
+
+    return pd.DataFrame({
+        c.DATE: date_list, c.CATEGORY_ORIGINAL: category_list, c.CATEGORY: category_list, c.DEBIT: debit_list,
+        c.CREDIT: credit_list, c.SEQUENCE: 1, c.BUSINESS_OR_PERSON_ORIGINAL: person_or_business_list,
+        c.BUSINESS_OR_PERSON: person_or_business_list})
+
+
+def clean_element_wise(df):
+    """The original cleaning converting amounts one element at a time."""
+    for column in [c.BUSINESS_OR_PERSON_ORIGINAL, c.BUSINESS_OR_PERSON, c.CATEGORY_ORIGINAL, c.CATEGORY]:
+        df[column] = df[column].str.lower()
+    df[c.DEBIT] = df[c.DEBIT].apply(lambda x: float(x) if x is not None else float('nan')).astype(float)
+    df[c.CREDIT] = df[c.CREDIT].apply(lambda x: float(x) if x is not None else float('nan')).astype(float)
+    df[c.CARD_NUMBER] = -1
+    return df
+
+
+def time_best_of(function, argument, repeat):
+    timings = []
+    for _ in range(repeat):
+        # Cleaning modifies its input, so every run gets a fresh copy.
+        copied_argument = argument.copy() if isinstance(argument, pd.DataFrame) else argument
+        start = time.perf_counter()
+        function(copied_argument)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    # Only measure conversion and cleaning.
+    set_validation_level('off')
+    pages = generate_notion_pages(args.pages, get_valid_categories())
+    pipeline = CashTransactionsPipeline(url=None, headers={})
+    # Notion amounts arrive as Python objects, so both cleaners start from object columns.
+    df = convert_row_by_row(pages).astype({c.DEBIT: object, c.CREDIT: object})
+
+    print(f"{'stage':<12}{'row by row ms':>15}{'vectorized ms':>15}")
+    print(f"{'convert':<12}{time_best_of(convert_row_by_row, pages, args.repeat):>15.1f}"
+          f"{time_best_of(pipeline.convert_pages, pages, args.repeat):>15.1f}")
+    print(f"{'clean':<12}{time_best_of(clean_element_wise, df, args.repeat):>15.1f}"
+          f"{time_best_of(pipeline.clean_transactions, df, args.repeat):>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+"""Times the cash, credit card, and transaction history pipelines end to end and stage by stage on synthetic data.
+
+OpenAI and Notion are replaced by in-process stubs, so only the pipelines themselves are measured. Every pipeline and
+size runs in a fresh process against its own data directory. Results are written as JSON, and a previous results file
+can be passed with --compare to report regressions.
+
+Run with `python -m benchmarks.bench_pipelines --rows 10000 100000 1000000 --compare benchmarks/results/<previous>.json`.
+"""
+import argparse
+from contextlib import redirect_stdout
+from datetime import datetime
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import accounting.constant as c
+from accounting.transaction_category import CategoryBackend
+from benchmarks.synthetic import (SIZES, generate_capital_one_transactions, generate_history, generate_merchants,
+                                  generate_notion_pages, get_category, get_merchant_count, write_notion_pages)
+
+PIPELINES = ['cash', 'credit_card', 'history']
+RESULTS_DIRECTORY_PATH = os.path.join(os.path.dirname(__file__), 'results')
+CAPITAL_ONE_FILE_NAME = 'capital_one.csv'
+NOTION_PAGES_FILE_NAME = 'notion_pages.json'
+HISTORY_FILE_NAME = 'history.csv'
+NOTION_URL = 'https://api.notion.com/v1/databases/benchmark/query'
+
+
+class StubCategoryBackend(CategoryBackend):
+    """Labels every business with a stable valid category without calling OpenAI."""
+
+    def __init__(self, categories):
+        self.categories = sorted(categories)
+
+    async def categorize_batch(self, businesses):
+        return {business: get_category(business, self.categories) for business in businesses}
+
+
+class StubNotionResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class StubNotionSession:
+    """Serves pages from memory with the cursor pagination of the Notion database query endpoint."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.headers = {}
+
+    def post(self, url, json):
+        start = int(json.get('start_cursor') or 0)
+        end = start + json['page_size']
+        has_more = end < len(self.pages)
+        return StubNotionResponse({
+            'results': self.pages[start:end], 'has_more': has_more, 'next_cursor': str(end) if has_more else None})
+
+
+def use_data_directory(directory):
+    """Points every data file of the pipelines at directory, keeping the real categories."""
+    c.TEMP_DIRECTORY_PATH = os.path.join(directory, 'temp') + os.sep
+    c.IMPORTED_TRANSACTIONS_DIRECTORY_PATH = os.path.join(directory, 'imported_transactions') + os.sep
+    c.TRANSACTIONS_HISTORY_FILE_PATH = os.path.join(directory, 'transactions_history.csv')
+    c.TRANSACTIONS_HISTORY_DB_PATH = os.path.join(directory, 'transactions_history.sqlite')
+    c.TRANSACTIONS_HISTORY_PARQUET_PATH = os.path.join(directory, 'transactions_history') + os.sep
+    c.NOTION_STATE_FILE_PATH = os.path.join(directory, 'notion_state.json')
+    c.CATEGORIZED_BUSINESSES_FILE_PATH = os.path.join(directory, 'categorized_businesses.csv')
+    c.MERCHANT_CATEGORY_STORE_FILE_PATH = os.path.join(directory, 'categorized_businesses.sqlite')
+    c.METRICS_DIRECTORY_PATH = os.path.join(directory, 'metrics') + os.sep
+    c.INGESTION_LEDGER_DB_PATH = os.path.join(directory, 'ingestion_ledger.sqlite')
+    c.MERCHANT_CLASSIFIER_FILE_PATH = os.path.join(directory, 'merchant_classifier.npz')
+    for path in [c.TEMP_DIRECTORY_PATH, c.IMPORTED_TRANSACTIONS_DIRECTORY_PATH]:
+        os.makedirs(path, exist_ok=True)
+
+
+def write_inputs(pipeline, rows, directory, known_merchants):
+    """Writes the synthetic input of a pipeline and seeds the merchant store with a share of its merchants."""
+    from accounting.merchant_normalization import normalize_merchant_names
+    from accounting.transaction_category import get_merchant_store, get_valid_categories
+
+    use_data_directory(directory)
+    categories = get_valid_categories()
+    merchants = generate_merchants(get_merchant_count(rows))
+
+    if pipeline == 'credit_card':
+        generate_capital_one_transactions(rows, merchants=merchants).to_csv(
+            c.TEMP_DIRECTORY_PATH + CAPITAL_ONE_FILE_NAME, index=False)
+    elif pipeline == 'cash':
+        write_notion_pages(generate_notion_pages(rows, categories, merchants=merchants),
+                           os.path.join(directory, NOTION_PAGES_FILE_NAME))
+    else:
+        generate_history(rows, categories, merchants=merchants).to_csv(
+            os.path.join(directory, HISTORY_FILE_NAME), index=False)
+
+    # The most frequent merchants are the ones categorized on earlier imports.
+    known = merchants.iloc[:int(len(merchants) * known_merchants)]
+    names = normalize_merchant_names(known['description'].str.lower())
+    get_merchant_store().upsert({name: get_category(name, sorted(categories)) for name in names})
+    get_merchant_store().close()
+
+
+def run_pipeline(pipeline, directory):
+    """Runs a pipeline on the inputs in directory and returns its wall time and recorded run metrics."""
+    import pandas as pd
+    from accounting.instrumentation import start_run
+    from accounting.transaction_category import CategorizationEngine, get_valid_categories
+
+    use_data_directory(directory)
+
+    if pipeline == 'credit_card':
+        from accounting.pipelines.credit_card_transactions_pipeline import CreditCardTransactionsPipeline
+        engine = CategorizationEngine(backend=StubCategoryBackend(get_valid_categories()))
+        run = CreditCardTransactionsPipeline([CAPITAL_ONE_FILE_NAME], categorization_engine=engine).run_pipeline
+    elif pipeline == 'cash':
+        from accounting.notion_extractor import NotionDatabaseExtractor
+        from accounting.pipelines.cash_transactions_pipeline import CashTransactionsPipeline
+        with open(os.path.join(directory, NOTION_PAGES_FILE_NAME)) as file:
+            session = StubNotionSession(json.load(file))
+        extractor = NotionDatabaseExtractor(NOTION_URL, {}, state_path=c.NOTION_STATE_FILE_PATH, session=session)
+        run = CashTransactionsPipeline(url=NOTION_URL, headers={}, extractor=extractor).run_pipeline
+    else:
+        from accounting.pipelines.transaction_history_pipeline import TransactionHistoryPipeline
+        history_df = pd.read_csv(os.path.join(directory, HISTORY_FILE_NAME))
+
+        def run():
+            history_pipeline = TransactionHistoryPipeline(file_path=c.TRANSACTIONS_HISTORY_FILE_PATH)
+            history_pipeline.run_add_to_history_pipeline(transactions_to_add_df=history_df)
+            history_pipeline.extract_transaction_history()
+
+    metrics = start_run(profile=False)
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        start = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - start
+    return seconds, metrics.to_dict()
+
+
+def measure(pipeline, directory, results):
+    seconds, metrics = run_pipeline(pipeline, directory)
+    results.put((seconds, metrics))
+
+
+def run_in_fresh_process(target, *args):
+    """Runs target in a spawned process so peak memory and caches aren't shared between runs, returning its result."""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=target, args=args + (results,))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def write_inputs_in_process(pipeline, rows, directory, known_merchants, results):
+    write_inputs(pipeline, rows, directory, known_merchants)
+    results.put(None)
+
+
+def summarize_stages(stages):
+    """Adds up the seconds and calls of every stage name, since chunked and nested stages repeat."""
+    summary = {}
+    for stage in stages:
+        totals = summary.setdefault(stage['name'], {'seconds': 0.0, 'calls': 0, 'rows_in': None})
+        totals['seconds'] = round(totals['seconds'] + stage['seconds'], 6)
+        totals['calls'] += 1
+        if stage['rows_in'] is not None:
+            totals['rows_in'] = (totals['rows_in'] or 0) + stage['rows_in']
+    return summary
+
+
+def benchmark(pipeline, rows, known_merchants):
+    with tempfile.TemporaryDirectory() as directory:
+        run_in_fresh_process(write_inputs_in_process, pipeline, rows, directory, known_merchants)
+        seconds, metrics = run_in_fresh_process(measure, pipeline, directory)
+
+    return {
+        'pipeline': pipeline,
+        'rows': rows,
+        'seconds': round(seconds, 6),
+        'rows_per_second': round(rows / seconds),
+        'peak_memory_mb': metrics['peak_memory_mb'],
+        'counters': metrics['counters'],
+        'stages': summarize_stages(metrics['stages']),
+    }
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Prints the change in wall time of every pipeline and size measured in both runs and returns the regressions."""
+    baseline_seconds = {(result['pipeline'], result['rows']): result['seconds'] for result in baseline['results']}
+    regressions = []
+
+    print(f"\nCompared with {baseline.get('commit')} from {baseline.get('created_at')}:")
+    results = [result for result in results if (result['pipeline'], result['rows']) in baseline_seconds]
+    if not results:
+        print("No pipeline and size was measured in both runs.")
+    for result in results:
+        key = (result['pipeline'], result['rows'])
+        ratio = result['seconds'] / baseline_seconds[key]
+        is_regression = ratio > 1 + tolerance
+        if is_regression:
+            regressions.append(key)
+        print(f"{result['pipeline']:<14}{result['rows']:>10}{baseline_seconds[key]:>10.3f}s ->"
+              f"{result['seconds']:>9.3f}s {ratio:>6.2f}x{'  REGRESSION' if is_regression else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=SIZES[:2], help=f"Sizes to run (suggested: {SIZES}).")
+    parser.add_argument('--pipelines', nargs='+', choices=PIPELINES, default=PIPELINES)
+    parser.add_argument('--known-merchants', type=float, default=0.9,
+                        help="Share of merchants already in the merchant store, the rest go to the stubbed LLM.")
+    parser.add_argument('--output', help="Results file (default: benchmarks/results/pipelines_<timestamp>.json).")
+    parser.add_argument('--compare', help="A previous results file to compare against.")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="Slowdown reported as a regression.")
+    args = parser.parse_args()
+
+    created_at = datetime.now().isoformat(timespec='seconds')
+    results = []
+    print(f"{'pipeline':<14}{'rows':>10}{'seconds':>10}{'rows/s':>10}{'peak MB':>10}{'LLM calls':>11}")
+    for rows in args.rows:
+        for pipeline in args.pipelines:
+            result = benchmark(pipeline, rows, args.known_merchants)
+            results.append(result)
+            print(f"{pipeline:<14}{rows:>10}{result['seconds']:>10.3f}{result['rows_per_second']:>10}"
+                  f"{result['peak_memory_mb']:>10.1f}{result['counters'].get('llm_calls', 0):>11}")
+
+    output = args.output or os.path.join(
+        RESULTS_DIRECTORY_PATH, f"pipelines_{created_at.replace(':', '-')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump({
+            'created_at': created_at,
+            'commit': get_git_commit(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'known_merchants': args.known_merchants,
+            'results': results,
+        }, file, indent=2)
+    print(f"Results written to {output}.")
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            raise SystemExit(f"{len(regressions)} regressions over {args.tolerance:.0%}.")
+
+
+if __name__ == '__main__':
+    main()
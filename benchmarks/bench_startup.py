@@ -0,0 +1,56 @@
+"""Measures the import time of each entry point with `python -X importtime`.
+
+Run with `python -m benchmarks.bench_startup`.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ENTRY_POINTS = [
+    'accounting.run_pipelines',
+    'accounting.pipelines.cash_transactions_pipeline',
+    'accounting.pipelines.credit_card_transactions_pipeline',
+    'accounting.pipelines.transaction_history_pipeline',
+]
+HEAVY_DEPENDENCIES = ['openai', 'pandera', 'pandas', 'pyarrow', 'requests']
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import(module, repeat):
+    """Returns the best total import time in milliseconds and the heavy dependencies the module imported."""
+    best_microseconds = None
+    imported = set()
+
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=REPOSITORY_PATH, capture_output=True, text=True, check=True)
+
+        # Lines look like "import time:       self [us] |  cumulative | imported package"
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or '[us]' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            if name.strip() == module:
+                microseconds = int(cumulative)
+                best_microseconds = microseconds if best_microseconds is None else min(best_microseconds, microseconds)
+            if name.strip() in HEAVY_DEPENDENCIES:
+                imported.add(name.strip())
+
+    return best_microseconds / 1000, sorted(imported)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'entry point':<60}{'ms':>10}  heavy dependencies")
+    for module in ENTRY_POINTS:
+        milliseconds, imported = measure_import(module, args.repeat)
+        print(f"{module:<60}{milliseconds:>10.1f}  {', '.join(imported)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""Measures the cost of validating new transactions against TransactionSchema at each validation level.
+
+Run with `python -m benchmarks.bench_validation --rows 100000`.
+"""
+import argparse
+import time
+
+from accounting.schemas.transaction_schema import TransactionSchema
+from accounting.schemas.validation import VALIDATION_LEVELS, validate
+from accounting.transaction_category import get_valid_categories
+from benchmarks.synthetic import generate_history
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    df = generate_history(args.rows, get_valid_categories())
+    # Build and cache the schema outside the timed runs.
+    validate(df.head(), TransactionSchema)
+
+    print(f"{'level':<10}{'ms':>10}{'ms per 100k rows':>20}")
+    for level in VALIDATION_LEVELS:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            validate(df, TransactionSchema, level=level)
+            timings.append(time.perf_counter() - start)
+        milliseconds = min(timings) * 1000
+        print(f"{level:<10}{milliseconds:>10.1f}{milliseconds * 100_000 / args.rows:>20.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Generators for synthetic Capital One statements, Notion cash transaction pages, and transaction histories.
+
+Merchants follow a Zipf distribution, so a few merchants account for most transactions like on a real statement, and
+the number of merchants grows with the number of rows. Descriptions carry the payment processor prefixes and store
+numbers that merchant normalization strips.
+"""
+import json
+import zlib
+
+import numpy as np
+import pandas as pd
+
+import accounting.constant as c
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+ADJECTIVES = [
+    'blue', 'golden', 'green', 'red', 'silver', 'happy', 'little', 'big', 'old', 'new', 'urban', 'coastal', 'royal',
+    'lucky', 'sunny', 'north', 'south', 'east', 'west', 'main', 'corner', 'village', 'city', 'garden', 'river',
+    'mountain', 'harbor', 'valley', 'pine', 'oak', 'maple', 'cedar', 'union', 'liberty', 'pacific', 'atlantic',
+    'prime', 'fresh', 'daily', 'central', 'grand', 'first', 'metro', 'star', 'moon', 'bright', 'rustic', 'modern',
+    'classic', 'local',
+]
+NOUNS = [
+    'bottle', 'leaf', 'fork', 'spoon', 'table', 'kitchen', 'market', 'bean', 'barrel', 'anchor', 'lantern', 'bridge',
+    'garden', 'orchard', 'field', 'meadow', 'stone', 'feather', 'arrow', 'compass', 'harvest', 'bakery', 'pantry',
+    'cellar', 'mill', 'forge', 'dock', 'wharf', 'pier', 'hill', 'grove', 'ridge', 'trail', 'path', 'square', 'plaza',
+    'corner', 'station', 'depot', 'yard', 'farm', 'ranch', 'crown', 'tiger', 'fox', 'bear', 'owl', 'hawk', 'wolf',
+    'otter',
+]
+KINDS = ['coffee', 'cafe', 'grill', 'pizza', 'market', 'grocery', 'pharmacy', 'hardware', 'books', 'fuel']
+CAPITAL_ONE_CATEGORIES = [
+    'Dining', 'Dining', 'Dining', 'Grocery', 'Grocery', 'Health Care', 'Merchandise', 'Merchandise',
+    'Entertainment', 'Gas/Automotive',
+]
+PROCESSOR_PREFIXES = ['', '', '', 'sq *', 'tst* ', 'paypal *', 'dd *']
+CARD_NUMBERS = [5739, 1234]
+
+
+def get_merchant_count(rows):
+    """Returns a realistic number of distinct merchants for a statement or history of the given size."""
+    return int(50 * rows ** 0.4)
+
+
+def generate_merchants(count, seed=0):
+    """Returns a dataframe of merchants with a normalized name, a raw statement description, and a Capital One category."""
+    rng = np.random.default_rng(seed)
+    if count > len(ADJECTIVES) * len(NOUNS) * len(KINDS):
+        raise ValueError(f"At most {len(ADJECTIVES) * len(NOUNS) * len(KINDS)} merchants can be generated.")
+
+    codes = rng.choice(len(ADJECTIVES) * len(NOUNS) * len(KINDS), count, replace=False)
+    names = [
+        f'{ADJECTIVES[code // (len(NOUNS) * len(KINDS))]} {NOUNS[code // len(KINDS) % len(NOUNS)]} {KINDS[code % len(KINDS)]}'
+        for code in codes
+    ]
+    prefixes = np.array(PROCESSOR_PREFIXES)[rng.integers(0, len(PROCESSOR_PREFIXES), count)]
+    store_numbers = rng.integers(1, 9999, count)
+    has_store_number = rng.random(count) < 0.4
+    descriptions = [
+        f"{prefix}{name}{f' #{number}' if numbered else ''}".upper()
+        for prefix, name, number, numbered in zip(prefixes, names, store_numbers, has_store_number)
+    ]
+
+    return pd.DataFrame({
+        'name': names,
+        'description': descriptions,
+        'capital_one_category': np.array(CAPITAL_ONE_CATEGORIES)[rng.integers(0, len(CAPITAL_ONE_CATEGORIES), count)],
+    })
+
+
+def sample_merchants(merchants, rows, rng):
+    """Returns the merchant of every row, drawn from a Zipf distribution over the merchants."""
+    weights = 1 / np.arange(1, len(merchants) + 1) ** 1.1
+    return rng.choice(len(merchants), rows, p=weights / weights.sum())
+
+
+def sample_dates(rows, rng, start='2022-01-01', days=730):
+    return pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, rows), unit='D')
+
+
+def sample_amounts(rows, rng):
+    """Returns amounts in dollars with a long tail, rounded to cents."""
+    return np.round(rng.lognormal(mean=3, sigma=1, size=rows), 2)
+
+
+def generate_capital_one_transactions(rows, seed=0, merchants=None):
+    """Creates a Capital One statement where about 3% of the rows are payments or refunds."""
+    rng = np.random.default_rng(seed)
+    merchants = merchants if merchants is not None else generate_merchants(get_merchant_count(rows), seed)
+    merchant = merchants.iloc[sample_merchants(merchants, rows, rng)]
+    dates = sample_dates(rows, rng)
+    amounts = sample_amounts(rows, rng)
+    is_credit = rng.random(rows) < 0.03
+
+    return pd.DataFrame({
+        c.CAP_ONE_TRANSACTION_DATE: dates.strftime('%Y-%m-%d'),
+        c.CAP_ONE_POSTED_DATE: (dates + pd.to_timedelta(rng.integers(1, 4, rows), unit='D')).strftime('%Y-%m-%d'),
+        c.CAP_ONE_CARD_NUMBER: rng.choice(CARD_NUMBERS, rows),
+        c.CAP_ONE_DESCRIPTION: merchant['description'].to_numpy(),
+        c.CAP_ONE_CATEGORY: merchant['capital_one_category'].to_numpy(),
+        c.CAP_ONE_DEBIT: np.where(is_credit, np.nan, amounts),
+        c.CAP_ONE_CREDIT: np.where(is_credit, amounts, np.nan),
+    })
+
+
+def generate_notion_pages(rows, categories, seed=0, merchants=None):
+    """Creates pages shaped like the Notion cash transactions database, some with missing amounts or names."""
+    rng = np.random.default_rng(seed)
+    merchants = merchants if merchants is not None else generate_merchants(get_merchant_count(rows), seed)
+    names = merchants['name'].to_numpy()[sample_merchants(merchants, rows, rng)]
+    dates = sample_dates(rows, rng).strftime('%Y-%m-%d')
+    amounts = sample_amounts(rows, rng)
+    is_credit = rng.random(rows) < 0.1
+    categories = sorted(categories)
+
+    pages = []
+    for i in range(rows):
+        name = str(names[i])
+        title = [] if i % 1000 == 999 else [
+            {'type': 'text', 'text': {'content': name, 'link': None}, 'plain_text': name, 'href': None}]
+        pages.append({
+            'object': 'page',
+            'id': f'page-{i}',
+            'last_edited_time': f'{dates[i]}T12:00:00.000Z',
+            'properties': {
+                'person_or_business': {'id': 'title', 'type': 'title', 'title': title},
+                'date': {'type': 'date', 'date': {'start': dates[i], 'end': None}},
+                'category': {'type': 'select', 'select': {'name': get_category(name, categories), 'color': 'red'}},
+                'debit': {'type': 'number', 'number': None if is_credit[i] else float(amounts[i])},
+                'credit': {'type': 'number', 'number': float(amounts[i]) if is_credit[i] else None},
+            },
+        })
+    return pages
+
+
+def generate_history(rows, categories, seed=0, merchants=None):
+    """Creates a transaction history in the layout of the history store."""
+    rng = np.random.default_rng(seed)
+    merchants = merchants if merchants is not None else generate_merchants(get_merchant_count(rows), seed)
+    merchant = merchants.iloc[sample_merchants(merchants, rows, rng)]
+    categories = sorted(categories)
+    category_by_name = {name: get_category(name, categories) for name in merchants['name']}
+
+    df = pd.DataFrame({
+        c.DATE: sample_dates(rows, rng, start='2015-01-01', days=3650).strftime('%Y-%m-%d'),
+        c.CARD_NUMBER: rng.choice(CARD_NUMBERS + [-1], rows),
+        c.BUSINESS_OR_PERSON_ORIGINAL: merchant['description'].str.lower().to_numpy(),
+        c.CATEGORY_ORIGINAL: merchant['capital_one_category'].str.lower().to_numpy(),
+        c.DEBIT: sample_amounts(rows, rng),
+        c.CREDIT: np.nan,
+        c.BUSINESS_OR_PERSON: merchant['name'].to_numpy(),
+        c.CATEGORY: merchant['name'].map(category_by_name).to_numpy(),
+    })
+    # Number repeated transactions the way the credit card pipeline does.
+    df[c.SEQUENCE] = df.groupby([c.DATE, c.CARD_NUMBER, c.BUSINESS_OR_PERSON_ORIGINAL, c.DEBIT]).cumcount() + 1
+    return df
+
+
+def get_category(business, categories):
+    """Returns a stable category for a business, the same in every process."""
+    return categories[zlib.crc32(business.encode()) % len(categories)]
+
+
+def write_notion_pages(pages, file_path):
+    with open(file_path, 'w') as file:
+        json.dump(pages, file)
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+
+import accounting.constant as c
+from accounting.analytics import CARD, CATEGORY, SpendingAnalytics
+from accounting.pipelines.transaction_history_pipeline import TransactionHistoryPipeline
+from accounting.stores.history_store import SQLiteHistoryStore
+from tests.test_history_store import create_transactions_df
+
+
+class TestSpendingAnalytics(unittest.TestCase):
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.store = SQLiteHistoryStore(os.path.join(self.temp_directory.name, 'transactions_history.sqlite'))
+        self.analytics = SpendingAnalytics(self.store.aggregates_path)
+        self.pipeline = self.create_pipeline(self.analytics)
+
+    def create_pipeline(self, analytics):
+        return TransactionHistoryPipeline(
+            file_path=os.path.join(self.temp_directory.name, 'transactions_history.csv'), store=self.store,
+            analytics=analytics)
+
+    def test_spend_is_answered_from_monthly_totals(self):
+        self.pipeline.load_transaction_history(create_transactions_df([
+            ['2024-04-30', 'cafe', 'dining', 3.20, None, 1],
+            ['2024-05-08', 'hernals. kebap pizza', 'dining', 5.61, None, 1],
+            ['2024-05-09', 'billa dankt', 'groceries', 50.90, None, 1],
+            ['2024-06-01', 'cafe', 'dining', 4.00, None, 1],
+        ]))
+
+        self.assertEqual(self.analytics.spend('dining'), 12.81)
+        self.assertEqual(self.analytics.spend('dining', start='2024-05', end='2024-06-15'), 9.61)
+        self.assertEqual(self.analytics.spend(start='2024-05-01', end='2024-05-31'), 56.51)
+        self.assertEqual(self.analytics.spend(merchant='cafe', end='2024-05'), 3.20)
+        self.assertEqual(self.analytics.spend(card=5739, start='2024-07'), 0.0)
+        self.assertEqual(self.analytics.totals_between(CARD, 5739)['count'], 4)
+        with self.assertRaises(ValueError):
+            self.analytics.spend('dining', merchant='cafe')
+
+    def test_only_new_transactions_are_added_to_totals(self):
+        df = create_transactions_df([['2024-05-08', 'hernals. kebap pizza', 'dining', 5.61, None, 1]])
+        self.pipeline.load_transaction_history(df)
+        self.assertEqual(self.analytics.spend('dining'), 5.61)
+
+        self.pipeline.load_transaction_history(df)
+        self.pipeline.load_transaction_history(create_transactions_df([
+            ['2024-05-08', 'hernals. kebap pizza', 'dining', 5.61, None, 2]]))
+
+        self.assertEqual(self.analytics.spend('dining'), 11.22)
+        self.assertEqual(self.analytics.monthly_totals(CATEGORY, 'dining')['count'].tolist(), [2])
+
+    def test_totals_are_rebuilt_when_out_of_sync_with_history(self):
+        self.store.insert(create_transactions_df([['2024-05-09', 'billa dankt', 'groceries', 50.90, None, 1]]))
+
+        self.create_pipeline(self.analytics)
+
+        self.assertEqual(self.analytics.spend('groceries'), 50.90)
+        self.assertEqual(self.analytics.count(), self.store.count())
+
+    def test_backfill_moves_uncategorized_transactions_and_totals(self):
+        self.pipeline.load_transaction_history(create_transactions_df([
+            ['2024-05-08', 'mystery shop', c.UNCATEGORIZED, 7.00, None, 1],
+            ['2024-06-08', 'mystery shop', c.UNCATEGORIZED, 3.00, None, 1],
+            ['2024-06-09', 'cafe', c.UNCATEGORIZED, 4.00, None, 1],
+        ]))
+
+        moved_df = self.pipeline.backfill_categories({'mystery shop': 'merchandise'})
+
+        self.assertEqual(len(moved_df), 2)
+        self.assertEqual(self.store.read(categories=['merchandise'])[c.DEBIT].tolist(), [3.00, 7.00])
+        self.assertEqual(self.analytics.spend('merchandise'), 10.00)
+        self.assertEqual(self.analytics.spend(c.UNCATEGORIZED), 4.00)
+        self.assertEqual(self.analytics.spend(), 14.00)
+
+    def tearDown(self):
+        self.analytics.close()
+        self.store.close()
+        self.temp_directory.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+import pandas as pd
+
+import accounting.constant as c
+from accounting.pipelines.cash_transactions_pipeline import CashTransactionsPipeline
+
+
+class TestCashTransactionsPipeline(unittest.TestCase):
+    def setUp(self):
+        self.cash_transactions_pipeline = CashTransactionsPipeline(url=None, headers={})
+
+    def test_convert_pages_handles_missing_properties(self):
+        pages = [
+            {'properties': {
+                'person_or_business': {'title': [{'plain_text': 'Billa'}]},
+                'date': {'date': {'start': '2024-05-07'}},
+                'category': {'select': {'name': 'Groceries'}},
+                'debit': {'number': 12.5},
+                'credit': {'number': None},
+            }},
+            {'properties': {
+                'person_or_business': {'title': []},
+                'date': {'date': None},
+                'category': {'select': None},
+                'debit': {'number': None},
+                'credit': {'number': 20},
+            }},
+        ]
+
+        df = self.cash_transactions_pipeline.convert_pages(pages)
+
+        self.assertEqual(df[c.BUSINESS_OR_PERSON].tolist(), ['Billa', ''])
+        self.assertEqual(df[c.DATE].tolist(), ['2024-05-07', ''])
+        self.assertEqual(df[c.CATEGORY].tolist(), ['Groceries', ''])
+        self.assertEqual(df[c.DEBIT].dtype, float)
+        self.assertTrue(pd.isna(df[c.DEBIT].iloc[1]))
+        self.assertEqual(df[c.CREDIT].iloc[1], 20.0)
+
+    def test_whole_amounts_pass_validation(self):
+        pages = [{'properties': {
+            'person_or_business': {'title': [{'plain_text': 'Billa'}]},
+            'date': {'date': {'start': '2024-05-07'}},
+            'category': {'select': {'name': 'groceries'}},
+            'debit': {'number': 20},
+            'credit': {'number': 0},
+        }}]
+
+        df = self.cash_transactions_pipeline.clean_transactions(self.cash_transactions_pipeline.convert_pages(pages))
+
+        self.assertEqual(df[c.DEBIT].dtype, float)
+        self.assertEqual(df[c.CREDIT].dtype, float)
+        self.assertEqual(df[c.DEBIT].tolist(), [20.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,24 +1,35 @@
+import os
+import tempfile
 import unittest
+from unittest.mock import patch
 import pandas as pd
 from pandera.errors import SchemaErrors
 
 import accounting.constant as c
-from accounting.pipelines.credit_card_transactions_pipeline import CreditCardTransactionsPipeline
+from accounting import instrumentation
+from accounting.instrumentation import start_run
+from accounting.parsers.registry import CAPITAL_ONE
+from accounting.pipelines.credit_card_transactions_pipeline import (CreditCardTransactionsPipeline, clean_transactions,
+                                                                    extract_statement)
+from accounting.stores.ingestion_ledger import IngestionLedger
 import accounting.tool as tool
 
 
 class TestCreditCardTransactionsPipeline(unittest.TestCase):
     def setUp(self):
-        self.credit_card_transactions_pipeline = CreditCardTransactionsPipeline([])
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.ledger = IngestionLedger(os.path.join(self.temp_directory.name, 'ingestion_ledger.sqlite'))
+        self.credit_card_transactions_pipeline = CreditCardTransactionsPipeline([], ledger=self.ledger)
         self.invalid_transactions_file_name = 'tests/mock_data/invalid_capital_one_transactions.csv'
+        self.valid_transactions_file_name = 'valid_capital_one_transactions.csv'
         self.temp_file_paths = []
 
 
     def test_invalid_transactions_csv_format(self):
-        df = self.credit_card_transactions_pipeline.extract_capital_one_transactions(file_path=self.invalid_transactions_file_name)
+        parser, df = extract_statement(self.invalid_transactions_file_name)
 
         with self.assertRaises(SchemaErrors):
-            self.credit_card_transactions_pipeline.clean_capital_one_transactions(df)
+            clean_transactions(df, parser)
     
     def test_invalid_column_loaded_to_transactions_history(self):
         df = pd.read_csv(self.invalid_transactions_file_name, encoding='latin-1')
@@ -29,8 +40,62 @@ class TestCreditCardTransactionsPipeline(unittest.TestCase):
         with self.assertRaises(SchemaErrors):
             self.credit_card_transactions_pipeline.load_transactions(df, temp_file_path)
 
+    @patch.object(c, 'TEMP_DIRECTORY_PATH', 'tests/mock_data/')
+    def test_parallel_extract_matches_serial_extract(self):
+        file_paths = [self.valid_transactions_file_name, self.valid_transactions_file_name]
+        serial_pipeline = CreditCardTransactionsPipeline(file_paths, ledger=self.ledger)
+        parallel_pipeline = CreditCardTransactionsPipeline(file_paths, workers=2, ledger=self.ledger)
+
+        serial_dfs = serial_pipeline.extract_and_clean_transactions()
+        metrics = start_run(profile=False)
+        self.addCleanup(setattr, instrumentation, 'current_run', None)
+        parallel_dfs = parallel_pipeline.extract_and_clean_transactions()
+
+        # Stages recorded in the workers are added to the parent's run.
+        clean_stages = [stage for stage in metrics.stages if stage['name'] == 'credit_card.clean']
+        self.assertEqual([stage['depth'] for stage in clean_stages], [1, 1])
+        self.assertEqual(len(parallel_dfs), 2)
+        for serial_df, parallel_df in zip(serial_dfs, parallel_dfs):
+            pd.testing.assert_frame_equal(serial_df, parallel_df)
+
+    def test_set_unique_identifiers_numbers_duplicates(self):
+        df = pd.DataFrame({
+            c.DATE: ['2024-05-08', '2024-05-08', '2024-05-09'],
+            c.CARD_NUMBER: [5739, 5739, 5739],
+            c.BUSINESS_OR_PERSON_ORIGINAL: ['billa dankt', 'billa dankt', 'billa dankt'],
+            c.DEBIT: [5.61, 5.61, 5.61],
+        })
+
+        df = self.credit_card_transactions_pipeline.set_unique_identifiers(df)
+
+        self.assertEqual(df[c.SEQUENCE].tolist(), [1, 2, 1])
+
+    def test_chunked_unique_identifiers_match_whole_file(self):
+        df = pd.read_csv('tests/mock_data/valid_capital_one_transactions.csv', encoding='latin-1')
+        df = pd.concat([df, df.iloc[:4], df.iloc[:2]], ignore_index=True)
+        temp_file_path = 'tests/mock_data/duplicated_capital_one_transactions.csv'
+        self.temp_file_paths.append(temp_file_path)
+        df.to_csv(temp_file_path, index=False)
+
+        parser, whole_df = extract_statement(temp_file_path)
+        whole_df = clean_transactions(whole_df, parser)
+        whole_df = self.credit_card_transactions_pipeline.set_unique_identifiers(whole_df)
+
+        chunked_dfs = []
+        sequence_counts = None
+        for chunk_df in CAPITAL_ONE.read_in_chunks(temp_file_path, chunksize=5):
+            chunk_df = clean_transactions(chunk_df, CAPITAL_ONE)
+            chunk_df = self.credit_card_transactions_pipeline.set_unique_identifiers(chunk_df, sequence_counts)
+            sequence_counts = self.credit_card_transactions_pipeline.count_sequences(chunk_df, sequence_counts)
+            chunked_dfs.append(chunk_df)
+
+        self.assertEqual(pd.concat(chunked_dfs)[c.SEQUENCE].tolist(), whole_df[c.SEQUENCE].tolist())
+        self.assertEqual(whole_df[c.SEQUENCE].max(), 3)
+
     def tearDown(self):
         tool.send_to_trash(self.temp_file_paths)
+        self.ledger.close()
+        self.temp_directory.cleanup()
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+import accounting.constant as c
+from accounting.merchant_normalization import MerchantIndex
+from accounting.pipelines.transaction_history_pipeline import TransactionHistoryPipeline
+from accounting.schemas.dtypes import COMPACT_DTYPES, to_compact_dtypes
+from accounting.schemas.transaction_schema import TransactionSchema
+from accounting.schemas.validation import validate
+from accounting.stores.history_store import SQLiteHistoryStore
+from accounting.stores.merchant_store import MerchantCategoryStore
+from accounting.transaction_category import categorize_transactions
+from tests.test_history_store import create_transactions_df
+
+
+def create_compact_df(rows):
+    return to_compact_dtypes(create_transactions_df(rows).astype({c.CREDIT: float}))
+
+
+class TestCompactDtypes(unittest.TestCase):
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_directory.cleanup)
+
+    def assertCompact(self, df):
+        for column, dtype in COMPACT_DTYPES.items():
+            self.assertEqual(str(df[column].dtype), dtype, column)
+        self.assertEqual(str(df[c.DATE].dtype), 'datetime64[ns]')
+
+    def test_compact_transactions_pass_the_schema(self):
+        df = create_compact_df([['2024-05-08', 'cafe', 'dining', 3.20, None, 1]])
+
+        self.assertCompact(validate(df, TransactionSchema))
+        with self.assertRaises(Exception):
+            validate(df.assign(**{c.SEQUENCE: 1.5}), TransactionSchema)
+
+    def test_merchant_categories_survive_the_categories_merge(self):
+        store = MerchantCategoryStore(os.path.join(self.temp_directory.name, 'merchants.sqlite'))
+        self.addCleanup(store.close)
+        store.upsert({'cafe': 'dining'})
+        df = create_compact_df([
+            ['2024-05-08', 'cafe', 'Dining', 3.20, None, 1],
+            ['2024-05-09', 'new shop', 'Merchandise', 7.00, None, 1],
+        ]).drop(columns=[c.CATEGORY_ORIGINAL])
+
+        with patch('accounting.transaction_category.get_merchant_store', return_value=store), \
+                patch('accounting.transaction_category.get_merchant_index', return_value=MerchantIndex(['cafe'])), \
+                patch('builtins.print'):
+            df = categorize_transactions(df)
+
+        self.assertEqual(df[c.CATEGORY].tolist()[0], 'dining')
+        self.assertTrue(pd.isna(df[c.CATEGORY].tolist()[1]))
+        self.assertEqual(str(df[c.BUSINESS_OR_PERSON].dtype), 'category')
+        self.assertEqual(str(df[c.DATE].dtype), 'datetime64[ns]')
+
+    def test_compact_transactions_are_deduplicated_sorted_and_stored(self):
+        store = SQLiteHistoryStore(os.path.join(self.temp_directory.name, 'transactions_history.sqlite'))
+        self.addCleanup(store.close)
+        pipeline = TransactionHistoryPipeline(
+            file_path=os.path.join(self.temp_directory.name, 'transactions_history.csv'), store=store)
+        df = create_compact_df([
+            ['2024-05-07', 'billa dankt', 'groceries', 50.90, None, 1],
+            ['2024-05-09', 'cafe', 'dining', 3.20, None, 1],
+            ['2024-05-09', 'cafe', 'dining', 3.20, None, 1],
+        ])
+
+        cleaned_df = pipeline.clean_transaction_history(df)
+        with patch('builtins.print'):
+            pipeline.load_transaction_history(cleaned_df)
+
+        self.assertCompact(cleaned_df)
+        self.assertEqual(cleaned_df[c.BUSINESS_OR_PERSON].tolist(), ['cafe', 'billa dankt'])
+        self.assertEqual(store.read()[c.DATE].tolist(), ['2024-05-09', '2024-05-07'])
+        self.assertCompact(pipeline.extract_transaction_history())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+import accounting.constant as c
+from accounting.schemas.dtypes import to_compact_dtypes
+from accounting.stores.history_store import SQLiteHistoryStore
+
+
+def create_transactions_df(rows):
+    return pd.DataFrame(rows, columns=[c.DATE, c.BUSINESS_OR_PERSON_ORIGINAL, c.CATEGORY, c.DEBIT, c.CREDIT, c.SEQUENCE]).assign(**{
+        c.CARD_NUMBER: 5739,
+        c.CATEGORY_ORIGINAL: 'dining',
+        c.BUSINESS_OR_PERSON: lambda df: df[c.BUSINESS_OR_PERSON_ORIGINAL],
+    })
+
+
+class TestSQLiteHistoryStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.store = SQLiteHistoryStore(os.path.join(self.temp_directory.name, 'transactions_history.sqlite'))
+
+    def test_insert_is_idempotent(self):
+        df = create_transactions_df([
+            ['2024-05-08', 'hernals. kebap pizza', 'dining', 5.61, None, 1],
+            ['2024-05-08', 'capital one online pymt', 'no category', None, 1210.32, 1],
+        ])
+
+        first_added_df = self.store.insert(df)
+        second_added_df = self.store.insert(df)
+
+        self.assertEqual(len(first_added_df), 2)
+        self.assertTrue(second_added_df.empty)
+        self.assertEqual(self.store.count(), 2)
+
+    def test_insert_returns_only_new_transactions(self):
+        self.store.insert(create_transactions_df([['2024-05-08', 'hernals. kebap pizza', 'dining', 5.61, None, 1]]))
+
+        added_df = self.store.insert(create_transactions_df([
+            ['2024-05-08', 'hernals. kebap pizza', 'dining', 5.61, None, 1],
+            ['2024-05-08', 'hernals. kebap pizza', 'dining', 5.61, None, 2],
+        ]))
+
+        self.assertEqual(added_df[c.SEQUENCE].tolist(), [2])
+
+    def test_export_csv_is_sorted(self):
+        self.store.insert(create_transactions_df([
+            ['2024-05-07', 'billa dankt', 'groceries', 50.90, None, 1],
+            ['2024-05-09', 'gorilla kitchen deli', 'dining', 17.56, None, 1],
+            ['2024-05-07', 'cafe', 'dining', 3.20, None, 1],
+        ]))
+        file_path = os.path.join(self.temp_directory.name, 'transactions_history.csv')
+
+        self.store.export_csv(file_path)
+
+        df = pd.read_csv(file_path)
+        self.assertEqual(list(df.columns), c.HISTORY_COLUMNS)
+        self.assertEqual(df[c.BUSINESS_OR_PERSON].tolist(), ['gorilla kitchen deli', 'cafe', 'billa dankt'])
+
+    @patch('accounting.stores.history_store.QUERY_BATCH_SIZE', 1)
+    def test_recategorize_moves_uncategorized_transactions_in_batches(self):
+        self.store.insert(create_transactions_df([
+            ['2024-05-07', 'mystery shop', c.UNCATEGORIZED, 7.00, None, 1],
+            ['2024-05-08', 'corner shop', c.UNCATEGORIZED, 3.00, None, 1],
+            ['2024-05-09', 'corner shop', 'dining', 4.00, None, 1],
+        ]))
+
+        moved_df = self.store.recategorize({'mystery shop': 'merchandise', 'corner shop': 'groceries'})
+
+        self.assertEqual(sorted(moved_df[c.BUSINESS_OR_PERSON].tolist()), ['corner shop', 'mystery shop'])
+        self.assertEqual(self.store.read()[c.CATEGORY].tolist(), ['dining', 'groceries', 'merchandise'])
+
+    def test_recategorize_moves_transactions_with_the_predicted_category(self):
+        self.store.insert(create_transactions_df([
+            ['2024-05-07', 'cinema city', 'groceries', 12.00, None, 1],
+            ['2024-05-08', 'cinema city', 'dining', 6.00, None, 1],
+            ['2024-05-09', 'harbor market', 'groceries', 9.00, None, 1],
+        ]))
+
+        moved_df = self.store.recategorize({'cinema city': 'entertainment'}, {'cinema city': 'groceries'})
+
+        self.assertEqual(moved_df[c.DEBIT].tolist(), [12.00])
+        self.assertEqual(self.store.read()[c.CATEGORY].tolist(), ['groceries', 'dining', 'entertainment'])
+
+    def test_migrated_dates_with_a_time_match_new_transactions(self):
+        csv_path = os.path.join(self.temp_directory.name, 'transactions_history.csv')
+        row = ['2024-05-01T10:00:00.000+02:00', 'hernals. kebap pizza', 'dining', 5.61, None, 1]
+        create_transactions_df([row]).to_csv(csv_path, index=False)
+        # A database that stored a date with its time before dates were formatted on insert, then the same
+        # transaction again without it.
+        self.store.connection.execute(
+            f"INSERT INTO transactions ({c.DATE}, {c.CARD_NUMBER}, {c.BUSINESS_OR_PERSON_ORIGINAL}, {c.DEBIT}, "
+            f"{c.SEQUENCE}) VALUES ('2024-05-02T09:00:00.000+02:00', 5739, 'cafe', 3.2, 1)")
+        self.store.insert(create_transactions_df([['2024-05-02', 'cafe', 'dining', 3.2, None, 1]]))
+
+        with patch('builtins.print'):
+            self.store.migrate_from_csv(csv_path)
+        added_df = self.store.insert(to_compact_dtypes(create_transactions_df([row])))
+
+        self.assertTrue(added_df.empty)
+        self.assertEqual(self.store.read()[c.DATE].tolist(), ['2024-05-02', '2024-05-01'])
+
+    def tearDown(self):
+        self.store.close()
+        self.temp_directory.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
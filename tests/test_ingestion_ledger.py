@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+import accounting.constant as c
+from accounting.pipelines.credit_card_transactions_pipeline import (CreditCardTransactionsPipeline, clean_transactions,
+                                                                    extract_statement)
+from accounting.stores.history_store import SQLiteHistoryStore
+from accounting.stores.ingestion_ledger import ROW_HASH, IngestionLedger, get_row_sequences
+
+
+class TestIngestionLedger(unittest.TestCase):
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.ledger = IngestionLedger(os.path.join(self.temp_directory.name, 'ingestion_ledger.sqlite'))
+        self.pipeline = CreditCardTransactionsPipeline([], ledger=self.ledger)
+
+    def create_statement_df(self, rows):
+        df = pd.DataFrame(rows, columns=[c.DATE, c.BUSINESS_OR_PERSON_ORIGINAL, c.DEBIT]).assign(**{c.CARD_NUMBER: 5739})
+        return self.pipeline.set_unique_identifiers(df)
+
+    def test_overlapping_statements_only_keep_new_transactions(self):
+        first_df = self.ledger.filter_imported(self.create_statement_df([
+            ['2024-05-08', 'billa dankt', 5.61],
+            ['2024-05-08', 'billa dankt', 5.61],
+            ['2024-05-09', 'gorilla kitchen deli', 17.56],
+        ]))
+        self.ledger.add_rows(get_row_sequences(first_df))
+
+        second_df = self.ledger.filter_imported(self.create_statement_df([
+            ['2024-05-08', 'billa dankt', 5.61],
+            ['2024-05-09', 'gorilla kitchen deli', 17.56],
+            ['2024-05-10', 'gorilla kitchen deli', 17.56],
+        ]))
+        third_df = self.ledger.filter_imported(self.create_statement_df([
+            ['2024-05-08', 'billa dankt', 5.61],
+            ['2024-05-08', 'billa dankt', 5.61],
+            ['2024-05-08', 'billa dankt', 5.61],
+        ]))
+
+        self.assertEqual(len(first_df), 3)
+        self.assertEqual(second_df[c.DATE].tolist(), ['2024-05-10'])
+        self.assertEqual(third_df[c.SEQUENCE].tolist(), [3])
+
+    def test_statements_of_the_same_import_are_compared_with_each_other(self):
+        first_df = self.ledger.filter_imported(self.create_statement_df([['2024-05-08', 'billa dankt', 5.61]]))
+        second_df = self.ledger.filter_imported(
+            self.create_statement_df([['2024-05-08', 'billa dankt', 5.61]]), get_row_sequences(first_df))
+
+        self.assertEqual(len(first_df), 1)
+        self.assertTrue(second_df.empty)
+
+    def test_transactions_in_history_are_recognized(self):
+        store = SQLiteHistoryStore(os.path.join(self.temp_directory.name, 'transactions_history.sqlite'))
+        parser, statement_df = extract_statement('tests/mock_data/valid_capital_one_transactions.csv')
+        statement_df = self.pipeline.set_unique_identifiers(clean_transactions(statement_df, parser))
+        store.insert(statement_df.iloc[:3].assign(**{c.CATEGORY_ORIGINAL: 'dining'}))
+
+        self.ledger.migrate_from_history(store)
+        new_df = self.pipeline.remove_imported_transactions(statement_df)
+
+        self.assertEqual(len(new_df), len(statement_df) - 3)
+        self.assertIn(ROW_HASH, new_df.columns)
+        store.close()
+
+    def tearDown(self):
+        self.ledger.close()
+        self.temp_directory.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+import accounting.constant as c
+from accounting import instrumentation
+from accounting.instrumentation import RunMetrics, get_run_metrics, instrument, start_run
+from accounting.merchant_classifier import CONFIDENCE, SIMILARITY
+from accounting.transaction_category import CategorizationEngine
+from tests.test_transaction_category import FakeCategoryBackend, create_transactions_df
+
+
+@instrument('test.drop_first_row')
+def drop_first_row(df):
+    return df.iloc[1:]
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.addCleanup(setattr, instrumentation, 'current_run', None)
+
+    def test_instrument_records_rows_time_and_memory(self):
+        metrics = start_run(profile=False)
+
+        drop_first_row(pd.DataFrame({'a': [1, 2, 3]}))
+
+        stage, = metrics.stages
+        self.assertEqual(stage['name'], 'test.drop_first_row')
+        self.assertEqual((stage['rows_in'], stage['rows_out']), (3, 2))
+        self.assertGreaterEqual(stage['seconds'], 0)
+        self.assertGreater(stage['peak_memory_mb'], 0)
+
+    def test_nested_stages_record_depth(self):
+        metrics = RunMetrics()
+        with metrics.stage('outer'):
+            with metrics.stage('inner'):
+                pass
+
+        self.assertEqual([(stage['name'], stage['depth']) for stage in metrics.stages], [('inner', 1), ('outer', 0)])
+
+    def test_llm_calls_are_counted(self):
+        metrics = start_run(profile=False)
+        engine = CategorizationEngine(backend=FakeCategoryBackend(failures=1), batch_size=2, backoff=0)
+
+        predictions = pd.DataFrame({c.CATEGORY: [], CONFIDENCE: [], SIMILARITY: []})
+        with patch('accounting.transaction_category.load_business_to_category_mappings',
+                   side_effect=lambda mappings: mappings), \
+                patch('accounting.transaction_category.get_queued_businesses', return_value={}), \
+                patch('accounting.transaction_category.classify_businesses', return_value=predictions):
+            engine.categorize(create_transactions_df(['cafe', 'diner', 'bistro']))
+
+        self.assertEqual(metrics.counters['llm_calls'], 3)
+        self.assertIn('categorize.llm', [stage['name'] for stage in metrics.stages])
+
+    def test_finish_writes_json_and_profile(self):
+        with patch.dict(os.environ, {c.PROFILE_KEY: '1'}):
+            metrics = start_run()
+        with metrics.stage('profiled'):
+            bytearray(1024 * 1024)
+        get_run_metrics().increment('llm_calls', 2)
+
+        with patch('builtins.print'):
+            file_path = metrics.finish(self.temp_dir.name)
+
+        with open(file_path) as file:
+            report = json.load(file)
+        self.assertEqual(report['counters'], {'llm_calls': 2})
+        self.assertGreaterEqual(report['stages'][0]['traced_peak_memory_mb'], 1)
+        self.assertTrue(os.path.exists(file_path[:-len('.json')] + '.prof'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+import accounting.constant as c
+from accounting.merchant_classifier import CONFIDENCE, SIMILARITY, MerchantClassifier
+
+MAPPINGS = {
+    'blue bottle coffee': 'dining',
+    'golden grill': 'dining',
+    'corner pizza kitchen': 'dining',
+    'river cafe': 'dining',
+    'whole foods market': 'groceries',
+    'village farmers market': 'groceries',
+    'city grocery outlet': 'groceries',
+    'shell oil': 'car/bike/metro',
+    'chevron fuel': 'car/bike/metro',
+    'metro transit': 'car/bike/metro',
+}
+
+
+class TestMerchantClassifier(unittest.TestCase):
+    def setUp(self):
+        self.classifier = MerchantClassifier()
+        self.classifier.update(MAPPINGS)
+
+    def test_predictions_are_confident_only_for_familiar_names(self):
+        predictions = self.classifier.predict(['north pizza cafe', 'harbor market', 'xq', 'cinema city'])
+
+        self.assertEqual(predictions[c.CATEGORY].tolist()[:2], ['dining', 'groceries'])
+        self.assertGreater(predictions.loc['north pizza cafe', CONFIDENCE], 0.6)
+        self.assertGreater(predictions.loc['north pizza cafe', SIMILARITY], c.CLASSIFIER_MIN_SIMILARITY)
+        self.assertLess(predictions.loc['xq', CONFIDENCE], 0.6)
+        # Confident about the closest category, but far from all of them.
+        self.assertGreater(predictions.loc['cinema city', CONFIDENCE], 0.6)
+        self.assertLess(predictions.loc['cinema city', SIMILARITY], c.CLASSIFIER_MIN_SIMILARITY)
+
+    def test_incremental_updates_match_training_from_scratch(self):
+        self.classifier.update({'harbor bakery': 'dining', 'river cafe': 'groceries'})
+        mappings = {**MAPPINGS, 'harbor bakery': 'dining', 'river cafe': 'groceries'}
+        retrained_classifier = MerchantClassifier()
+        retrained_classifier.update(mappings)
+
+        names = ['north pizza cafe', 'harbor market', 'lake bakery']
+        self.assertEqual(self.classifier.merchants, mappings)
+        self.assertEqual(self.classifier.predict(names)[CONFIDENCE].round(6).tolist(),
+                         retrained_classifier.predict(names)[CONFIDENCE].round(6).tolist())
+
+    def test_saved_model_is_synchronized_with_the_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'merchant_classifier.npz')
+            self.classifier.save(file_path)
+            classifier = MerchantClassifier.load(file_path)
+
+            changed = classifier.synchronize({**MAPPINGS, 'harbor bakery': 'dining'})
+            unchanged = classifier.synchronize({**MAPPINGS, 'harbor bakery': 'dining'})
+
+        self.assertTrue(changed)
+        self.assertFalse(unchanged)
+        self.assertEqual(len(classifier.merchants), len(MAPPINGS) + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
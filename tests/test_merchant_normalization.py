@@ -0,0 +1,32 @@
+import unittest
+
+import pandas as pd
+
+from accounting.merchant_normalization import MerchantIndex, normalize_merchant_names
+
+
+class TestMerchantNormalization(unittest.TestCase):
+    def test_normalize_merchant_names(self):
+        descriptions = pd.Series([
+            'amazon mktp us*2a3b4c', 'amzn mktp us', 'sq *blue bottle coffee', 'starbucks store #1234', None])
+
+        names = normalize_merchant_names(descriptions)
+
+        self.assertEqual(names.tolist()[:4], ['amazon mktp us', 'amazon mktp us', 'blue bottle coffee', 'starbucks store'])
+        self.assertTrue(pd.isna(names.iloc[4]))
+
+    def test_merchant_index_matches_near_names(self):
+        merchant_index = MerchantIndex(['blue bottle coffee', 'hernals. kebap pizza', 'ikea wien'])
+        merchant_index.add(['billa dankt'])
+
+        matches = merchant_index.match(['blue botle coffee', 'hernals kebap pizza', 'billa dankt ', 'gorilla kitchen deli'])
+
+        self.assertEqual(matches, {
+            'blue botle coffee': 'blue bottle coffee',
+            'hernals kebap pizza': 'hernals. kebap pizza',
+            'billa dankt ': 'billa dankt',
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()
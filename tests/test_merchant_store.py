@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+import accounting.constant as c
+from accounting.stores.merchant_store import MerchantCategoryStore
+
+
+class TestMerchantCategoryStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_directory.name, 'categorized_businesses.sqlite')
+        self.store = MerchantCategoryStore(self.db_path)
+
+    def test_upsert_replaces_existing_categories(self):
+        self.store.upsert({'billa dankt': 'groceries', 'gorilla kitchen deli': 'dining'})
+        self.store.upsert({'billa dankt': 'merchandise'})
+
+        reopened_store = MerchantCategoryStore(self.db_path)
+        categories = reopened_store.get_categories(['billa dankt', 'gorilla kitchen deli', 'unknown'])
+        reopened_store.close()
+
+        self.assertEqual(categories, {'billa dankt': 'merchandise', 'gorilla kitchen deli': 'dining'})
+
+    def test_migrate_from_csv_runs_once(self):
+        csv_path = os.path.join(self.temp_directory.name, 'categorized_businesses.csv')
+        pd.DataFrame({
+            c.BUSINESS_OR_PERSON: ['billa dankt', 'billa dankt', 'hernals. kebap pizza'],
+            c.CATEGORY: ['merchandise', 'groceries', 'dining']
+        }).to_csv(csv_path, index=False)
+
+        self.store.migrate_from_csv(csv_path)
+        self.store.upsert({'billa dankt': 'home'})
+        self.store.migrate_from_csv(csv_path)
+
+        self.assertEqual(self.store.to_dataframe().values.tolist(), [
+            ['billa dankt', 'home'],
+            ['hernals. kebap pizza', 'dining']
+        ])
+
+    def test_review_queue_holds_each_business_once_until_resolved(self):
+        df = pd.DataFrame({
+            c.BUSINESS_OR_PERSON: ['zum gruenen baum', 'mystery shop'],
+            c.BUSINESS_OR_PERSON_ORIGINAL: ['zum gruenen baum 1070', 'mystery shop #12'],
+            c.CATEGORY_ORIGINAL: ['dining', None],
+            c.DEBIT: [12.5, 3.0],
+            c.CATEGORY: [None, 'merchandise'],
+        })
+        self.store.queue_for_review(df)
+        self.store.queue_for_review(df.iloc[:1].assign(**{c.DEBIT: 99.0}))
+
+        self.assertEqual(self.store.get_review_queue()[c.DEBIT].tolist(), [3.0, 12.5])
+        self.assertEqual(self.store.get_queued(['mystery shop', 'billa dankt']), {'mystery shop': 'merchandise'})
+
+        predictions = self.store.resolve({'mystery shop': 'home'})
+
+        self.assertEqual(predictions, {'mystery shop': 'merchandise'})
+        self.assertEqual(self.store.get_review_queue()[c.BUSINESS_OR_PERSON].tolist(), ['zum gruenen baum'])
+        self.assertEqual(self.store.get_categories(['mystery shop']), {'mystery shop': 'home'})
+
+    def test_businesses_are_renamed_with_the_current_normalization_rules_once(self):
+        self.store.upsert({
+            'sq *blue bottle': 'dining', 'blue bottle': 'groceries', 'amzn mktp us': 'merchandise', 'billa dankt ': 'groceries'})
+        self.store.queue_for_review(pd.DataFrame({
+            c.BUSINESS_OR_PERSON: ['tst* mystery shop'], c.BUSINESS_OR_PERSON_ORIGINAL: ['tst* mystery shop 12'],
+            c.CATEGORY_ORIGINAL: [None], c.DEBIT: [3.0], c.CATEGORY: [None],
+        }))
+
+        with patch('builtins.print'):
+            self.store.migrate_business_names()
+        self.store.upsert({'sq *blue bottle': 'home'})
+        self.store.migrate_business_names()
+
+        self.assertEqual(self.store.to_dataframe().values.tolist(), [
+            ['amazon mktp us', 'merchandise'],
+            ['billa dankt', 'groceries'],
+            ['blue bottle', 'groceries'],
+            ['sq *blue bottle', 'home'],
+        ])
+        self.assertEqual(self.store.get_review_queue()[c.BUSINESS_OR_PERSON].tolist(), ['mystery shop'])
+
+    def tearDown(self):
+        self.store.close()
+        self.temp_directory.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
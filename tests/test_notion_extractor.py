@@ -0,0 +1,113 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from accounting.notion_extractor import NotionDatabaseExtractor
+
+
+def create_page(index, last_edited_time):
+    return {
+        'id': f'page-{index}',
+        'last_edited_time': last_edited_time,
+        'properties': {
+            'person_or_business': {'title': [{'plain_text': f'Business {index}'}]},
+            'date': {'date': {'start': '2024-05-01'}},
+            'category': {'select': {'name': 'Dining'}},
+            'debit': {'number': 10.0 + index},
+            'credit': {'number': None},
+        }
+    }
+
+
+class FakeNotionHandler(BaseHTTPRequestHandler):
+    """Serves the pages of FakeNotionHandler.server.pages two at a time, rate limiting the first request."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server.requests.append(body)
+        server.client_ports.add(self.client_address[1])
+
+        if len(server.requests) == 1:
+            self.respond(429, {'message': 'Rate limited'}, {'Retry-After': '0'})
+            return
+
+        pages = server.pages
+        if 'filter' in body:
+            since = body['filter']['last_edited_time']['on_or_after']
+            pages = [page for page in pages if page['last_edited_time'] >= since]
+
+        start = int(body.get('start_cursor', 0))
+        end = start + body['page_size']
+        has_more = end < len(pages)
+        self.respond(200, {'results': pages[start:end], 'has_more': has_more, 'next_cursor': str(end) if has_more else None})
+
+    def respond(self, status_code, data, headers={}):
+        content = json.dumps(data).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestNotionDatabaseExtractor(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeNotionHandler)
+        self.server.pages = [create_page(i, f'2024-05-0{i + 1}T10:00:00.000Z') for i in range(5)]
+        self.server.requests = []
+        self.server.client_ports = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.extractor = NotionDatabaseExtractor(
+            url=f'http://127.0.0.1:{self.server.server_port}/v1/databases/cash/query',
+            headers={'Authorization': 'Bearer fake'},
+            state_path=os.path.join(self.temp_directory.name, 'notion_state.json'),
+            page_size=2,
+            backoff=0)
+
+    def test_extract_pages_follows_cursors_over_one_connection(self):
+        pages = self.extractor.extract_pages()
+
+        self.assertEqual([page['id'] for page in pages], [f'page-{i}' for i in range(5)])
+        # One rate limited request and three pages of results.
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertEqual(len(self.server.client_ports), 1)
+
+    def test_extract_pages_only_fetches_edited_pages_after_commit(self):
+        self.extractor.extract_pages()
+        self.extractor.commit()
+        self.server.pages.append(create_page(5, '2024-05-09T10:00:00.000Z'))
+
+        pages = self.extractor.extract_pages()
+
+        self.assertEqual([page['id'] for page in pages], ['page-4', 'page-5'])
+        self.assertEqual(self.server.requests[-1]['filter']['last_edited_time']['on_or_after'], '2024-05-05T10:00:00.000Z')
+
+    def test_extract_pages_without_commit_fetches_everything_again(self):
+        self.extractor.extract_pages()
+
+        pages = self.extractor.extract_pages()
+
+        self.assertEqual(len(pages), 5)
+
+    def tearDown(self):
+        self.extractor.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_directory.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+import accounting.constant as c
+from accounting.stores.parquet_history_store import ParquetHistoryStore
+
+
+def create_transactions_df(rows):
+    return pd.DataFrame(rows, columns=[c.DATE, c.BUSINESS_OR_PERSON_ORIGINAL, c.CATEGORY, c.DEBIT, c.CREDIT, c.SEQUENCE]).assign(**{
+        c.CARD_NUMBER: 5739,
+        c.CATEGORY_ORIGINAL: 'dining',
+        c.BUSINESS_OR_PERSON: lambda df: df[c.BUSINESS_OR_PERSON_ORIGINAL],
+    })
+
+
+class TestParquetHistoryStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.store = ParquetHistoryStore(os.path.join(self.temp_directory.name, 'transactions_history'))
+        self.df = create_transactions_df([
+            ['2024-04-30', 'billa dankt', 'groceries', 50.90, None, 1],
+            ['2024-05-08', 'capital one online pymt', 'no category', None, 1210.32, 1],
+            ['2024-05-09', 'gorilla kitchen deli', 'dining', 17.56, None, 1],
+        ])
+
+    def test_insert_is_idempotent(self):
+        first_added_df = self.store.insert(self.df)
+        second_added_df = self.store.insert(self.df)
+
+        self.assertEqual(len(first_added_df), 3)
+        self.assertTrue(second_added_df.empty)
+        self.assertEqual(self.store.count(), 3)
+        self.assertTrue(os.path.exists(self.store.partition_path(2024, 4)))
+        self.assertTrue(os.path.exists(self.store.partition_path(2024, 5)))
+
+    def test_read_has_typed_columns(self):
+        self.store.insert(self.df)
+
+        df = self.store.read()
+
+        self.assertEqual(list(df.columns), c.HISTORY_COLUMNS)
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df[c.DATE]))
+        self.assertEqual(df[c.CARD_NUMBER].dtype, 'int64')
+        self.assertEqual(df[c.SEQUENCE].dtype, 'int64')
+        self.assertEqual(df[c.BUSINESS_OR_PERSON].tolist(), ['gorilla kitchen deli', 'capital one online pymt', 'billa dankt'])
+
+    def test_read_filters_by_date_and_category(self):
+        self.store.insert(self.df)
+
+        may_df = self.store.read(start='2024-05-01', end='2024-05-31')
+        dining_df = self.store.read(categories=['dining', 'groceries'], end='2024-05-08')
+
+        self.assertEqual(may_df[c.BUSINESS_OR_PERSON].tolist(), ['gorilla kitchen deli', 'capital one online pymt'])
+        self.assertEqual(dining_df[c.BUSINESS_OR_PERSON].tolist(), ['billa dankt'])
+
+    def test_recategorize_rewrites_uncategorized_transactions(self):
+        self.store.insert(self.df)
+        self.store.insert(create_transactions_df([
+            ['2024-05-10', 'mystery shop', c.UNCATEGORIZED, 7.00, None, 1],
+            ['2024-05-11', 'cafe', c.UNCATEGORIZED, 4.00, None, 1],
+        ]))
+
+        moved_df = self.store.recategorize({'mystery shop': 'merchandise'})
+
+        self.assertEqual(moved_df[c.CATEGORY].tolist(), [c.UNCATEGORIZED])
+        self.assertEqual(self.store.read(categories=['merchandise'])[c.BUSINESS_OR_PERSON].tolist(), ['mystery shop'])
+        self.assertEqual(self.store.read(categories=[c.UNCATEGORIZED])[c.BUSINESS_OR_PERSON].tolist(), ['cafe'])
+        self.assertEqual(self.store.count(), 5)
+
+    def test_recategorize_rewrites_transactions_with_the_predicted_category(self):
+        self.store.insert(create_transactions_df([
+            ['2024-05-10', 'cinema city', 'groceries', 12.00, None, 1],
+            ['2024-05-11', 'cinema city', 'dining', 6.00, None, 1],
+        ]))
+
+        moved_df = self.store.recategorize({'cinema city': 'entertainment'}, {'cinema city': 'groceries'})
+
+        self.assertEqual(moved_df[c.DEBIT].tolist(), [12.00])
+        self.assertEqual(self.store.read(categories=['entertainment'])[c.DEBIT].tolist(), [12.00])
+        self.assertEqual(self.store.read(categories=['dining'])[c.DEBIT].tolist(), [6.00])
+
+    def tearDown(self):
+        self.temp_directory.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
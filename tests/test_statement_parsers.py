@@ -0,0 +1,89 @@
+from datetime import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+from openpyxl import Workbook
+import pandas as pd
+
+import accounting.constant as c
+from accounting.parsers.registry import AMERICAN_EXPRESS, CAPITAL_ONE, CHASE, OFX, sniff_statement
+from accounting.pipelines.credit_card_transactions_pipeline import (CreditCardTransactionsPipeline, clean_transactions,
+                                                                    extract_statement)
+from accounting.stores.ingestion_ledger import IngestionLedger
+
+
+class TestStatementParsers(unittest.TestCase):
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.ledger = IngestionLedger(os.path.join(self.temp_directory.name, 'ingestion_ledger.sqlite'))
+        self.pipeline = CreditCardTransactionsPipeline([], ledger=self.ledger)
+        self.american_express_file_path = os.path.join(self.temp_directory.name, 'american_express.xlsx')
+
+        # American Express workbooks start with a summary of the account above the transactions.
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Transaction Details', 'Blue Cash Everyday / Apr 20 to May 19, 2024'])
+        sheet.append([])
+        sheet.append(['Date', 'Description', 'Amount', 'Account #', 'Category'])
+        sheet.append([datetime(2024, 5, 9), 'GORILLA KITCHEN DELI', 17.56, '-41007', 'Restaurant-Restaurant'])
+        sheet.append([datetime(2024, 5, 8), 'AUTOPAY PAYMENT - THANK YOU', -250.0, '-41007', None])
+        workbook.save(self.american_express_file_path)
+
+    def test_issuers_are_recognized_from_the_header(self):
+        self.assertEqual(sniff_statement('tests/mock_data/valid_capital_one_transactions.csv'), (CAPITAL_ONE, 0))
+        self.assertEqual(sniff_statement('tests/mock_data/valid_chase_transactions.csv'), (CHASE, 0))
+        self.assertEqual(sniff_statement('tests/mock_data/valid_transactions.qfx'), (OFX, None))
+        self.assertEqual(sniff_statement(self.american_express_file_path), (AMERICAN_EXPRESS, 2))
+
+        unknown_file_path = os.path.join(self.temp_directory.name, 'notes.csv')
+        pd.DataFrame({'Name': ['groceries'], 'Budget': [400]}).to_csv(unknown_file_path, index=False)
+        with self.assertRaises(ValueError):
+            sniff_statement(unknown_file_path)
+
+    def test_single_amounts_are_split_into_debits_and_credits(self):
+        parser, df = extract_statement('tests/mock_data/valid_chase_transactions.csv')
+        chase_df = clean_transactions(df, parser)
+        parser, df = extract_statement(self.american_express_file_path)
+        american_express_df = clean_transactions(df, parser)
+
+        self.assertEqual(chase_df[c.DEBIT].tolist(), [17.56, 6.25, 50.90])
+        self.assertEqual(chase_df[c.BUSINESS_OR_PERSON].tolist()[1], 'blue bottle coffee')
+        self.assertEqual(chase_df[c.CARD_NUMBER].unique().tolist(), [-1])
+        self.assertEqual(american_express_df[c.DEBIT].tolist(), [17.56])
+        self.assertEqual(american_express_df[c.CARD_NUMBER].tolist(), [41007])
+        self.assertEqual(american_express_df[c.DATE].tolist(), [pd.Timestamp('2024-05-09')])
+
+    def test_ofx_transactions_are_read(self):
+        parser, df = extract_statement('tests/mock_data/valid_transactions.qfx')
+        df = clean_transactions(df, parser)
+
+        self.assertEqual(df[c.BUSINESS_OR_PERSON_ORIGINAL].tolist(), ['gorilla kitchen deli', 'barnes & noble'])
+        self.assertEqual(df[c.DATE].tolist(), [pd.Timestamp('2024-05-09'), pd.Timestamp('2024-05-08')])
+        self.assertEqual(df[c.DEBIT].tolist(), [17.56, 12.40])
+        self.assertEqual(df[c.CARD_NUMBER].unique().tolist(), [5739])
+
+    def test_mixed_statements_are_extracted_together(self):
+        directory = os.path.join(self.temp_directory.name, 'temp')
+        os.makedirs(directory)
+        for file_path in ['tests/mock_data/valid_capital_one_transactions.csv',
+                          'tests/mock_data/valid_chase_transactions.csv', 'tests/mock_data/valid_transactions.qfx',
+                          self.american_express_file_path]:
+            shutil.copy(file_path, directory)
+        pipeline = CreditCardTransactionsPipeline(sorted(os.listdir(directory)), directory=directory, ledger=self.ledger)
+
+        dfs = pipeline.extract_and_clean_transactions()
+
+        self.assertEqual(len(dfs), 4)
+        for df in dfs:
+            self.assertEqual(df.columns.tolist(), dfs[0].columns.tolist())
+            self.assertTrue(pd.api.types.is_datetime64_any_dtype(df[c.DATE]))
+
+    def tearDown(self):
+        self.ledger.close()
+        self.temp_directory.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
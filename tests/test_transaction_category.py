@@ -0,0 +1,199 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+
+import pandas as pd
+
+import accounting.constant as c
+from accounting import transaction_category
+from accounting.merchant_classifier import CONFIDENCE, SIMILARITY
+from accounting.stores.merchant_store import MerchantCategoryStore
+from accounting.transaction_category import (CategorizationEngine, CategoryBackend, OpenAICategoryBackend,
+                                             categorize_transactions)
+
+
+class FakeCategoryBackend(CategoryBackend):
+    """Labels every business as dining and fails the first `failures` calls."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    async def categorize_batch(self, businesses):
+        self.batches.append(businesses)
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("Fake backend unavailable.")
+        return {business: 'Dining' for business in businesses}
+
+
+class FakeModelServerHandler(BaseHTTPRequestHandler):
+    """Answers chat completion requests by labeling every business in the prompt as groceries."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        prompt = body['messages'][-1]['content']
+        businesses = json.loads(prompt[len(c.CATEGORIZE_TRANSACTIONS_BATCH_PROMPT):])
+        content = json.dumps({business: 'groceries' for business in businesses})
+        response = json.dumps({
+            'id': 'fake', 'object': 'chat.completion', 'created': 0, 'model': body['model'],
+            'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}]
+        }).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_transactions_df(businesses):
+    return pd.DataFrame({
+        c.BUSINESS_OR_PERSON_ORIGINAL: businesses,
+        c.BUSINESS_OR_PERSON: businesses,
+        c.CATEGORY_ORIGINAL: 'dining',
+        c.CATEGORY: None,
+        c.DEBIT: 1.0,
+    })
+
+
+@patch('accounting.transaction_category.classify_businesses',
+       return_value=pd.DataFrame({c.CATEGORY: [], CONFIDENCE: [], SIMILARITY: []}))
+@patch('accounting.transaction_category.queue_businesses_for_review')
+@patch('accounting.transaction_category.get_queued_businesses', return_value={})
+@patch('accounting.transaction_category.load_business_to_category_mappings', side_effect=lambda mappings: mappings)
+class TestCategorizationEngine(unittest.TestCase):
+    def test_unique_businesses_are_sent_in_batches(self, load_mappings, get_queued, queue_for_review, classify):
+        backend = FakeCategoryBackend()
+        engine = CategorizationEngine(backend=backend, batch_size=2)
+        df = create_transactions_df(['cafe a', 'cafe b', 'cafe a', 'cafe c', 'cafe b'])
+
+        df = engine.categorize(df)
+
+        sent = sorted(business for batch in backend.batches for business in batch)
+        self.assertEqual(sent, ['cafe a', 'cafe b', 'cafe c'])
+        self.assertEqual(len(backend.batches), 2)
+        self.assertTrue((df[c.CATEGORY] == 'dining').all())
+        load_mappings.assert_called_once_with({'cafe a': 'dining', 'cafe b': 'dining', 'cafe c': 'dining'})
+
+    def test_failed_batches_are_retried(self, load_mappings, get_queued, queue_for_review, classify):
+        backend = FakeCategoryBackend(failures=2)
+        engine = CategorizationEngine(backend=backend, max_retries=2, backoff=0)
+
+        df = engine.categorize(create_transactions_df(['cafe a']))
+
+        self.assertEqual(len(backend.batches), 3)
+        self.assertEqual(df[c.CATEGORY].tolist(), ['dining'])
+
+    def test_categorized_transactions_are_not_sent(self, load_mappings, get_queued, queue_for_review, classify):
+        backend = FakeCategoryBackend()
+        engine = CategorizationEngine(backend=backend)
+        df = create_transactions_df(['cafe a'])
+        df[c.CATEGORY] = 'groceries'
+
+        engine.categorize(df)
+
+        self.assertEqual(backend.batches, [])
+        load_mappings.assert_not_called()
+
+    def test_confident_predictions_are_not_sent(self, load_mappings, get_queued, queue_for_review, classify):
+        backend = FakeCategoryBackend()
+        engine = CategorizationEngine(backend=backend, confidence_threshold=0.6)
+        classify.return_value = pd.DataFrame(
+            {c.CATEGORY: ['groceries', 'groceries', 'groceries'], CONFIDENCE: [0.95, 0.3, 0.95],
+             SIMILARITY: [0.4, 0.4, 0.05]}, index=['market a', 'cafe b', 'cinema c'])
+
+        df = engine.categorize(create_transactions_df(['market a', 'cafe b', 'cinema c']))
+
+        self.assertEqual(backend.batches, [['cafe b', 'cinema c']])
+        self.assertEqual(df[c.CATEGORY].tolist(), ['groceries', 'dining', 'dining'])
+        # Predictions aren't stored, so the classifier doesn't learn from its own guesses, but queued for review.
+        load_mappings.assert_called_once_with({'cafe b': 'dining', 'cinema c': 'dining'})
+        queued_df = queue_for_review.call_args.args[0]
+        self.assertEqual(queued_df[[c.BUSINESS_OR_PERSON, c.CATEGORY]].values.tolist(), [['market a', 'groceries']])
+
+    def test_unresolved_businesses_are_queued_for_review_once(self, load_mappings, get_queued, queue_for_review, classify):
+        backend = FakeCategoryBackend(failures=1)
+        engine = CategorizationEngine(backend=backend, batch_size=2, max_retries=0)
+        get_queued.return_value = {'cafe d': None, 'cafe e': 'groceries'}
+
+        df = engine.categorize(create_transactions_df(['cafe a', 'cafe b', 'cafe a', 'cafe c', 'cafe d', 'cafe e']))
+
+        self.assertEqual(backend.batches, [['cafe a', 'cafe b'], ['cafe c']])
+        # Queued predictions keep categorizing the transactions of their business until it's reviewed.
+        self.assertEqual(df[c.CATEGORY].tolist(), [c.UNCATEGORIZED, c.UNCATEGORIZED, c.UNCATEGORIZED, 'dining',
+                                                   c.UNCATEGORIZED, 'groceries'])
+        load_mappings.assert_called_once_with({'cafe c': 'dining'})
+        queued_df = queue_for_review.call_args.args[0]
+        self.assertEqual(queued_df[c.BUSINESS_OR_PERSON].tolist(), ['cafe a', 'cafe b'])
+
+    def test_openai_backend_with_fake_model_server(self, load_mappings, get_queued, queue_for_review, classify):
+        server = HTTPServer(('127.0.0.1', 0), FakeModelServerHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        try:
+            backend = OpenAICategoryBackend(base_url=f'http://127.0.0.1:{server.server_port}/v1', api_key='fake')
+            engine = CategorizationEngine(backend=backend, batch_size=1)
+            df = engine.categorize(create_transactions_df(['shop a', 'shop b']))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(df[c.CATEGORY].tolist(), ['groceries', 'groceries'])
+
+
+class TestReviewedBusinesses(unittest.TestCase):
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_directory.name, 'categorized_businesses.sqlite')
+        for patcher in [
+            patch.object(c, 'MERCHANT_CATEGORY_STORE_FILE_PATH', self.db_path),
+            patch.object(c, 'CATEGORIZED_BUSINESSES_FILE_PATH', os.path.join(self.temp_directory.name, 'missing.csv')),
+            patch.object(c, 'MERCHANT_CLASSIFIER_FILE_PATH', os.path.join(self.temp_directory.name, 'classifier.npz')),
+            patch('builtins.print'),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.clear_caches()
+        self.addCleanup(self.clear_caches)
+
+    def import_transactions(self, engine, businesses):
+        # Statements carry the issuer's category, which categorize_transactions renames to category_original.
+        df = create_transactions_df(businesses).drop(columns=c.CATEGORY_ORIGINAL).assign(**{c.CATEGORY: 'Dining'})
+        return engine.categorize(categorize_transactions(df))
+
+    def clear_caches(self):
+        transaction_category.get_merchant_store.cache_clear()
+        transaction_category.get_merchant_index.cache_clear()
+        transaction_category.get_merchant_classifier.cache_clear()
+
+    def test_businesses_reviewed_by_another_process_are_not_sent_again(self):
+        engine = CategorizationEngine(backend=FakeCategoryBackend(failures=1), max_retries=0)
+        df = self.import_transactions(engine, ['billa dankt'])
+        self.assertEqual(df[c.CATEGORY].tolist(), [c.UNCATEGORIZED])
+
+        review_store = MerchantCategoryStore(self.db_path)
+        review_store.resolve({'billa dankt': 'groceries'})
+        review_store.close()
+
+        backend = FakeCategoryBackend()
+        df = self.import_transactions(CategorizationEngine(backend=backend), ['billa dankt'])
+        labels = transaction_category.load_business_to_category_mappings({'billa dankt': 'insurance'})
+
+        self.assertEqual(backend.batches, [])
+        self.assertEqual(df[c.CATEGORY].tolist(), ['groceries'])
+        self.assertEqual(labels, {'billa dankt': 'groceries'})
+        self.assertEqual(transaction_category.get_merchant_store().to_dataframe().values.tolist(),
+                         [['billa dankt', 'groceries']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import patch
+
+from pandera.errors import SchemaErrors
+
+import accounting.constant as c
+from accounting.schemas import validation
+from accounting.schemas.transaction_schema import TransactionSchema
+from accounting.schemas.validation import FAST, FULL, OFF, SAMPLE, get_schema, set_validation_level, validate
+from tests.test_dtypes import create_compact_df
+from tests.test_history_store import create_transactions_df
+
+ROWS = [
+    ['2024-05-08', 'hernals. kebap pizza', 'dining', 5.61, None, 1],
+    ['2024-05-09', 'gorilla kitchen deli', 'dining', 17.56, None, 1],
+    ['2024-05-09', 'gorilla kitchen deli', 'dining', 17.56, None, 2],
+]
+
+
+class TestValidation(unittest.TestCase):
+    def test_off_skips_every_check(self):
+        df = create_transactions_df(ROWS).assign(**{c.CATEGORY: 'not a category'})
+
+        with patch('accounting.schemas.validation.get_schema') as get_schema_mock:
+            self.assertIs(validate(df, TransactionSchema, level=OFF), df)
+        get_schema_mock.assert_not_called()
+
+    def test_fast_accepts_object_and_compact_dtypes(self):
+        schema = get_schema(TransactionSchema)
+
+        with patch.object(schema, 'validate') as validate_mock:
+            for df in [create_transactions_df(ROWS).astype({c.CREDIT: float}), create_compact_df(ROWS)]:
+                self.assertIs(validate(df, TransactionSchema, level=FAST), df)
+        # Valid frames never fall back to pandera.
+        validate_mock.assert_not_called()
+
+    def test_fast_reports_failures_as_schema_errors(self):
+        df = create_compact_df(ROWS)
+
+        with self.assertRaises(SchemaErrors):
+            validate(df.assign(**{c.CATEGORY: 'not a category'}), TransactionSchema, level=FAST)
+        with self.assertRaises(SchemaErrors):
+            validate(df.assign(**{c.SEQUENCE: 1.5}), TransactionSchema, level=FAST)
+
+    def test_sample_only_applies_to_large_frames(self):
+        df = create_compact_df(ROWS)
+
+        with patch.object(validation, 'SAMPLE_SIZE', 2), \
+                patch('accounting.schemas.validation.get_schema') as get_schema_mock:
+            validate(df, TransactionSchema, level=SAMPLE)
+            validate(df.iloc[:2], TransactionSchema, level=SAMPLE)
+
+        first_call, second_call = get_schema_mock.return_value.validate.call_args_list
+        self.assertEqual(first_call.kwargs['sample'], 2)
+        self.assertNotIn('sample', second_call.kwargs)
+
+    def test_unknown_levels_are_rejected(self):
+        with self.assertRaises(ValueError):
+            set_validation_level('strict')
+        self.assertIsNone(validation.validation_level)
+
+        set_validation_level(FULL)
+        self.addCleanup(setattr, validation, 'validation_level', None)
+        self.assertEqual(validation.get_validation_level(), FULL)
+
+
+if __name__ == '__main__':
+    unittest.main()
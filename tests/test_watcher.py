@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from accounting.stores.ingestion_ledger import IngestionLedger
+from accounting.watcher import StatementWatcher
+
+
+@patch('accounting.watcher.tool.send_to_trash')
+@patch('accounting.watcher.start_run')
+@patch('accounting.watcher.CreditCardTransactionsPipeline')
+class TestStatementWatcher(unittest.TestCase):
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.ledger = IngestionLedger(os.path.join(self.temp_directory.name, 'ingestion_ledger.sqlite'))
+        self.directory = os.path.join(self.temp_directory.name, 'temp')
+        os.makedirs(self.directory)
+        self.watcher = StatementWatcher(
+            directory=self.directory, debounce=5, ledger=self.ledger, categorization_engine=MagicMock())
+
+    def write_statement(self, file_name, content):
+        with open(os.path.join(self.directory, file_name), 'w') as file:
+            file.write(content)
+
+    def test_files_are_imported_once_they_stop_changing(self, pipeline, start_run, send_to_trash):
+        self.write_statement('statement.csv', 'first rows')
+        self.assertEqual(self.watcher.scan(now=0), [])
+
+        self.write_statement('statement.csv', 'first rows and more rows')
+        os.utime(os.path.join(self.directory, 'statement.csv'), (1, 1))
+        self.assertEqual(self.watcher.scan(now=4), [])
+        self.assertEqual(self.watcher.scan(now=8), [])
+        self.write_statement('notes.txt', 'not a statement')
+
+        self.watcher.run_once(now=9)
+
+        pipeline.assert_called_once()
+        self.assertEqual(pipeline.call_args.args[0], ['statement.csv'])
+        send_to_trash.assert_called_once_with([os.path.join(self.directory, 'statement.csv')])
+
+    def test_statements_imported_before_are_skipped(self, pipeline, start_run, send_to_trash):
+        self.write_statement('statement.csv', 'rows')
+        self.watcher.run_once(now=0)
+        self.watcher.run_once(now=5)
+        os.rename(os.path.join(self.directory, 'statement.csv'), os.path.join(self.directory, 'copy.csv'))
+
+        self.watcher.run_once(now=10)
+        self.watcher.run_once(now=15)
+
+        pipeline.assert_called_once()
+        self.assertEqual(send_to_trash.call_count, 2)
+
+    def test_failed_statements_are_retried_once_changed(self, pipeline, start_run, send_to_trash):
+        pipeline.return_value.run_pipeline.side_effect = [ValueError("Invalid statement."), None]
+        self.write_statement('statement.csv', 'broken rows')
+        self.watcher.run_once(now=0)
+
+        with patch('builtins.print'):
+            self.watcher.run_once(now=5)
+        self.watcher.run_once(now=10)
+        self.write_statement('statement.csv', 'fixed rows')
+        self.watcher.run_once(now=15)
+        self.watcher.run_once(now=20)
+
+        self.assertEqual(pipeline.return_value.run_pipeline.call_count, 2)
+        send_to_trash.assert_called_once()
+
+    @patch('accounting.watcher.time.sleep', side_effect=[None, KeyboardInterrupt])
+    def test_failed_cash_runs_do_not_stop_the_watcher(self, sleep, pipeline, start_run, send_to_trash):
+        run_cash_pipeline = MagicMock(side_effect=[BrokenPipeError("Notion is unreachable."), None])
+
+        with patch.object(self.watcher, 'warm_up'), patch('builtins.print'):
+            self.watcher.run(cash_interval=0, run_cash_pipeline=run_cash_pipeline)
+
+        self.assertEqual(run_cash_pipeline.call_count, 2)
+        self.assertEqual(start_run.return_value.finish.call_count, 2)
+
+    def tearDown(self):
+        self.ledger.close()
+        self.temp_directory.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()